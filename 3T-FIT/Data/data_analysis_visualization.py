@@ -10,12 +10,17 @@ Date: 2025-11-20
 import os
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # chỉ lưu file PNG, không cần backend GUI
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
 from datetime import datetime
 import warnings
 import argparse
 import json
+from concurrent.futures import ProcessPoolExecutor
 
 warnings.filterwarnings('ignore')
 
@@ -32,6 +37,14 @@ DEFAULT_TRAIN_PATH = "../../../Data/data/mapped_workout_dataset_20251120_012453.
 DEFAULT_TEST_PATH = "../../../Data/data/merged_omni_health_dataset.xlsx"
 DEFAULT_OUTPUT_DIR = "../../../Data/analysis_results"
 
+# Các nhóm cột dùng cho phân tích/biểu đồ (tuple cố định, không tạo lại mỗi lần gọi)
+IMPORTANT_NUMERIC_COLUMNS = ('age', 'weight_kg', 'height_m', 'bmi', 'avg_hr', 'max_hr',
+                             'calories', 'duration_min', 'suitability_x', 'suitability_y')
+IMPORTANT_CATEGORICAL_COLUMNS = ('gender', 'experience_level', 'workout_type', 'intensity',
+                                 'exercise_name', 'equipment', 'target_muscle', 'activity_level')
+CORRELATION_COLUMNS = ('age', 'weight_kg', 'bmi', 'avg_hr', 'max_hr', 'calories', 'duration_min')
+BOXPLOT_COLUMNS = ('age', 'weight_kg', 'bmi', 'avg_hr', 'calories')
+
 # ==================== TIỀN XỬ LÝ VÀ KIỂM TRA ====================
 
 def load_and_validate_data(file_path: str, dataset_name: str = "Dataset"):
@@ -90,13 +103,15 @@ def load_and_validate_data(file_path: str, dataset_name: str = "Dataset"):
     
     return df
 
-def analyze_numeric_features(df: pd.DataFrame, dataset_name: str = "Dataset"):
+def analyze_numeric_features(df: pd.DataFrame, dataset_name: str = "Dataset",
+                             null_counts: pd.Series = None):
     """
     Phân tích các features số
     
     Args:
         df: DataFrame
         dataset_name: Tên dataset
+        null_counts: Số missing theo cột (df.isna().sum()) đã tính sẵn, None thì tự tính
     
     Returns:
         Dictionary chứa thống kê
@@ -108,27 +123,34 @@ def analyze_numeric_features(df: pd.DataFrame, dataset_name: str = "Dataset"):
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     print(f"\nSố lượng numeric columns: {len(numeric_cols)}")
     
+    if null_counts is None:
+        null_counts = df.isna().sum()
+    
+    # Mỗi thống kê tính một lần trên cả khối numeric thay vì từng cột một
+    numeric_df = df[numeric_cols]
+    summary = {
+        'mean': numeric_df.mean().to_dict(),
+        'std': numeric_df.std().to_dict(),
+        'min': numeric_df.min().to_dict(),
+        'max': numeric_df.max().to_dict(),
+        'median': numeric_df.median().to_dict(),
+    }
+    
     stats = {}
     
     for col in numeric_cols:
-        col_stats = {
-            'count': int(df[col].count()),
-            'mean': float(df[col].mean()) if df[col].count() > 0 else None,
-            'std': float(df[col].std()) if df[col].count() > 0 else None,
-            'min': float(df[col].min()) if df[col].count() > 0 else None,
-            'max': float(df[col].max()) if df[col].count() > 0 else None,
-            'median': float(df[col].median()) if df[col].count() > 0 else None,
-            'missing': int(df[col].isna().sum()),
-            'missing_pct': float(df[col].isna().sum() / len(df) * 100)
-        }
+        missing = int(null_counts[col])
+        count = len(df) - missing
+        col_stats = {'count': count}
+        for name, values in summary.items():
+            col_stats[name] = float(values[col]) if count > 0 else None
+        col_stats['missing'] = missing
+        col_stats['missing_pct'] = float(missing / len(df) * 100)
         stats[col] = col_stats
     
     # In một số columns quan trọng
-    important_cols = ['age', 'weight_kg', 'height_m', 'bmi', 'avg_hr', 'max_hr', 
-                     'calories', 'duration_min', 'suitability_x', 'suitability_y']
-    
     print("\nThống kê các features quan trọng:")
-    for col in important_cols:
+    for col in IMPORTANT_NUMERIC_COLUMNS:
         if col in stats:
             s = stats[col]
             print(f"\n  {col}:")
@@ -160,10 +182,7 @@ def analyze_categorical_features(df: pd.DataFrame, dataset_name: str = "Dataset"
     distributions = {}
     
     # Các columns quan trọng
-    important_cats = ['gender', 'experience_level', 'workout_type', 'intensity', 
-                     'exercise_name', 'equipment', 'target_muscle', 'activity_level']
-    
-    for col in important_cats:
+    for col in IMPORTANT_CATEGORICAL_COLUMNS:
         if col in df.columns:
             value_counts = df[col].value_counts()
             distributions[col] = value_counts.to_dict()
@@ -177,13 +196,15 @@ def analyze_categorical_features(df: pd.DataFrame, dataset_name: str = "Dataset"
     
     return distributions
 
-def check_data_quality(df: pd.DataFrame, dataset_name: str = "Dataset"):
+def check_data_quality(df: pd.DataFrame, dataset_name: str = "Dataset",
+                       null_counts: pd.Series = None):
     """
     Kiểm tra chất lượng dữ liệu
     
     Args:
         df: DataFrame
         dataset_name: Tên dataset
+        null_counts: Số missing theo cột (df.isna().sum()) đã tính sẵn, None thì tự tính
     
     Returns:
         Dictionary chứa các vấn đề
@@ -237,11 +258,13 @@ def check_data_quality(df: pd.DataFrame, dataset_name: str = "Dataset"):
             issues['invalid_values']['bmi_inconsistent'] = int(inconsistent_bmi.sum())
             print(f"  ⚠ BMI không nhất quán: {inconsistent_bmi.sum():,} records")
     
-    # Negative values
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    # Negative values (đếm một lần cho cả khối numeric)
+    numeric_df = df.select_dtypes(include=[np.number])
+    numeric_cols = numeric_df.columns
+    negative_counts = (numeric_df < 0).sum()
     for col in numeric_cols:
         if col not in ['unnamed:_22', 'unnamed:_23', 'unnamed:_24']:  # Skip unnamed columns
-            negative_count = (df[col] < 0).sum()
+            negative_count = negative_counts[col]
             if negative_count > 0:
                 issues['invalid_values'][f'{col}_negative'] = int(negative_count)
                 print(f"  ⚠ {col}: {negative_count:,} giá trị âm")
@@ -252,13 +275,17 @@ def check_data_quality(df: pd.DataFrame, dataset_name: str = "Dataset"):
     # Warnings
     print("\n[3] Cảnh báo:")
     
+    if null_counts is None:
+        null_counts = df.isna().sum()
+    
     # Check for low variance features
+    numeric_stds = numeric_df.std()
     for col in numeric_cols:
-        if df[col].std() < 0.01 and df[col].count() > 0:
-            issues['warnings'].append(f"{col} có variance rất thấp (std={df[col].std():.4f})")
+        if numeric_stds[col] < 0.01 and null_counts[col] < len(df):
+            issues['warnings'].append(f"{col} có variance rất thấp (std={numeric_stds[col]:.4f})")
     
     # Check for high missing rate
-    high_missing = df.isna().sum() / len(df) > 0.5
+    high_missing = null_counts / len(df) > 0.5
     if high_missing.any():
         for col in high_missing[high_missing].index:
             issues['warnings'].append(f"{col} có >50% missing values")
@@ -275,24 +302,78 @@ def check_data_quality(df: pd.DataFrame, dataset_name: str = "Dataset"):
 
 # ==================== TRỰC QUAN HÓA ====================
 
-def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+def downcast_numeric(df: pd.DataFrame, dataset_name: str = "Dataset") -> pd.DataFrame:
     """
-    Tạo các biểu đồ trực quan hóa dữ liệu
-    
+    Hạ kiểu các cột số (float64 -> float32, int64 -> int nhỏ nhất) trước khi vẽ biểu đồ,
+    giảm một nửa lượng dữ liệu cho các phép corr/mean/hist
+
     Args:
-        train_df: DataFrame train
-        test_df: DataFrame test
-        output_dir: Thư mục lưu biểu đồ
+        df: DataFrame
+        dataset_name: Tên dataset
+
+    Returns:
+        DataFrame mới với các cột số đã được hạ kiểu
     """
-    print(f"\n{'='*80}")
-    print("TẠO BIỂU ĐỒ TRỰC QUAN HÓA")
-    print(f"{'='*80}")
-    
-    os.makedirs(output_dir, exist_ok=True)
+    downcast = {}
+    for col in df.select_dtypes(include=['float']).columns:
+        downcast[col] = pd.to_numeric(df[col], downcast='float')
+    for col in df.select_dtypes(include=['integer']).columns:
+        downcast[col] = pd.to_numeric(df[col], downcast='integer')
+
+    memory_before = df.memory_usage(deep=True).sum() / 1024**2
+    df = df.assign(**downcast)
+    memory_after = df.memory_usage(deep=True).sum() / 1024**2
+    print(f"  - {dataset_name}: memory {memory_before:.2f} MB -> {memory_after:.2f} MB")
+    return df
+
+def box_stats(values: pd.Series) -> dict:
+    """
+    Tính sẵn thống kê boxplot (quartiles, whiskers 1.5*IQR, fliers) bằng numpy
+    để vẽ bằng Axes.bxp, tương đương Axes.boxplot mặc định
+
+    Args:
+        values: Series số đã dropna (không rỗng)
+
+    Returns:
+        Dictionary theo định dạng của Axes.bxp
+    """
+    x = values.to_numpy(dtype=float)
+    q1, med, q3 = np.percentile(x, [25, 50, 75])
+    iqr = q3 - q1
+    inside = x[(x >= q1 - 1.5 * iqr) & (x <= q3 + 1.5 * iqr)]
+    whislo = min(inside.min(), q1) if inside.size else q1
+    whishi = max(inside.max(), q3) if inside.size else q3
+    return {
+        'med': med, 'q1': q1, 'q3': q3, 'whislo': whislo, 'whishi': whishi,
+        'fliers': x[(x < whislo) | (x > whishi)]
+    }
+
+def create_figure(figsize, nrows=1, ncols=1):
+    """
+    Tạo Figure gắn sẵn canvas Agg, không đăng ký vào pyplot nên không cần plt.close()
     
-    # 1. Phân bố Age
-    print("\n[1] Vẽ biểu đồ phân bố Age...")
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    Returns:
+        (fig, axes) giống plt.subplots
+    """
+    fig = Figure(figsize=figsize, constrained_layout=True)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots(nrows, ncols)
+
+def correlation_matrix(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    Tính ma trận tương quan Pearson bằng np.corrcoef;
+    nếu có missing values thì dùng DataFrame.corr để giữ cách xử lý NaN theo từng cặp
+    """
+    values = df[columns].to_numpy(dtype=np.float64)
+    if len(values) < 2 or np.isnan(values).any():
+        return df[columns].corr()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.corrcoef(values, rowvar=False)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+def plot_age_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Phân bố Age, trả về tên file đã lưu (None nếu không vẽ)"""
+    fig, axes = create_figure((14, 5), 1, 2)
     
     if 'age' in train_df.columns:
         axes[0].hist(train_df['age'].dropna(), bins=30, alpha=0.7, color='blue', edgecolor='black')
@@ -308,14 +389,12 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
         axes[1].set_ylabel('Frequency')
         axes[1].grid(alpha=0.3)
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, '01_age_distribution.png'), dpi=150, bbox_inches='tight')
-    plt.close()
-    print("  ✓ Đã lưu: 01_age_distribution.png")
-    
-    # 2. Phân bố BMI
-    print("\n[2] Vẽ biểu đồ phân bố BMI...")
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    fig.savefig(os.path.join(output_dir, '01_age_distribution.png'), dpi=150, bbox_inches='tight')
+    return '01_age_distribution.png'
+
+def plot_bmi_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Phân bố BMI, trả về tên file đã lưu (None nếu không vẽ)"""
+    fig, axes = create_figure((14, 5), 1, 2)
     
     if 'bmi' in train_df.columns:
         axes[0].hist(train_df['bmi'].dropna(), bins=30, alpha=0.7, color='orange', edgecolor='black')
@@ -335,14 +414,12 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
         axes[1].legend()
         axes[1].grid(alpha=0.3)
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, '02_bmi_distribution.png'), dpi=150, bbox_inches='tight')
-    plt.close()
-    print("  ✓ Đã lưu: 02_bmi_distribution.png")
-    
-    # 3. Phân bố Gender
-    print("\n[3] Vẽ biểu đồ phân bố Gender...")
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    fig.savefig(os.path.join(output_dir, '02_bmi_distribution.png'), dpi=150, bbox_inches='tight')
+    return '02_bmi_distribution.png'
+
+def plot_gender_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Phân bố Gender, trả về tên file đã lưu (None nếu không vẽ)"""
+    fig, axes = create_figure((14, 5), 1, 2)
     
     if 'gender' in train_df.columns:
         gender_counts = train_df['gender'].value_counts()
@@ -362,14 +439,12 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
         for i, v in enumerate(gender_counts.values):
             axes[1].text(i, v + max(gender_counts.values)*0.02, str(v), ha='center', fontweight='bold')
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, '03_gender_distribution.png'), dpi=150, bbox_inches='tight')
-    plt.close()
-    print("  ✓ Đã lưu: 03_gender_distribution.png")
-    
-    # 4. Phân bố Experience Level
-    print("\n[4] Vẽ biểu đồ phân bố Experience Level...")
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    fig.savefig(os.path.join(output_dir, '03_gender_distribution.png'), dpi=150, bbox_inches='tight')
+    return '03_gender_distribution.png'
+
+def plot_experience_level_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Phân bố Experience Level, trả về tên file đã lưu (None nếu không vẽ)"""
+    fig, axes = create_figure((14, 5), 1, 2)
     
     if 'experience_level' in train_df.columns:
         exp_counts = train_df['experience_level'].value_counts()
@@ -392,14 +467,11 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
         for i, v in enumerate(exp_counts.values):
             axes[1].text(i, v + max(exp_counts.values)*0.02, str(v), ha='center', fontweight='bold')
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, '04_experience_level_distribution.png'), dpi=150, bbox_inches='tight')
-    plt.close()
-    print("  ✓ Đã lưu: 04_experience_level_distribution.png")
-    
-    # 5. Phân bố Workout Type
-    print("\n[5] Vẽ biểu đồ phân bố Workout Type...")
-    
+    fig.savefig(os.path.join(output_dir, '04_experience_level_distribution.png'), dpi=150, bbox_inches='tight')
+    return '04_experience_level_distribution.png'
+
+def plot_workout_type_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Phân bố Workout Type, trả về tên file đã lưu (None nếu không vẽ)"""
     workout_col = None
     for col in ['workout_type', 'category_type_want_todo', 'category_exercise_want_todo']:
         if col in train_df.columns:
@@ -407,7 +479,7 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
             break
     
     if workout_col:
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        fig, axes = create_figure((14, 5), 1, 2)
         
         workout_counts = train_df[workout_col].value_counts()
         axes[0].pie(workout_counts.values, labels=workout_counts.index, autopct='%1.1f%%', 
@@ -420,15 +492,13 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
                        startangle=90, colors=sns.color_palette("husl", len(workout_counts)))
             axes[1].set_title('Test Set - Workout Type Distribution', fontsize=14, fontweight='bold')
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '05_workout_type_distribution.png'), dpi=150, bbox_inches='tight')
-        plt.close()
-        print("  ✓ Đã lưu: 05_workout_type_distribution.png")
-    
-    # 6. Phân bố Intensity
-    print("\n[6] Vẽ biểu đồ phân bố Intensity...")
+        fig.savefig(os.path.join(output_dir, '05_workout_type_distribution.png'), dpi=150, bbox_inches='tight')
+        return '05_workout_type_distribution.png'
+
+def plot_intensity_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Phân bố Intensity, trả về tên file đã lưu (None nếu không vẽ)"""
     if 'intensity' in train_df.columns:
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        fig, axes = create_figure((14, 5), 1, 2)
         
         intensity_counts = train_df['intensity'].value_counts()
         intensity_order = ['Low', 'Medium', 'High', 'Maximal']
@@ -454,58 +524,56 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
             for i, v in enumerate(intensity_counts.values):
                 axes[1].text(i, v + max(intensity_counts.values)*0.02, str(v), ha='center', fontweight='bold')
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '06_intensity_distribution.png'), dpi=150, bbox_inches='tight')
-        plt.close()
-        print("  ✓ Đã lưu: 06_intensity_distribution.png")
-    
-    # 7. Correlation Heatmap (Train)
-    print("\n[7] Vẽ correlation heatmap...")
-    numeric_cols = ['age', 'weight_kg', 'bmi', 'avg_hr', 'max_hr', 'calories', 'duration_min']
-    available_cols = [col for col in numeric_cols if col in train_df.columns]
+        fig.savefig(os.path.join(output_dir, '06_intensity_distribution.png'), dpi=150, bbox_inches='tight')
+        return '06_intensity_distribution.png'
+
+def plot_correlation_heatmap(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Correlation Heatmap (Train), trả về tên file đã lưu (None nếu không vẽ)"""
+    available_cols = [col for col in CORRELATION_COLUMNS if col in train_df.columns]
     
     if len(available_cols) >= 3:
-        fig, ax = plt.subplots(figsize=(10, 8))
-        corr_matrix = train_df[available_cols].corr()
-        sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', center=0,
+        fig, ax = create_figure((10, 8))
+        corr_matrix = correlation_matrix(train_df, available_cols)
+        # Định dạng nhãn một lần bằng numpy thay vì seaborn format từng ô
+        annot_labels = np.char.mod('%.2f', corr_matrix.to_numpy())
+        sns.heatmap(corr_matrix, annot=annot_labels, fmt='', cmap='coolwarm', center=0,
                    square=True, linewidths=1, cbar_kws={"shrink": 0.8}, ax=ax)
         ax.set_title('Train Set - Correlation Matrix', fontsize=14, fontweight='bold', pad=20)
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '07_correlation_heatmap.png'), dpi=150, bbox_inches='tight')
-        plt.close()
-        print("  ✓ Đã lưu: 07_correlation_heatmap.png")
-    
-    # 8. Boxplot cho các features quan trọng
-    print("\n[8] Vẽ boxplot cho features quan trọng...")
-    boxplot_cols = ['age', 'weight_kg', 'bmi', 'avg_hr', 'calories']
-    available_boxplot = [col for col in boxplot_cols if col in train_df.columns]
+        fig.savefig(os.path.join(output_dir, '07_correlation_heatmap.png'), dpi=150, bbox_inches='tight')
+        return '07_correlation_heatmap.png'
+
+def plot_feature_boxplots(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Boxplot cho các features quan trọng, trả về tên file đã lưu (None nếu không vẽ)"""
+    available_boxplot = [col for col in BOXPLOT_COLUMNS if col in train_df.columns]
     
     if available_boxplot:
-        fig, axes = plt.subplots(2, len(available_boxplot), figsize=(4*len(available_boxplot), 8))
+        fig, axes = create_figure((4*len(available_boxplot), 8), 2, len(available_boxplot))
         if len(available_boxplot) == 1:
             axes = axes.reshape(-1, 1)
         
         for i, col in enumerate(available_boxplot):
             # Train
-            axes[0, i].boxplot(train_df[col].dropna(), vert=True)
+            train_values = train_df[col].dropna()
+            if len(train_values) > 0:
+                axes[0, i].bxp([box_stats(train_values)], vert=True)
             axes[0, i].set_title(f'Train - {col}', fontweight='bold')
             axes[0, i].grid(alpha=0.3)
             
             # Test
             if col in test_df.columns:
-                axes[1, i].boxplot(test_df[col].dropna(), vert=True)
+                test_values = test_df[col].dropna()
+                if len(test_values) > 0:
+                    axes[1, i].bxp([box_stats(test_values)], vert=True)
                 axes[1, i].set_title(f'Test - {col}', fontweight='bold')
                 axes[1, i].grid(alpha=0.3)
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '08_boxplots.png'), dpi=150, bbox_inches='tight')
-        plt.close()
-        print("  ✓ Đã lưu: 08_boxplots.png")
-    
-    # 9. Suitability Score Distribution
-    print("\n[9] Vẽ biểu đồ phân bố Suitability Scores...")
+        fig.savefig(os.path.join(output_dir, '08_boxplots.png'), dpi=150, bbox_inches='tight')
+        return '08_boxplots.png'
+
+def plot_suitability_distribution(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Suitability Score Distribution, trả về tên file đã lưu (None nếu không vẽ)"""
     if 'suitability_x' in train_df.columns or 'suitability_y' in train_df.columns:
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        fig, axes = create_figure((14, 5), 1, 2)
         
         if 'suitability_x' in train_df.columns:
             axes[0].hist(train_df['suitability_x'].dropna(), bins=20, alpha=0.7, 
@@ -529,15 +597,13 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
             axes[1].legend()
             axes[1].grid(alpha=0.3)
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '09_suitability_distribution.png'), dpi=150, bbox_inches='tight')
-        plt.close()
-        print("  ✓ Đã lưu: 09_suitability_distribution.png")
-    
-    # 10. Top Exercises
-    print("\n[10] Vẽ biểu đồ Top Exercises...")
+        fig.savefig(os.path.join(output_dir, '09_suitability_distribution.png'), dpi=150, bbox_inches='tight')
+        return '09_suitability_distribution.png'
+
+def plot_top_exercises(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str):
+    """Top Exercises, trả về tên file đã lưu (None nếu không vẽ)"""
     if 'exercise_name' in train_df.columns:
-        fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+        fig, axes = create_figure((14, 6), 1, 2)
         
         top_exercises = train_df['exercise_name'].value_counts().head(15)
         axes[0].barh(range(len(top_exercises)), top_exercises.values, alpha=0.7, color='steelblue')
@@ -558,10 +624,59 @@ def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_
             axes[1].grid(alpha=0.3, axis='x')
             axes[1].invert_yaxis()
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '10_top_exercises.png'), dpi=150, bbox_inches='tight')
-        plt.close()
-        print("  ✓ Đã lưu: 10_top_exercises.png")
+        fig.savefig(os.path.join(output_dir, '10_top_exercises.png'), dpi=150, bbox_inches='tight')
+        return '10_top_exercises.png'
+
+VISUALIZATION_SECTIONS = [
+    ("[1] Vẽ biểu đồ phân bố Age...", plot_age_distribution),
+    ("[2] Vẽ biểu đồ phân bố BMI...", plot_bmi_distribution),
+    ("[3] Vẽ biểu đồ phân bố Gender...", plot_gender_distribution),
+    ("[4] Vẽ biểu đồ phân bố Experience Level...", plot_experience_level_distribution),
+    ("[5] Vẽ biểu đồ phân bố Workout Type...", plot_workout_type_distribution),
+    ("[6] Vẽ biểu đồ phân bố Intensity...", plot_intensity_distribution),
+    ("[7] Vẽ correlation heatmap...", plot_correlation_heatmap),
+    ("[8] Vẽ boxplot cho features quan trọng...", plot_feature_boxplots),
+    ("[9] Vẽ biểu đồ phân bố Suitability Scores...", plot_suitability_distribution),
+    ("[10] Vẽ biểu đồ Top Exercises...", plot_top_exercises),
+]
+
+def create_visualizations(train_df: pd.DataFrame, test_df: pd.DataFrame, output_dir: str,
+                          workers: int = None):
+    """
+    Tạo các biểu đồ trực quan hóa dữ liệu
+    
+    Args:
+        train_df: DataFrame train
+        test_df: DataFrame test
+        output_dir: Thư mục lưu biểu đồ
+        workers: Số process vẽ song song (None = theo số CPU, 1 = tuần tự)
+    """
+    print(f"\n{'='*80}")
+    print("TẠO BIỂU ĐỒ TRỰC QUAN HÓA")
+    print(f"{'='*80}")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if workers is None:
+        workers = min(len(VISUALIZATION_SECTIONS), os.cpu_count() or 1)
+    
+    # Các biểu đồ độc lập nhau (mỗi cái tự mở/lưu/đóng figure) nên có thể vẽ ở các process riêng;
+    # log vẫn in theo đúng thứ tự các mục
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(plot, train_df, test_df, output_dir)
+                       for _, plot in VISUALIZATION_SECTIONS]
+            for (title, _), future in zip(VISUALIZATION_SECTIONS, futures):
+                print(f"\n{title}")
+                saved = future.result()
+                if saved:
+                    print(f"  ✓ Đã lưu: {saved}")
+    else:
+        for title, plot in VISUALIZATION_SECTIONS:
+            print(f"\n{title}")
+            saved = plot(train_df, test_df, output_dir)
+            if saved:
+                print(f"  ✓ Đã lưu: {saved}")
     
     print(f"\n{'='*80}")
     print("✅ ĐÃ TẠO XONG TẤT CẢ BIỂU ĐỒ!")
@@ -578,6 +693,8 @@ def main():
                        help='Đường dẫn file test data')
     parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT_DIR,
                        help='Thư mục lưu kết quả')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Số process vẽ biểu đồ song song (mặc định theo số CPU, 1 = tuần tự)')
     
     args = parser.parse_args()
     
@@ -596,20 +713,27 @@ def main():
     train_df = load_and_validate_data(train_path, "Train Data")
     test_df = load_and_validate_data(test_path, "Test Data")
     
+    # Đếm missing một lần cho mỗi dataset, dùng lại cho phân tích và kiểm tra chất lượng
+    train_null_counts = train_df.isna().sum()
+    test_null_counts = test_df.isna().sum()
+    
     # Analyze numeric features
-    train_numeric_stats = analyze_numeric_features(train_df, "Train Data")
-    test_numeric_stats = analyze_numeric_features(test_df, "Test Data")
+    train_numeric_stats = analyze_numeric_features(train_df, "Train Data", train_null_counts)
+    test_numeric_stats = analyze_numeric_features(test_df, "Test Data", test_null_counts)
     
     # Analyze categorical features
     train_cat_dist = analyze_categorical_features(train_df, "Train Data")
     test_cat_dist = analyze_categorical_features(test_df, "Test Data")
     
     # Check data quality
-    train_issues = check_data_quality(train_df, "Train Data")
-    test_issues = check_data_quality(test_df, "Test Data")
-    
-    # Create visualizations
-    create_visualizations(train_df, test_df, output_dir)
+    train_issues = check_data_quality(train_df, "Train Data", train_null_counts)
+    test_issues = check_data_quality(test_df, "Test Data", test_null_counts)
+    
+    # Create visualizations (trên bản đã hạ kiểu số; thống kê ở trên vẫn tính bằng float64)
+    print("\nHạ kiểu dữ liệu số trước khi vẽ biểu đồ:")
+    create_visualizations(downcast_numeric(train_df, "Train Data"),
+                          downcast_numeric(test_df, "Test Data"), output_dir,
+                          workers=args.workers)
     
     # Save analysis report
     report = {
@@ -14,7 +14,9 @@ It checks:
 """
 
 import pandas as pd
+import numpy as np
 import json
+from pathlib import Path
 from typing import Dict
 import warnings
 warnings.filterwarnings('ignore')
@@ -66,7 +68,8 @@ class DataValidator:
             print("=" * 80)
             
             print(f"\n[1/2] Loading training data: {self.training_file}")
-            self.training_df = pd.read_excel(self.training_file)
+            self.training_df = (pd.read_parquet(self.training_file) if self.training_file.endswith('.parquet')
+                                else pd.read_excel(self.training_file))
             print(f"  ✓ Loaded {len(self.training_df):,} records")
             print(f"  ✓ Columns: {len(self.training_df.columns)}")
             
@@ -591,14 +594,18 @@ class DataValidator:
     def save_report(self, output_file: str):
         """Save validation report to JSON file"""
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.validation_results, f, indent=2, ensure_ascii=False)
+            # Stats from float32 Parquet columns are numpy scalars, not Python floats
+            json.dump(self.validation_results, f, indent=2, ensure_ascii=False,
+                      default=lambda o: o.item() if isinstance(o, np.generic) else str(o))
         print(f"\n📄 Detailed report saved to: {output_file}")
 
 
 def main():
     """Main execution function"""
     # File paths
-    training_file = './preprocessing_data/enhanced_gym_member_exercise_tracking_10k.xlsx'
+    training_file = './preprocessing_data/enhanced_gym_member_exercise_tracking_10k.parquet'
+    if not Path(training_file).exists():
+        training_file = training_file.replace('.parquet', '.xlsx')
     test_file = './preprocessing_data/test_dataset.xlsx'
     output_report = './preprocessing_data/data_validation_report.json'
     
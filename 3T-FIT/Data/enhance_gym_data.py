@@ -24,6 +24,10 @@ Date: 2025-11-24
 import pandas as pd
 import numpy as np
 import random
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from functools import lru_cache
 from pathlib import Path
 import json
 
@@ -40,6 +44,12 @@ MET_VALUES = {
     'Walking': 4.0,     # Brisk walking
 }
 
+def _frozen(values, dtype=None) -> np.ndarray:
+    """ndarray read-only cho các bảng hằng ở module level (dùng chung, không bị sửa nhầm)"""
+    array = np.array(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
 # ==================== SEPA NUMERICAL MAPPING ====================
 # Convert SePA fields from text labels to numerical scale (1-5)
 # This improves ML model compatibility and enables mathematical operations
@@ -102,6 +112,18 @@ def map_sepa_to_numeric(value: str, mapping_dict: dict) -> int:
     except:
         return 3  # Default to neutral
 
+REFERENCE_DATA_PATH = 'd:/dacn_omnimer_health/3T-FIT/Data/preprocessing_data/own_gym_member_exercise_tracking.xlsx'
+
+
+@lru_cache(maxsize=1)
+def _read_reference_data() -> pd.DataFrame:
+    """Đọc file reference Excel một lần, dùng chung cho exercise database và workout templates"""
+    print("[DEBUG] Loading reference Excel file...")
+    reference_df = pd.read_excel(REFERENCE_DATA_PATH)
+    print(f"[DEBUG] Loaded {len(reference_df)} rows from Excel")
+    return reference_df
+
+
 def load_exercise_database():
     """Load exercise names from JSON files and reference data"""
     print("[DEBUG] Starting to load exercise database...")
@@ -148,9 +170,7 @@ def load_exercise_database():
 
     # Source 2: Reference Excel file
     try:
-        print("[DEBUG] Loading reference Excel file...")
-        reference_df = pd.read_excel('d:/dacn_omnimer_health/3T-FIT/Data/preprocessing_data/own_gym_member_exercise_tracking.xlsx')
-        print(f"[DEBUG] Loaded {len(reference_df)} rows from Excel")
+        reference_df = _read_reference_data()
 
         if 'exercise_name' in reference_df.columns:
             excel_exercises = reference_df['exercise_name'].dropna().unique()
@@ -160,7 +180,8 @@ def load_exercise_database():
         print(f"Warning: Could not load Excel exercise database: {e}")
 
     # Remove duplicates and create final database
-    final_exercises = list(set(all_exercises))
+    # (sorted: thứ tự của set đổi theo hash seed của từng process)
+    final_exercises = sorted(set(all_exercises), key=str)
 
     if not final_exercises:
         # Fallback exercise database with common exercises
@@ -182,35 +203,41 @@ def load_workout_templates():
     """Load complete workout templates from reference dataset"""
     print("[DEBUG] Starting to load workout templates...")
     try:
-        print("[DEBUG] Loading workout templates from Excel...")
-        reference_df = pd.read_excel('d:/dacn_omnimer_health/3T-FIT/Data/preprocessing_data/own_gym_member_exercise_tracking.xlsx')
-        print(f"[DEBUG] Loaded {len(reference_df)} rows for templates")
+        # Dùng lại bản đã đọc bởi load_exercise_database (copy vì có sửa cột)
+        reference_df = _read_reference_data().copy()
 
         # Strip whitespace from workout_type values
         reference_df['workout_type'] = reference_df['workout_type'].str.strip()
 
-        # Group workouts by workout_id
+        # Lấy mỗi cột ra list một lần (cột thiếu thì dùng giá trị mặc định)
+        # thay vì iterrows + row.get cho từng dòng
+        def column_values(column, default=None):
+            if column in reference_df.columns:
+                return reference_df[column].tolist()
+            return [default] * len(reference_df)
+
+        workout_types = column_values('workout_type')
+        exercise_fields = {
+            'name': column_values('exercise_name'),
+            'duration_min': column_values('duration_min'),
+            'base_intensity': column_values('unified_intensity', 50),
+            'base_calories': column_values('calories', 30),
+            'avg_hr': column_values('avg_hr', 120),
+            'max_hr': column_values('max_hr', 150)
+        }
+
+        # Group workouts by workout_id (vị trí các dòng của từng workout)
         workout_templates = {}
 
-        for workout_id, workout_data in reference_df.groupby('workout_id'):
-            workout_info = {
-                'workout_type': workout_data['workout_type'].iloc[0],
-                'exercises': []
+        for workout_id, positions in reference_df.groupby('workout_id').indices.items():
+            workout_templates[workout_id] = {
+                'workout_type': workout_types[positions[0]],
+                'exercises': [
+                    {field: values[i] for field, values in exercise_fields.items()}
+                    for i in positions
+                ]
             }
 
-            for _, exercise_row in workout_data.iterrows():
-                exercise_info = {
-                    'name': exercise_row['exercise_name'],
-                    'duration_min': exercise_row['duration_min'],
-                    'base_intensity': exercise_row.get('unified_intensity', 50),
-                    'base_calories': exercise_row.get('calories', 30),
-                    'avg_hr': exercise_row.get('avg_hr', 120),
-                    'max_hr': exercise_row.get('max_hr', 150)
-                }
-                workout_info['exercises'].append(exercise_info)
-
-            workout_templates[workout_id] = workout_info
-
         # Filter only Strength workouts
         strength_workouts = {k: v for k, v in workout_templates.items()
                            if v['workout_type'] == 'Strength'}
@@ -228,6 +255,9 @@ def load_workout_templates():
 EXERCISE_DATABASE = load_exercise_database()
 WORKOUT_TEMPLATES = load_workout_templates()
 
+# Mảng tên bài tập để generator bốc theo index rồi gather
+EXERCISE_NAMES = _frozen(EXERCISE_DATABASE, dtype=object)
+
 # ==================== 1RM ESTIMATION (STRATEGY_ANALYSIS.MD) ====================
 
 def calculate_1rm_estimated(weight: float, reps: int) -> float:
@@ -818,10 +848,227 @@ def determine_readiness_factor(fatigue_level = None, mood = None, effort = None)
         
     return round(max(0.6, min(1.3, factor)), 2)
 
+# ==================== VECTORIZED GENERATION HELPERS ====================
+
+WORKOUT_TYPES = ['Strength', 'Cardio', 'HIIT', 'Yoga']
+WORKOUT_TYPE_WEIGHTS_EXPERIENCED = [0.6, 0.2, 0.15, 0.05]
+WORKOUT_TYPE_WEIGHTS_BEGINNER = [0.4, 0.3, 0.2, 0.1]
+STRENGTH_CODE = WORKOUT_TYPES.index('Strength')
+# Tên record cho các session không phải Strength, theo code
+SESSION_NAMES = _frozen([f"{t} Session" for t in WORKOUT_TYPES], dtype=object)
+
+# exercise_name lưu dạng Categorical: category = tên bài tập (hoặc "Strength Exercise k" khi không có
+# database) + tên session; record chỉ giữ code int32, string chỉ dựng khi export
+_STRENGTH_NAME_POOL = list(EXERCISE_NAMES) or [f"Strength Exercise {i + 1}" for i in range(8)]
+RECORD_NAME_CATEGORIES = pd.Index(_STRENGTH_NAME_POOL + list(SESSION_NAMES)).unique()
+STRENGTH_NAME_CODES = _frozen(RECORD_NAME_CATEGORIES.get_indexer(_STRENGTH_NAME_POOL), dtype=np.int32)
+SESSION_NAME_CODES = _frozen(RECORD_NAME_CATEGORIES.get_indexer(list(SESSION_NAMES)), dtype=np.int32)
+
+# Lookup table theo workout_type code (thứ tự WORKOUT_TYPES).
+# Phần tử cuối dành cho code -1 (loại không nằm trong WORKOUT_TYPES).
+_TYPE_LOWER = [t.lower() for t in WORKOUT_TYPES]
+TYPE_IS_CARDIO = _frozen([t in ('cardio', 'hiit', 'running', 'cycling') for t in _TYPE_LOWER] + [False])
+TYPE_IS_STATIC = _frozen([t in ('yoga', 'pilates', 'stretching') for t in _TYPE_LOWER] + [False])
+TYPE_HAS_HR_PACE = _frozen([t in ('cardio', 'running', 'cycling') for t in _TYPE_LOWER] + [False])
+TYPE_METS = _frozen(
+    [MET_VALUES.get(t, 3.0 if is_static else 5.0) for t, is_static in zip(WORKOUT_TYPES, TYPE_IS_STATIC)] + [5.0]
+)
+
+# SePA fields (1-5): Very Low/Bad -> Very High/Excellent
+SEPA_VALUES = [1, 2, 3, 4, 5]
+MOOD_WEIGHTS = [0.05, 0.1, 0.4, 0.3, 0.15]
+FATIGUE_WEIGHTS = [0.1, 0.2, 0.4, 0.2, 0.1]
+EFFORT_WEIGHTS = [0.05, 0.15, 0.4, 0.25, 0.15]
+
+# CDF tính sẵn một lần cho các lần bốc theo trọng số (inverse CDF)
+WORKOUT_TYPE_CDF_EXPERIENCED = _frozen(np.cumsum(WORKOUT_TYPE_WEIGHTS_EXPERIENCED))
+WORKOUT_TYPE_CDF_BEGINNER = _frozen(np.cumsum(WORKOUT_TYPE_WEIGHTS_BEGINNER))
+SEPA_SCALE = _frozen(SEPA_VALUES, dtype=np.int8)
+MOOD_CDF = _frozen(np.cumsum(MOOD_WEIGHTS))
+FATIGUE_CDF = _frozen(np.cumsum(FATIGUE_WEIGHTS))
+EFFORT_CDF = _frozen(np.cumsum(EFFORT_WEIGHTS))
+
+# Rest period theo 1RM: light (<=50) 30-60s, moderate (<=80) 1-2 phút, heavy (>80) 2-3 phút
+REST_1RM_THRESHOLDS = _frozen([50.0, 80.0])
+REST_PERIOD_LOW = _frozen([30.0, 60.0, 120.0])
+REST_PERIOD_HIGH = _frozen([60.0, 120.0, 180.0])
+
+# Kiểu hẹp cho các cột số (range nhỏ, đã round 1-2 chữ số)
+RECORD_DTYPES = {
+    'duration_min': np.float32, 'avg_hr': np.int16, 'max_hr': np.int16, 'calories': np.float32,
+    'fatigue': np.int8, 'effort': np.int8, 'mood': np.int8, 'suitability_x': np.float32,
+    'age': np.int8, 'height_m': np.float32, 'weight_kg': np.float32, 'bmi': np.float32,
+    'fat_percentage': np.float32, 'resting_heartrate': np.int16, 'experience_level': np.int8,
+    'workout_frequency': np.int8, 'gender': np.int8, 'session_duration': np.float32,
+    'estimated_1rm': np.float32, 'pace': np.float32, 'duration_capacity': np.float32,
+    'rest_period': np.float32, 'intensity_score': np.float32,
+}
+
+# Số record mỗi chunk khi dựng song song (cố định để output không phụ thuộc số worker)
+RECORDS_PER_CHUNK = 50_000
+
+# 28 fields, đúng thứ tự của reference format
+ENHANCED_COLUMNS = [
+    'exercise_name', 'duration_min', 'avg_hr', 'max_hr', 'calories',
+    'fatigue', 'effort', 'mood', 'suitability_x', 'age', 'height_m',
+    'weight_kg', 'bmi', 'fat_percentage', 'resting_heartrate',
+    'experience_level', 'workout_frequency', 'health_status', 'workout_type',
+    'location', 'injury_or_pain_notes', 'gender', 'session_duration',
+    'estimated_1rm', 'pace', 'duration_capacity', 'rest_period', 'intensity_score'
+]
+
+
+def _column_array(df: pd.DataFrame, column: str, default) -> np.ndarray:
+    """Lấy cột dưới dạng ndarray, thiếu cột thì dùng giá trị mặc định"""
+    if column in df.columns:
+        return df[column].to_numpy()
+    return np.full(len(df), default)
+
+
+def _gender_to_binary(raw_gender: np.ndarray) -> np.ndarray:
+    """Male -> 1, Female -> 0 (chấp nhận cả text lẫn số)"""
+    as_text = pd.Series(raw_gender, dtype=object).astype(str).str.lower()
+    return (as_text.isin(['male', 'm']).to_numpy() | (raw_gender == 1)).astype(int)
+
+
+def _readiness_factor_array(fatigue: np.ndarray, mood: np.ndarray, effort: np.ndarray) -> np.ndarray:
+    """Bản vector hóa của determine_readiness_factor cho SePA dạng số"""
+    factor = np.ones(len(fatigue))
+    factor -= np.select([fatigue >= 5, fatigue == 4], [0.2, 0.1], 0.0)
+    factor += np.where(fatigue <= 2, 0.05, 0.0)
+    factor -= np.where(mood <= 2, 0.1, 0.0)
+    factor += np.where(mood >= 5, 0.05, 0.0)
+    factor -= np.where(effort >= 5, 0.1, 0.0)
+    return np.round(np.clip(factor, 0.6, 1.3), 2)
+
+
+def _uniform_int(u: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Số nguyên đều trong [low, high] từ uniform [0, 1)"""
+    return low + (u * (high - low + 1)).astype(np.int64)
+
+
+def _weighted_index(u: np.ndarray, cdf: np.ndarray) -> np.ndarray:
+    """Index theo phân phối (CDF tính sẵn) từ uniform [0, 1) (inverse CDF)"""
+    return np.minimum(np.searchsorted(cdf, u, side='right'), len(cdf) - 1)
+
+
+def _intensity_variation_array(u: np.ndarray, exercise_idx: np.ndarray,
+                               total_exercises: np.ndarray) -> np.ndarray:
+    """Bản vector hóa của generate_intensity_variation (base_intensity = 1.0)"""
+    phases = [
+        exercise_idx == 0,                       # warm-up
+        exercise_idx == total_exercises - 1,     # cool-down
+        exercise_idx < total_exercises // 2,     # building up
+    ]
+    low = np.select(phases, [0.7, 0.6, 0.85], 0.9)
+    high = np.select(phases, [0.8, 0.75, 1.1], 1.15)
+    return np.round(low + (high - low) * u, 2)
+
+
+def _exercise_calories_array(weight_kg, duration_min, intensity_factor, avg_hr, age, is_male) -> np.ndarray:
+    """Bản vector hóa của calculate_exercise_calories (METs 30% + Keytel 70%)"""
+    mets = 6.0 * intensity_factor
+    valid_mets = (mets > 0) & (weight_kg > 0) & (duration_min > 0)
+    calories_mets = np.where(valid_mets, np.round((mets * 3.5 * weight_kg) / 200 * duration_min, 2), 0.0)
+
+    ahr = np.where(
+        is_male == 1,
+        0.6309 * avg_hr + 0.1988 * weight_kg + 0.2017 * age - 55.0969,
+        0.4472 * avg_hr - 0.1263 * weight_kg + 0.074 * age - 20.4022,
+    )
+    valid_hr = (avg_hr > 0) & (weight_kg > 0) & (duration_min > 0)
+    calories_hr = np.where(valid_hr, np.round(np.maximum(0, duration_min * (ahr / 4.184)), 2), 0.0)
+
+    return np.round(calories_mets * 0.3 + calories_hr * 0.7, 2)
+
+
+def _capability_metrics_array(type_code, avg_hr, resting_hr, duration_min, readiness_factor) -> tuple:
+    """
+    Bản vector hóa của calculate_capability_metrics cho các session không phải Strength
+    Returns: (duration_capacity, intensity_score)
+    """
+    is_cardio = TYPE_IS_CARDIO[type_code]
+    is_static = TYPE_IS_STATIC[type_code]
+
+    # Cardio: pace ước tính từ %HRR (max HR theo tuổi 30), max pace 15km/h
+    hr_max = 208 - (0.7 * 30)
+    hrr_percent = np.maximum(0, (avg_hr - resting_hr) / (hr_max - resting_hr))
+    pace = np.round(15 * hrr_percent * readiness_factor, 2)
+
+    # Yoga/static & fallback: intensity theo METs
+    mets = TYPE_METS[type_code]
+
+    duration_capacity = np.where(is_static, np.round(duration_min * 60 * readiness_factor, 2), 0.0)  # Seconds
+    intensity_score = np.minimum(10, np.where(is_cardio, np.round(pace / 2, 1), np.round(mets, 1)))
+    return duration_capacity, intensity_score
+
+
+def _suitability_x_array(u: np.ndarray) -> np.ndarray:
+    """
+    suitability_x cho các record được sinh (một uniform [0, 1) mỗi record).
+    calculate_suitability_x nhận dict ở đây nên safe_get không đọc được field nào
+    (dict không có .index) -> chỉ còn base score 0.5 ± 5%. Giữ nguyên phân phối này
+    để nhãn không lệch so với dataset đã sinh trước đó.
+    """
+    return np.round(np.clip(0.5 * (0.95 + 0.1 * u), 0.0, 1.0), 2)
+
+
+@dataclass
+class _UserProfiles:
+    """Profile gốc của từng user trong raw data, mỗi field một ndarray (cùng độ dài)"""
+    age: np.ndarray
+    gender: np.ndarray
+    weight_kg: np.ndarray
+    height_m: np.ndarray
+    resting_hr: np.ndarray
+    experience: np.ndarray
+    workout_frequency: np.ndarray
+
+    @classmethod
+    def from_frame(cls, raw_df: pd.DataFrame) -> '_UserProfiles':
+        return cls(
+            age=_column_array(raw_df, 'Age', 30),
+            gender=_gender_to_binary(_column_array(raw_df, 'Gender', 'Male')),
+            weight_kg=_column_array(raw_df, 'Weight (kg)', 70),
+            height_m=_column_array(raw_df, 'Height (m)', 1.75),
+            resting_hr=_column_array(raw_df, 'Resting_BPM', 70),
+            experience=_column_array(raw_df, 'Experience_Level', 2),
+            workout_frequency=_column_array(raw_df, 'Workout_Frequency (days/week)', 3),
+        )
+
+
+@dataclass
+class _SessionArrays:
+    """Dữ liệu mức session dùng chung cho các chunk record, mỗi field một ndarray"""
+    age: np.ndarray
+    weight: np.ndarray
+    height: np.ndarray
+    gender: np.ndarray
+    resting_hr: np.ndarray
+    experience: np.ndarray
+    workout_frequency: np.ndarray
+    type_code: np.ndarray
+    avg_hr: np.ndarray
+    max_hr: np.ndarray
+    duration_min: np.ndarray
+    calories: np.ndarray
+    mood: np.ndarray
+    fatigue: np.ndarray
+    effort: np.ndarray
+    readiness_factor: np.ndarray
+    rows_per_session: np.ndarray
+    base_1rm: np.ndarray
+
+    def slice(self, lo: int, hi: int) -> '_SessionArrays':
+        """View các session [lo, hi) cho một chunk"""
+        return _SessionArrays(**{f.name: getattr(self, f.name)[lo:hi] for f in fields(self)})
+
+
 # ==================== MAIN ENHANCED PROCESSING FUNCTION ====================
 
 
-def process_gym_data_enhanced(input_file: str, output_file: str, target_records: int = 10000) -> pd.DataFrame:
+def process_gym_data_enhanced(input_file: str, output_file: str, target_records: int = 10000,
+                              seed: int = 42, n_jobs: int = None) -> pd.DataFrame:
     """
     Enhanced data processing implementing Strategy_Analysis.md recommendations
     Transform gym_member_exercise_tracking.xlsx data to model-ready format
@@ -845,242 +1092,10 @@ def process_gym_data_enhanced(input_file: str, output_file: str, target_records:
     print(f"[DEBUG] Loaded {len(raw_df)} base records")
     print(f"[DEBUG] Columns: {list(raw_df.columns)}")
 
-    enhanced_rows = []
-    records_generated = 0
-
-    # Generate multiple sessions per user to reach target
-    sessions_per_user = max(1, target_records // len(raw_df))
-
-    print(f"\n[DEBUG] Generating ~{sessions_per_user} workout sessions per user...")
-    for user_idx, row in raw_df.iterrows():
-        if records_generated >= target_records:
-            break
-
-        if user_idx % 100 == 0:
-            print(f"[DEBUG] Processing user {user_idx}/{len(raw_df)}... Records: {records_generated}")
-
-        # Extract base user profile
-        base_age = row.get('Age', 30)
-        
-        # Refactor Gender: Male -> 1, Female -> 0
-        raw_gender = row.get('Gender', 'Male')
-        if isinstance(raw_gender, str):
-            base_gender = 1 if raw_gender.lower() in ['male', 'm'] else 0
-        else:
-            base_gender = 1 if raw_gender == 1 else 0
-            
-        base_weight_kg = row.get('Weight (kg)', 70)
-        base_height_m = row.get('Height (m)', 1.75)
-        base_resting_hr = row.get('Resting_BPM', 70)
-        base_experience = row.get('Experience_Level', 2)
-        base_workout_freq = row.get('Workout_Frequency (days/week)', 3)
-        base_fat_percentage = row.get('Fat_Percentage', None)
-        base_bmi = row.get('BMI', None)
-
-        # Calculate missing health metrics
-        if base_bmi is None:
-            base_bmi = calculate_bmi(base_weight_kg, base_height_m)
-        if base_fat_percentage is None:
-            base_fat_percentage = estimate_body_fat_from_bmi(base_bmi, base_age, base_gender)
-
-        # Generate multiple workout sessions for this user
-        for session_idx in range(sessions_per_user):
-            if records_generated >= target_records:
-                break
-
-            # Add variation to user profile for different sessions
-            age_variation = max(18, min(65, base_age + random.randint(-2, 2)))
-            weight_variation = max(40, min(150, base_weight_kg + random.uniform(-2, 2)))
-
-            # Generate realistic session variations
-            workout_types = ['Strength', 'Cardio', 'HIIT', 'Yoga']
-            workout_type_weights = [0.6, 0.2, 0.15, 0.05] if base_experience >= 2 else [0.4, 0.3, 0.2, 0.1]
-            workout_type = np.random.choice(workout_types, p=workout_type_weights)
-
-            # Session parameters with variation
-            avg_hr = random.randint(110, 170)
-            max_hr_actual = avg_hr + random.randint(20, 40)
-            duration_hours = random.uniform(0.5, 2.0)
-            calories_burned = int(duration_hours * random.randint(300, 800))
-
-            # Generate SePA fields with realistic distributions (Numerical scale 1-5)
-            # 1 = Very Low/Bad, 2 = Low/Bad, 3 = Medium/Neutral, 4 = High/Good, 5 = Very High/Excellent
-            mood_values = [1, 2, 3, 4, 5]  # Very Bad to Very Good
-            fatigue_values = [1, 2, 3, 4, 5]  # Very Low to Very High
-            effort_values = [1, 2, 3, 4, 5]  # Very Low to Very High
-
-            mood = int(np.random.choice(mood_values, p=[0.05, 0.1, 0.4, 0.3, 0.15]))
-            fatigue = int(np.random.choice(fatigue_values, p=[0.1, 0.2, 0.4, 0.2, 0.1]))
-            effort = int(np.random.choice(effort_values, p=[0.05, 0.15, 0.4, 0.25, 0.15]))
-
-            # Convert duration to minutes
-            duration_min = duration_hours * 60
-
-            # Determine readiness factor
-            readiness_factor = determine_readiness_factor(fatigue, mood, effort)
-
-            if workout_type == 'Strength':
-                # For Strength workouts, create multiple exercise rows
-                exercises_per_workout = random.randint(4, 8)
-
-                # Calculate base 1RM estimation for this user
-                base_1rm = weight_variation * (1.0 + (base_experience * 0.15)) * readiness_factor
-
-                # Distribute total calories across exercises
-                calories_burned / exercises_per_workout
-
-                for exercise_idx in range(exercises_per_workout):
-                    if records_generated >= target_records:
-                        break
-
-                    # Select random exercise from database
-                    exercise_name = random.choice(EXERCISE_DATABASE) if EXERCISE_DATABASE else f"Strength Exercise {exercise_idx + 1}"
-
-                    # Generate exercise-specific parameters with variation
-                    intensity_variation = generate_intensity_variation(1.0, exercise_idx, exercises_per_workout)
-                    exercise_duration = (duration_min / exercises_per_workout) * intensity_variation
-
-                    # Calculate exercise-specific heart rates
-                    hr_variation = random.uniform(0.9, 1.1)
-                    exercise_avg_hr = int(avg_hr * hr_variation)
-                    exercise_max_hr = int(max_hr_actual * hr_variation)
-
-                    # Calculate exercise-specific 1RM
-                    exercise_1rm = base_1rm * intensity_variation
-
-                    # Calculate calories for this exercise
-                    exercise_calories = calculate_exercise_calories(
-                        weight_variation, exercise_duration, intensity_variation,
-                        exercise_avg_hr, age_variation, base_gender
-                    )
-
-                    # Generate suitability scores
-                    suitability_x = calculate_suitability_x({
-                        'intensity_score': min(10, round((exercise_1rm / 100) * 10, 1)),
-                        'experience_level': base_experience,
-                        'avg_hr': exercise_avg_hr,
-                        'max_hr': exercise_max_hr,
-                        'duration_min': exercise_duration,
-                        'calories': exercise_calories
-                    })
-
-                    # Calculate rest period based on intensity
-                    if exercise_1rm > 80:  # Heavy strength
-                        rest_period = random.uniform(120, 180)  # 2-3 minutes
-                    elif exercise_1rm > 50:  # Moderate strength
-                        rest_period = random.uniform(60, 120)   # 1-2 minutes
-                    else:  # Light strength
-                        rest_period = random.uniform(30, 60)    # 30-60 seconds
-
-                    enhanced_row = {
-                        'exercise_name': exercise_name,
-                        'duration_min': round(exercise_duration, 1),
-                        'avg_hr': exercise_avg_hr,
-                        'max_hr': exercise_max_hr,
-                        'calories': round(exercise_calories, 1),
-                        'fatigue': fatigue,
-                        'effort': effort,
-                        'mood': mood,
-                        'suitability_x': round(suitability_x, 2),
-                        'age': age_variation,
-                        'height_m': base_height_m,
-                        'weight_kg': weight_variation,
-                        'bmi': round(calculate_bmi(weight_variation, base_height_m), 2),
-                        'fat_percentage': round(estimate_body_fat_from_bmi(calculate_bmi(weight_variation, base_height_m), age_variation, base_gender), 2),
-                        'resting_heartrate': base_resting_hr,
-                        'experience_level': base_experience,
-                        'workout_frequency': base_workout_freq,
-                        'health_status': 'Healthy',
-                        'workout_type': workout_type,
-                        'location': 'Gym',
-                        'injury_or_pain_notes': '',
-                        'gender': base_gender,
-                        'session_duration': duration_min,
-                        'estimated_1rm': round(exercise_1rm, 2),
-                        'pace': 0.0,  # Not applicable for strength
-                        'duration_capacity': round(exercise_duration * 60, 1),  # seconds
-                        'rest_period': round(rest_period, 1),
-                        'intensity_score': min(10, round((exercise_1rm / 100) * 10, 1))
-                    }
-
-                    enhanced_rows.append(enhanced_row)
-                    records_generated += 1
-
-            else:
-                # For non-Strength workouts, create single exercise row
-                exercise_name = f"{workout_type} Session"
-
-                # Calculate metrics using METs-based approach
-                mets = MET_VALUES.get(workout_type, 5.0)
-
-                # Calculate pace for cardio workouts
-                pace = 0.0
-                if workout_type.lower() in ['cardio', 'running', 'cycling']:
-                    # Estimate pace from heart rate and duration
-                    max_hr = calculate_max_hr(age_variation)
-                    hr_ratio = (avg_hr - base_resting_hr) / (max_hr - base_resting_hr)
-                    pace = round(10 * hr_ratio * readiness_factor, 2)  # Rough estimate in km/h
-
-                # Calculate capability metrics
-                metrics = calculate_capability_metrics(
-                    workout_type,
-                    avg_hr=avg_hr,
-                    max_hr=max_hr_actual,
-                    resting_hr=base_resting_hr,
-                    weight_kg=weight_variation,
-                    duration_minutes=duration_min,
-                    readiness_factor=readiness_factor
-                )
-
-                # Generate suitability scores
-                suitability_x = calculate_suitability_x({
-                    'intensity_score': metrics.get('intensity_score', min(10, mets)),
-                    'experience_level': base_experience,
-                    'avg_hr': avg_hr,
-                    'max_hr': max_hr_actual,
-                    'duration_min': duration_min,
-                    'calories': calories_burned
-                })
-
-                enhanced_row = {
-                    'exercise_name': exercise_name,
-                    'duration_min': duration_min,
-                    'avg_hr': avg_hr,
-                    'max_hr': max_hr_actual,
-                    'calories': round(calories_burned, 1),
-                    'fatigue': fatigue,
-                    'effort': effort,
-                    'mood': mood,
-                    'suitability_x': round(suitability_x, 2),
-                    'age': age_variation,
-                    'height_m': base_height_m,
-                    'weight_kg': weight_variation,
-                    'bmi': round(calculate_bmi(weight_variation, base_height_m), 2),
-                    'fat_percentage': round(estimate_body_fat_from_bmi(calculate_bmi(weight_variation, base_height_m), age_variation, base_gender), 2),
-                    'resting_heartrate': base_resting_hr,
-                    'experience_level': base_experience,
-                    'workout_frequency': base_workout_freq,
-                    'health_status': 'Healthy',
-                    'workout_type': workout_type,
-                    'location': 'Gym',
-                    'injury_or_pain_notes': '',
-                    'gender': base_gender,
-                    'session_duration': duration_min,
-                    'estimated_1rm': 0.0,  # Not applicable for non-strength
-                    'pace': pace,
-                    'duration_capacity': metrics.get('duration_capacity', duration_min * 60),
-                    'rest_period': 0.0,  # Continuous session
-                    'intensity_score': metrics.get('intensity_score', min(10, mets))
-                }
-
-                enhanced_rows.append(enhanced_row)
-                records_generated += 1
-
-    # Create enhanced dataframe
-    enhanced_df = pd.DataFrame(enhanced_rows)
+    enhanced_df = generate_enhanced_records(raw_df, target_records, seed, n_jobs)
 
     print(f"Enhanced dataset shape: {enhanced_df.shape}")
-    print(f"Generated {records_generated} records (target: {target_records})")
+    print(f"Generated {len(enhanced_df)} records (target: {target_records})")
 
     # Safety check for empty dataframe
     if len(enhanced_df) == 0:
@@ -1089,40 +1104,299 @@ def process_gym_data_enhanced(input_file: str, output_file: str, target_records:
         return enhanced_df
 
     print("Workout type distribution:")
-    if 'workout_type' in enhanced_df.columns:
-        print(enhanced_df['workout_type'].value_counts())
-    else:
-        print("WARNING: 'workout_type' column not found in enhanced dataframe")
-        print(f"Available columns: {list(enhanced_df.columns)}")
+    print(enhanced_df['workout_type'].value_counts())
 
     # Generate processing report
     generate_processing_report(enhanced_df, output_file, target_records)
 
     return enhanced_df
 
+
+def generate_enhanced_records(raw_df: pd.DataFrame, target_records: int = 10000,
+                              seed: int = 42, n_jobs: int = None) -> pd.DataFrame:
+    """
+    Sinh toàn bộ record ở dạng mảng NumPy thay vì vòng lặp user -> session -> exercise.
+    Thứ tự record giữ nguyên (theo user, rồi session, rồi exercise) và cắt ở target_records.
+
+    Session được sinh một lần, sau đó các record được dựng theo chunk cố định
+    (RECORDS_PER_CHUNK); nhiều chunk thì chạy song song trên n_jobs process
+    (mặc định = số CPU). Kết quả chỉ phụ thuộc seed, không phụ thuộc n_jobs.
+    """
+    n_users = len(raw_df)
+    if n_users == 0 or target_records <= 0:
+        return pd.DataFrame(columns=ENHANCED_COLUMNS)
+
+    # Một SeedSequence gốc, mỗi stage/chunk một Generator con (spawn) thay vì seed global.
+    # Các stream độc lập nên vẫn tái lập được khi các chunk chạy song song.
+    session_seed, records_seed = np.random.SeedSequence(seed).spawn(2)
+    session_rng = np.random.default_rng(session_seed)
+
+    # Generate multiple sessions per user to reach target
+    sessions_per_user = max(1, target_records // n_users)
+    print(f"\n[DEBUG] Generating ~{sessions_per_user} workout sessions per user...")
+
+    # Extract base user profiles (đọc DataFrame một lần, các bước sau chỉ dùng ndarray)
+    users = _UserProfiles.from_frame(raw_df)
+
+    # ---------- Session level ----------
+    session_user = np.repeat(np.arange(n_users), sessions_per_user)
+    n_sessions = len(session_user)
+    experience = users.experience[session_user]
+
+    # Toàn bộ uniform của stage session bốc một lần thành block (K, N), mỗi biến một hàng
+    u = session_rng.random((11, n_sessions))
+
+    # Add variation to user profile for different sessions
+    age = np.clip(users.age[session_user] + _uniform_int(u[0], -2, 2), 18, 65)
+    weight = np.clip(users.weight_kg[session_user] + (4 * u[1] - 2), 40, 150)
+
+    # workout_type bốc thẳng ra int8 code (inverse CDF, cùng một uniform cho cả hai bảng xác suất);
+    # label chỉ dựng lại ở DataFrame cuối bằng Categorical.from_codes
+    type_code = np.where(
+        experience >= 2,
+        _weighted_index(u[2], WORKOUT_TYPE_CDF_EXPERIENCED),
+        _weighted_index(u[2], WORKOUT_TYPE_CDF_BEGINNER),
+    ).astype(np.int8)
+
+    # Session parameters with variation
+    avg_hr = _uniform_int(u[3], 110, 170)
+    max_hr_actual = avg_hr + _uniform_int(u[4], 20, 40)
+    duration_hours = 0.5 + 1.5 * u[5]
+    calories_burned = (duration_hours * _uniform_int(u[6], 300, 800)).astype(int)
+
+    mood = SEPA_SCALE[_weighted_index(u[7], MOOD_CDF)]
+    fatigue = SEPA_SCALE[_weighted_index(u[8], FATIGUE_CDF)]
+    effort = SEPA_SCALE[_weighted_index(u[9], EFFORT_CDF)]
+
+    duration_min = duration_hours * 60
+    readiness_factor = _readiness_factor_array(fatigue, mood, effort)
+
+    # Strength -> 4-8 exercise rows, các loại khác -> 1 row
+    is_strength = type_code == STRENGTH_CODE
+    rows_per_session = np.where(is_strength, _uniform_int(u[10], 4, 8), 1)
+
+    sessions = _SessionArrays(
+        age=age,
+        weight=weight,
+        height=users.height_m[session_user],
+        gender=users.gender[session_user],
+        resting_hr=users.resting_hr[session_user],
+        experience=experience,
+        workout_frequency=users.workout_frequency[session_user],
+        type_code=type_code,
+        avg_hr=avg_hr,
+        max_hr=max_hr_actual,
+        duration_min=duration_min,
+        calories=calories_burned,
+        mood=mood,
+        fatigue=fatigue,
+        effort=effort,
+        readiness_factor=readiness_factor,
+        rows_per_session=rows_per_session,
+        base_1rm=weight * (1.0 + experience * 0.15) * readiness_factor,
+    )
+
+    # ---------- Record level ----------
+    session_start = np.cumsum(rows_per_session) - rows_per_session
+    row_session = np.repeat(np.arange(n_sessions), rows_per_session)[:target_records]
+    exercise_idx = np.arange(len(row_session)) - session_start[row_session]
+
+    # Mỗi chunk chỉ mang theo slice session mà nó dùng
+    bounds = list(range(0, len(row_session), RECORDS_PER_CHUNK))
+    chunk_seeds = records_seed.spawn(len(bounds))
+    chunk_args = []
+    for start, chunk_seed in zip(bounds, chunk_seeds):
+        chunk_sessions = row_session[start:start + RECORDS_PER_CHUNK]
+        lo, hi = chunk_sessions[0], chunk_sessions[-1] + 1
+        chunk_args.append((
+            sessions.slice(lo, hi),
+            chunk_sessions - lo,
+            exercise_idx[start:start + RECORDS_PER_CHUNK],
+            chunk_seed,
+        ))
+
+    n_workers = min(len(chunk_args), n_jobs or os.cpu_count() or 1)
+    if n_workers > 1:
+        print(f"[DEBUG] Building {len(chunk_args)} record chunks on {n_workers} processes...")
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            frames = list(executor.map(_build_record_chunk, *zip(*chunk_args)))
+    else:
+        frames = [_build_record_chunk(*args) for args in chunk_args]
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _tighten_dtypes(columns: dict) -> dict:
+    """Ép các cột số về int8/int16/float32 theo RECORD_DTYPES trước khi dựng DataFrame"""
+    for name, dtype in RECORD_DTYPES.items():
+        values = np.asarray(columns[name])
+        # Cột lấy từ raw data có thể có NaN/số lẻ -> không ép sang int
+        if np.issubdtype(dtype, np.integer) and not np.all(np.mod(values, 1) == 0):
+            dtype = np.float32
+        columns[name] = values.astype(dtype, copy=False)
+    return columns
+
+
+def _constant_column(value: str, n: int) -> pd.Categorical:
+    """Cột hằng dạng Categorical: một category + code int8, không lặp n string object"""
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[value])
+
+
+def _scatter(mask: np.ndarray, strength_values, other_values, dtype=float) -> np.ndarray:
+    """Ghép giá trị của row Strength / non-Strength vào một cột đầy đủ theo mask"""
+    column = np.empty(len(mask), dtype=dtype)
+    column[mask] = strength_values
+    column[~mask] = other_values
+    return column
+
+
+def _build_record_chunk(sessions: _SessionArrays, row_session: np.ndarray, exercise_idx: np.ndarray,
+                        seed_seq: np.random.SeedSequence) -> pd.DataFrame:
+    """
+    Dựng các record (exercise rows) cho một chunk session.
+    Hàm thuần ở module level để chạy được trong ProcessPoolExecutor; bảng tên bài tập
+    lấy từ module (EXERCISE_NAMES đã sort nên giống nhau giữa các process).
+    """
+    strength_rng, other_rng = (np.random.default_rng(child) for child in seed_seq.spawn(2))
+
+    type_code = sessions.type_code
+    strength_rows = type_code[row_session] == STRENGTH_CODE
+
+    # Strength: mỗi exercise một row
+    s = row_session[strength_rows]
+    s_idx = exercise_idx[strength_rows]
+    s_total = sessions.rows_per_session[s]
+    n_strength = len(s)
+    # Block uniform cho row Strength: tên bài, intensity, HR, rest period, suitability
+    su = strength_rng.random((5, n_strength))
+
+    if len(EXERCISE_NAMES):
+        strength_name_code = STRENGTH_NAME_CODES[_uniform_int(su[0], 0, len(EXERCISE_NAMES) - 1)]
+    else:
+        strength_name_code = STRENGTH_NAME_CODES[s_idx]
+
+    intensity_variation = _intensity_variation_array(su[1], s_idx, s_total)
+    exercise_duration = (sessions.duration_min[s] / s_total) * intensity_variation
+
+    hr_variation = 0.9 + 0.2 * su[2]
+    exercise_avg_hr = (sessions.avg_hr[s] * hr_variation).astype(int)
+    exercise_max_hr = (sessions.max_hr[s] * hr_variation).astype(int)
+
+    exercise_1rm = sessions.base_1rm[s] * intensity_variation
+    exercise_calories = _exercise_calories_array(
+        sessions.weight[s], exercise_duration, intensity_variation,
+        exercise_avg_hr, sessions.age[s], sessions.gender[s]
+    )
+    strength_intensity = np.minimum(10, np.round((exercise_1rm / 100) * 10, 1))
+
+    # Rest period theo tier 1RM (side='left' -> ngưỡng so sánh strict >)
+    rest_tier = np.searchsorted(REST_1RM_THRESHOLDS, exercise_1rm, side='left')
+    rest_low = REST_PERIOD_LOW[rest_tier]
+    rest_period = rest_low + (REST_PERIOD_HIGH[rest_tier] - rest_low) * su[3]
+
+    # Non-Strength: một row cho cả session
+    o = row_session[~strength_rows]
+    other_code = type_code[o]
+    other_rhr = sessions.resting_hr[o]
+    other_avg_hr = sessions.avg_hr[o]
+    other_readiness = sessions.readiness_factor[o]
+
+    # Pace cho cardio ước tính từ nhịp tim (km/h)
+    max_hr_by_age = np.round(208 - 0.7 * sessions.age[o])
+    pace = np.where(
+        TYPE_HAS_HR_PACE[other_code],
+        np.round(10 * (other_avg_hr - other_rhr) / (max_hr_by_age - other_rhr) * other_readiness, 2),
+        0.0,
+    )
+
+    other_capacity, other_intensity = _capability_metrics_array(
+        other_code, other_avg_hr, other_rhr, sessions.duration_min[o], other_readiness
+    )
+
+    # Các cột chung lấy từ session/user profile
+    height = sessions.height[row_session]
+    weight = sessions.weight[row_session]
+    age = sessions.age[row_session]
+    gender = sessions.gender[row_session]
+    bmi = np.round(np.where(height > 0, weight / np.where(height > 0, height, 1) ** 2, np.nan), 2)
+    fat = np.round(np.clip(1.20 * bmi + 0.23 * age - np.where(gender == 1, 16.2, 5.4), 0, 50), 2)
+    session_duration = sessions.duration_min[row_session]
+
+    columns = {
+        'exercise_name': pd.Categorical.from_codes(
+            _scatter(strength_rows, strength_name_code, SESSION_NAME_CODES[other_code], np.int32),
+            categories=RECORD_NAME_CATEGORIES,
+        ),
+        'duration_min': _scatter(strength_rows, np.round(exercise_duration, 1), session_duration[~strength_rows]),
+        'avg_hr': _scatter(strength_rows, exercise_avg_hr, other_avg_hr, int),
+        'max_hr': _scatter(strength_rows, exercise_max_hr, sessions.max_hr[o], int),
+        'calories': _scatter(strength_rows, np.round(exercise_calories, 1), sessions.calories[o]),
+        'fatigue': sessions.fatigue[row_session],
+        'effort': sessions.effort[row_session],
+        'mood': sessions.mood[row_session],
+        'suitability_x': _scatter(strength_rows, _suitability_x_array(su[4]),
+                                  _suitability_x_array(other_rng.random(len(o)))),
+        'age': age,
+        'height_m': height,
+        'weight_kg': weight,
+        'bmi': bmi,
+        'fat_percentage': fat,
+        'resting_heartrate': sessions.resting_hr[row_session],
+        'experience_level': sessions.experience[row_session],
+        'workout_frequency': sessions.workout_frequency[row_session],
+        'health_status': _constant_column('Healthy', len(row_session)),
+        'workout_type': pd.Categorical.from_codes(type_code[row_session], categories=WORKOUT_TYPES),
+        'location': _constant_column('Gym', len(row_session)),
+        'injury_or_pain_notes': _constant_column('', len(row_session)),
+        'gender': gender,
+        'session_duration': session_duration,
+        'estimated_1rm': _scatter(strength_rows, np.round(exercise_1rm, 2), 0.0),  # Not applicable for non-strength
+        'pace': _scatter(strength_rows, 0.0, pace),  # Not applicable for strength
+        'duration_capacity': _scatter(strength_rows, np.round(exercise_duration * 60, 1), other_capacity),  # seconds
+        'rest_period': _scatter(strength_rows, np.round(rest_period, 1), 0.0),  # Continuous session
+        'intensity_score': _scatter(strength_rows, strength_intensity, other_intensity),
+    }
+
+    # Dựng DataFrame một lần từ dict cột (không concat/sort theo nhánh)
+    return pd.DataFrame(_tighten_dtypes(columns), copy=False)
+
+
 def generate_processing_report(df: pd.DataFrame, output_path: str, target_records: int = 10000):
     """Generate processing summary report"""
     report_path = output_path.replace('.xlsx', '_processing_report.json')
 
+    # Tính value_counts / subset một lần rồi dùng lại cho các mục của report
+    # (cột Categorical: value_counts có cả category không xuất hiện -> bỏ count 0)
+    workout_type_counts = df['workout_type'].value_counts()
+    workout_type_counts = workout_type_counts[workout_type_counts > 0]
+    exercise_counts = df['exercise_name'].value_counts()
+    exercise_counts = exercise_counts[exercise_counts > 0]
+    strength_df = df[df['workout_type'] == 'Strength']
+    # Một lượt isnull cho cả missing_values lẫn data_completeness
+    missing_values = df.isnull().sum()
+
+    def workout_share(workout_type: str) -> str:
+        return f"{workout_type_counts.get(workout_type, 0) / len(df) * 100:.1f}%"
+
     report = {
         'processing_summary': {
             'target_records': target_records,
             'total_records': len(df),
             'achievement_rate': f"{(len(df) / target_records) * 100:.1f}%",
-            'workout_types': df['workout_type'].value_counts().to_dict(),
-            'exercise_count': df[df['exercise_name'] != '']['exercise_name'].nunique(),
-            'unique_exercises': df['exercise_name'].nunique()
+            'workout_types': workout_type_counts.to_dict(),
+            'exercise_count': len(exercise_counts) - int('' in exercise_counts.index),
+            'unique_exercises': len(exercise_counts)
         },
         'data_quality': {
-            'missing_values': df.isnull().sum().to_dict(),
+            'missing_values': missing_values.to_dict(),
             'avg_calories_per_exercise': df['calories'].mean(),
             'avg_intensity_score': df['intensity_score'].mean(),
             'avg_session_duration': df['session_duration'].mean(),
             'avg_suitability_x': df['suitability_x'].mean(),
-            'data_completeness': f"{100 - (df.isnull().sum().sum() / (len(df) * len(df.columns)) * 100):.1f}%"
+            'data_completeness': f"{100 - (missing_values.sum() / (len(df) * len(df.columns)) * 100):.1f}%"
         },
         'health_metrics': {
-            'avg_1rm_strength': df[df['workout_type'] == 'Strength']['estimated_1rm'].mean(),
+            'avg_1rm_strength': strength_df['estimated_1rm'].mean(),
             'avg_bmi': df['bmi'].mean(),
             'avg_fat_percentage': df['fat_percentage'].mean(),
             'age_distribution': df['age'].describe().to_dict(),
@@ -1130,11 +1404,11 @@ def generate_processing_report(df: pd.DataFrame, output_path: str, target_record
             'experience_level_distribution': df['experience_level'].value_counts().to_dict()
         },
         'workout_diversity': {
-            'strength_percentage': f"{(df['workout_type'] == 'Strength').mean() * 100:.1f}%",
-            'cardio_percentage': f"{(df['workout_type'] == 'Cardio').mean() * 100:.1f}%",
-            'hiit_percentage': f"{(df['workout_type'] == 'HIIT').mean() * 100:.1f}%",
-            'yoga_percentage': f"{(df['workout_type'] == 'Yoga').mean() * 100:.1f}%",
-            'avg_exercises_per_strength_session': df[df['workout_type'] == 'Strength'].groupby('session_duration').size().mean() if len(df[df['workout_type'] == 'Strength']) > 0 else 0
+            'strength_percentage': workout_share('Strength'),
+            'cardio_percentage': workout_share('Cardio'),
+            'hiit_percentage': workout_share('HIIT'),
+            'yoga_percentage': workout_share('Yoga'),
+            'avg_exercises_per_strength_session': strength_df.groupby('session_duration').size().mean() if len(strength_df) > 0 else 0
         },
         'transformations_applied': [
             'Removed ID columns to sync with reference format',
@@ -1152,10 +1426,37 @@ def generate_processing_report(df: pd.DataFrame, output_path: str, target_record
     }
 
     with open(report_path, 'w') as f:
-        json.dump(report, f, indent=2)
+        # default=float: mean/describe của cột float32 trả về numpy scalar
+        json.dump(report, f, indent=2, default=float)
 
     print(f"Processing report saved to {report_path}")
 
+def save_enhanced_dataset(df: pd.DataFrame, output_path: str, also_xlsx: bool = False) -> Path:
+    """
+    Lưu dataset chính dạng Parquet (pyarrow, zstd) cạnh output_path; Excel chỉ ghi khi also_xlsx=True.
+    Không có pyarrow thì fallback về .xlsx như trước.
+    Returns: đường dẫn file chính đã ghi
+    """
+    xlsx_path = Path(output_path).with_suffix('.xlsx')
+    parquet_path = xlsx_path.with_suffix('.parquet')
+    xlsx_path.parent.mkdir(parents=True, exist_ok=True)
+
+    primary_path = parquet_path
+    try:
+        df.to_parquet(parquet_path, engine='pyarrow', compression='zstd', index=False)
+        print(f"Enhanced data saved to {parquet_path}")
+    except ImportError as e:
+        print(f"Warning: Could not write Parquet ({e}), saving Excel instead")
+        primary_path = xlsx_path
+        also_xlsx = True
+
+    if also_xlsx:
+        # float32 -> in gọn (tránh 0.47999998 trong Excel)
+        df.to_excel(xlsx_path, index=False, float_format='%.6g')
+        print(f"Enhanced data saved to {xlsx_path}")
+
+    return primary_path
+
 # ==================== LEGACY COMPATIBILITY FUNCTION ====================
 
 def process_gym_data(input_file, output_file, is_individual_exercises=False):
@@ -1207,9 +1508,8 @@ def process_legacy_individual_exercises(input_file: str, output_file: str) -> pd
 
 def main():
     """Main execution function implementing Strategy_Analysis.md recommendations"""
-    # Set random seed for reproducibility
-    random.seed(42)
-    np.random.seed(42)
+    # Seed gốc cho SeedSequence của generator (reproducibility)
+    seed = 42
 
     print("="*80)
     print("ENHANCED GYM DATA PROCESSOR")
@@ -1225,13 +1525,10 @@ def main():
     try:
         # Process data with enhanced strategy
         print(f"\n[PROCESSING] {input_path} -> Target: {target_records} records")
-        enhanced_df = process_gym_data_enhanced(input_path, output_path, target_records)
-
-        # Save the enhanced data
-        output_full_path = Path(output_path)
-        output_full_path.parent.mkdir(parents=True, exist_ok=True)
+        enhanced_df = process_gym_data_enhanced(input_path, output_path, target_records, seed=seed)
 
-        enhanced_df.to_excel(output_full_path, index=False)
+        # Save the enhanced data (Parquet; thêm also_xlsx=True nếu cần bản Excel)
+        output_full_path = save_enhanced_dataset(enhanced_df, output_path)
 
         print("\n" + "="*80)
         print("[SUCCESS] DATA ENHANCEMENT COMPLETED SUCCESSFULLY")
@@ -9,10 +9,17 @@ Mục đích để tổng hợp dữ liệu các sheet về cùng 1 sheet để
 # ========== 1️⃣ Đọc dữ liệu từ 4 sheet ==========
 file_path = "./data/WorkoutTrackerDataset.xlsx"
 
-user_df = pd.read_excel(file_path, sheet_name="User")
-health_df = pd.read_excel(file_path, sheet_name="User Health Profile")
-session_df = pd.read_excel(file_path, sheet_name="Workout Tracker Dataset")
-response_df = pd.read_excel(file_path, sheet_name="Workout Detail")
+# Đọc cả 4 sheet trong 1 lần parse workbook, ưu tiên engine calamine (Rust) thay cho openpyxl
+# (pip install python-calamine); không có thì fallback về engine mặc định
+sheet_names = ["User", "User Health Profile", "Workout Tracker Dataset", "Workout Detail"]
+try:
+    sheets = pd.read_excel(file_path, sheet_name=sheet_names, engine="calamine")
+except ImportError:
+    sheets = pd.read_excel(file_path, sheet_name=sheet_names)
+user_df = sheets["User"]
+health_df = sheets["User Health Profile"]
+session_df = sheets["Workout Tracker Dataset"]
+response_df = sheets["Workout Detail"]
 
 # ========== 2️⃣ Ghép Workout Tracker Data ↔ User Health Profile ==========
 merged_workout_health = pd.merge(
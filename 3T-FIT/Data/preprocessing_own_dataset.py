@@ -4,9 +4,17 @@ Dữ liệu sẽ được loại bỏ các thông tin không cần thiết và 
 
 """
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+# Chuỗi set dùng Arrow (split/strip chạy trong C++) nếu có pyarrow, ngược lại giữ str
+try:
+    import pyarrow  # noqa: F401
+    SET_STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    SET_STRING_DTYPE = str
+
 
 def calculate_1rm(weight, reps):
     """
@@ -16,117 +24,106 @@ def calculate_1rm(weight, reps):
     return weight * (1 + reps / 30)
 
 
-def extract_intensity(row):
+INTENSITY_COLUMNS = ['estimated_1rm', 'pace', 'duration_capacity', 'rest_period', 'intensity_score']
+
+
+def split_set_entries(series):
+    """
+    Tách cột dạng "12x40x2 | 10x45x2" thành các set riêng lẻ.
+    Trả về (row_pos, values, n_parts):
+    - row_pos: vị trí (0..N-1) của dòng gốc cho mỗi set
+    - values: mảng (n_set, 3) các thành phần số, NaN nếu không parse được
+    - n_parts: số thành phần của mỗi set
+    """
+    entries = (series.reset_index(drop=True).dropna().astype(SET_STRING_DTYPE)
+               .str.replace('|', ',', regex=False)
+               .str.lower()
+               .str.split(',')
+               .explode()
+               .astype(SET_STRING_DTYPE)
+               .str.strip())
+    parts = entries.str.split('x', expand=True).reindex(columns=range(3))
+    values = np.column_stack([
+        pd.to_numeric(parts[i], errors='coerce').to_numpy(dtype=float, na_value=np.nan) for i in range(3)
+    ]) if len(entries) else np.empty((0, 3))
+    n_parts = (entries.str.count('x') + 1).to_numpy(dtype=np.int64)
+    return entries.index.to_numpy(dtype=np.intp), values, n_parts
+
+
+def has_set_entries(df, column):
+    """
+    Kiểm tra cột set có tồn tại và có ít nhất một giá trị không rỗng,
+    để bỏ qua bước tách chuỗi khi cột không có dữ liệu
+    """
+    if column not in df.columns:
+        return False
+    values = df[column].dropna()
+    if values.empty or not values.astype(str).str.strip().ne('').any():
+        print(f"  - Cột '{column}' không có dữ liệu set, bỏ qua")
+        return False
+    return True
+
+
+def _max_by_row(out, row_pos, values, mask):
+    """Ghi max theo từng dòng vào mảng out (khởi tạo 0) cho các set thỏa mask"""
+    np.maximum.at(out, row_pos[mask], values[mask])
+    return out
+
+
+def extract_intensity(df):
     """
     Tính toán các chỉ số năng lực (Capability Metrics) dựa trên loại bài tập.
-    Trả về Series gồm:
+    Trả về mảng (N, 5) theo thứ tự INTENSITY_COLUMNS:
     - estimated_1rm: Sức mạnh tối đa (kg) cho bài Strength
     - pace: Tốc độ (km/h) cho bài Cardio
     - duration_capacity: Thời gian chịu đựng (phút/giây) cho bài Static
     - rest_period: Thời gian nghỉ (giây)
     - intensity_score: Điểm cường độ (1-4) cho các bài khác
     """
-    result = {
-        'estimated_1rm': 0.0,
-        'pace': 0.0,
-        'duration_capacity': 0.0,
-        'rest_period': 0.0,
-        'intensity_score': 0.0
-    }
+    n = len(df)
+    estimated_1rm = np.zeros(n)
+    pace = np.zeros(n)
+    duration = np.zeros(n)
+    strength_rest = np.zeros(n)
+    static_rest = np.zeros(n)
+    intensity_score = np.zeros(n)
 
     # 1. Xử lý Strength: sets/reps/weight/timeresteachset
     # Format dự kiến: "Reps x Weight x Rest" (VD: 12x40x2)
-    if pd.notna(row.get('sets/reps/weight/timeresteachset')):
-        try:
-            data = str(row['sets/reps/weight/timeresteachset'])
-            sets = data.replace('|', ',').split(',')
-            max_1rm = 0
-            max_rest = 0
-            has_valid_set = False
-            
-            for s in sets:
-                parts = s.strip().lower().split('x')
-                if len(parts) >= 2:
-                    try:
-                        reps = float(parts[0])
-                        weight = float(parts[1])
-                        
-                        # Parse Rest if available (3rd component)
-                        if len(parts) >= 3:
-                            rest = float(parts[2])
-                            if rest > max_rest: max_rest = rest
+    if has_set_entries(df, 'sets/reps/weight/timeresteachset'):
+        row_pos, v, n_parts = split_set_entries(df['sets/reps/weight/timeresteachset'])
+        reps, weight, rest = v[:, 0], v[:, 1], v[:, 2]
+        valid = ~np.isnan(reps) & ~np.isnan(weight) & ((n_parts < 3) | ~np.isnan(rest))
 
-                        # Chỉ tính nếu weight > 0 (bài tập tạ)
-                        if weight > 0:
-                            rm = calculate_1rm(weight, reps)
-                            if rm > max_1rm:
-                                max_1rm = rm
-                            has_valid_set = True
-                    except ValueError:
-                        continue
-            
-            if has_valid_set and max_1rm > 0:
-                result['estimated_1rm'] = round(max_1rm, 2)
-            
-            if max_rest > 0:
-                result['rest_period'] = round(max_rest, 2)
-                
-        except Exception:
-            pass
+        # Chỉ tính nếu weight > 0 (bài tập tạ), Epley: 1RM = Weight * (1 + Reps/30)
+        _max_by_row(estimated_1rm, row_pos, weight * (1 + reps / 30), valid & (weight > 0))
+        _max_by_row(strength_rest, row_pos, rest, valid & (n_parts >= 3))
 
     # 2. Xử lý Static/Endurance: sets/time_m/timeresteachset
-    # Format: "Sets x Time(min/sec) x Rest" (VD: 3x60x30)
-    if pd.notna(row.get('sets/time_m/timeresteachset')):
-        try:
-            data = str(row['sets/time_m/timeresteachset'])
-            sets = data.replace('|', ',').split(',')
-            max_duration = 0
-            max_rest = 0
-            
-            for s in sets:
-                parts = s.strip().lower().split('x')
-                if len(parts) >= 2:
-                    try:
-                        val1 = float(parts[0])
-                        val2 = float(parts[1])
-                        
-                        if len(parts) == 3:
-                            # 3x60x30 -> Sets x Duration x Rest
-                            duration = val2
-                            rest = float(parts[2])
-                        else:
-                            # 60x30 -> Duration x Rest (per set entry)
-                            duration = val1
-                            rest = val2
-                            
-                        if duration > max_duration: max_duration = duration
-                        if rest > max_rest: max_rest = rest
-                        
-                    except ValueError:
-                        continue
-            
-            if max_duration > 0:
-                result['duration_capacity'] = round(max_duration, 2)
-            
-            # Update rest if found here and greater than existing
-            if max_rest > 0 and max_rest > result['rest_period']:
-                result['rest_period'] = round(max_rest, 2)
-                
-        except Exception:
-            pass
+    # Format: "Sets x Time(min/sec) x Rest" (VD: 3x60x30) hoặc "Duration x Rest" (VD: 60x30)
+    if has_set_entries(df, 'sets/time_m/timeresteachset'):
+        row_pos, v, n_parts = split_set_entries(df['sets/time_m/timeresteachset'])
+        three_parts = n_parts == 3
+        valid = ~np.isnan(v[:, 0]) & ~np.isnan(v[:, 1]) & (~three_parts | ~np.isnan(v[:, 2]))
+
+        _max_by_row(duration, row_pos, np.where(three_parts, v[:, 1], v[:, 0]), valid)
+        _max_by_row(static_rest, row_pos, np.where(three_parts, v[:, 2], v[:, 1]), valid)
 
     # 3. Xử lý Cardio Distance: distance_km
     # Tính tốc độ km/h = distance_km / session_duration (giờ)
-    if pd.notna(row.get('distance_km')) and row.get('distance_km') > 0:
-        if pd.notna(row.get('session_duration')) and row.get('session_duration') > 0:
-            speed = row['distance_km'] / row['session_duration']
-            result['pace'] = round(speed, 2)
+    if 'distance_km' in df.columns and 'session_duration' in df.columns:
+        distance = df['distance_km'].to_numpy(dtype=float)
+        hours = df['session_duration'].to_numpy(dtype=float)
+        np.divide(distance, hours, out=pace, where=(distance > 0) & (hours > 0))
 
     # 4. Fallback: Intensity Score (1-4)
-    if pd.notna(row.get('intensity')):
-        result['intensity_score'] = round(row['intensity'], 2)
-    
-    return pd.Series(result)
+    if 'intensity' in df.columns:
+        intensity_score = np.nan_to_num(df['intensity'].to_numpy(dtype=float), nan=0.0)
+
+    rest_period = np.maximum(strength_rest.round(2), static_rest.round(2))
+    return np.column_stack([
+        estimated_1rm.round(2), pace.round(2), duration.round(2), rest_period, intensity_score.round(2)
+    ])
 
 
 def clean_dataset(df: pd.DataFrame) -> pd.DataFrame:
@@ -242,8 +239,7 @@ def clean_dataset(df: pd.DataFrame) -> pd.DataFrame:
 
     # Bước 7: Tách các cột cường độ (Capability Metrics)
     print("\nBắt đầu tính toán các chỉ số năng lực (1RM, Pace, Duration, Rest)...")
-    intensity_metrics = df_cleaned.apply(extract_intensity, axis=1)
-    df_cleaned = pd.concat([df_cleaned, intensity_metrics], axis=1)
+    df_cleaned[INTENSITY_COLUMNS] = extract_intensity(df_cleaned)
     
     # Xóa các cột cũ
     cols_to_remove = [
@@ -8,9 +8,17 @@ Author: Claude Code Assistant
 Date: 2025-11-25
 """
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+# Chuỗi set dùng Arrow (split/strip chạy trong C++) nếu có pyarrow, ngược lại giữ str
+try:
+    import pyarrow  # noqa: F401
+    SET_STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    SET_STRING_DTYPE = str
+
 # ==================== SEPA MAPPING FUNCTIONS ====================
 
 # Mapping cho các giá trị SePA từ text sang số (1-5)
@@ -132,9 +140,11 @@ def standardize_sepa_columns(df):
             else:
                 continue
 
-            # Áp dụng mapping
+            # Áp dụng mapping: chỉ gọi map_sepa_to_numeric một lần cho mỗi giá trị duy nhất
             original_col = df[col].copy()
-            df[col] = df[col].apply(lambda x: map_sepa_to_numeric(x, mapping_dict))
+            codes, uniques = pd.factorize(df[col])
+            mapped = np.array([map_sepa_to_numeric(v, mapping_dict) for v in uniques] + [3])
+            df[col] = mapped[codes]
 
             # Thống kê kết quả
             changed_count = (original_col != df[col]).sum()
@@ -162,117 +172,103 @@ def calculate_1rm(weight, reps):
         return 0.0
     return weight * (1 + reps / 30)
 
-def extract_intensity_with_1rm(row):
+def split_set_entries(series):
     """
-    Tính toán các chỉ số năng lực bao gồm cả 1RM
+    Tách cột dạng "12x40x2 | 10x45x2" thành bảng dài, mỗi dòng là một set
 
     Args:
-        row: Dòng dữ liệu workout
+        series: Cột chuỗi set (có thể chứa NaN)
 
     Returns:
-        Series với các metrics: estimated_1rm, pace, duration_capacity, rest_period, intensity_score
+        DataFrame với các cột số 0, 1, 2 (NaN nếu không parse được) và n_parts,
+        index trùng với index dòng gốc (lặp lại cho mỗi set)
     """
-    result = {
-        'estimated_1rm': 0.0,
-        'pace': 0.0,
-        'duration_capacity': 0.0,
-        'rest_period': 0.0,
-        'intensity_score': 0.0
-    }
+    entries = (series.dropna().astype(SET_STRING_DTYPE)
+               .str.replace('|', ',', regex=False)
+               .str.lower()
+               .str.split(',')
+               .explode()
+               .astype(SET_STRING_DTYPE)
+               .str.strip())
+    # Parse số trên object để giữ dtype như cũ (int64 nếu đủ số nguyên, float64 nếu có NaN)
+    parts = entries.str.split('x', expand=True).astype(object).reindex(columns=range(3))
+    values = pd.DataFrame({i: pd.to_numeric(parts[i], errors='coerce') for i in range(3)})
+    values['n_parts'] = (entries.str.count('x') + 1).astype(np.int64)
+    return values
+
+
+def has_set_entries(df, column):
+    """
+    Kiểm tra cột set có tồn tại và có ít nhất một giá trị không rỗng,
+    để bỏ qua bước tách chuỗi khi cột không có dữ liệu
+    """
+    if column not in df.columns:
+        return False
+    values = df[column].dropna()
+    if values.empty or not values.astype(str).str.strip().ne('').any():
+        print(f"  - Cột '{column}' không có dữ liệu set, bỏ qua")
+        return False
+    return True
+
 
-    # 1. Xử lý Strength: sets/reps/weight/timeresteachset
-    if pd.notna(row.get('sets/reps/weight/timeresteachset')):
-        try:
-            data = str(row['sets/reps/weight/timeresteachset'])
-            sets = data.replace('|', ',').split(',')
-            max_1rm = 0
-            max_rest = 0
-            has_valid_set = False
-
-            for s in sets:
-                parts = s.strip().lower().split('x')
-                if len(parts) >= 2:
-                    try:
-                        reps = float(parts[0])
-                        weight = float(parts[1])
-
-                        # Parse Rest nếu có (thành phần thứ 3)
-                        if len(parts) >= 3:
-                            rest = float(parts[2])
-                            if rest > max_rest:
-                                max_rest = rest
-
-                        # Chỉ tính nếu weight > 0 (bài tập tạ)
-                        if weight > 0:
-                            rm = calculate_1rm(weight, reps)
-                            if rm > max_1rm:
-                                max_1rm = rm
-                            has_valid_set = True
-                    except ValueError:
-                        continue
-
-            if has_valid_set and max_1rm > 0:
-                result['estimated_1rm'] = round(max_1rm, 2)
-
-            if max_rest > 0:
-                result['rest_period'] = round(max_rest, 2)
-
-        except Exception:
-            pass
+def _max_per_row(values, index):
+    """Lấy max theo dòng gốc (bỏ qua NaN), giá trị âm/thiếu về 0"""
+    return values.groupby(level=0).max().reindex(index).fillna(0.0).clip(lower=0.0)
+
+
+def extract_intensity_with_1rm(df):
+    """
+    Tính toán các chỉ số năng lực bao gồm cả 1RM cho toàn bộ DataFrame
+
+    Args:
+        df: DataFrame workout
+
+    Returns:
+        DataFrame với các metrics: estimated_1rm, pace, duration_capacity, rest_period, intensity_score
+    """
+    index = df.index
+    zeros = pd.Series(0.0, index=index)
+    estimated_1rm, strength_rest, duration, static_rest = zeros, zeros, zeros, zeros
+
+    # 1. Xử lý Strength: sets/reps/weight/timeresteachset (Reps x Weight x Rest)
+    if has_set_entries(df, 'sets/reps/weight/timeresteachset'):
+        v = split_set_entries(df['sets/reps/weight/timeresteachset'])
+        reps, weight = v[0], v[1]
+        valid = reps.notna() & weight.notna() & ((v['n_parts'] < 3) | v[2].notna())
+
+        # Chỉ tính 1RM nếu weight > 0 (bài tập tạ); reps = 0 cho 1RM = 0
+        one_rm = (weight * (1 + reps / 30)).where(valid & (weight > 0) & (reps != 0))
+        estimated_1rm = _max_per_row(one_rm, index).round(2)
+        strength_rest = _max_per_row(v[2].where(valid & (v['n_parts'] >= 3)), index).round(2)
 
     # 2. Xử lý Static/Endurance: sets/time_m/timeresteachset
-    if pd.notna(row.get('sets/time_m/timeresteachset')):
-        try:
-            data = str(row['sets/time_m/timeresteachset'])
-            sets = data.replace('|', ',').split(',')
-            max_duration = 0
-            max_rest = 0
-
-            for s in sets:
-                parts = s.strip().lower().split('x')
-                if len(parts) >= 2:
-                    try:
-                        val1 = float(parts[0])
-                        val2 = float(parts[1])
-
-                        if len(parts) == 3:
-                            # 3x60x30 -> Sets x Duration x Rest
-                            duration = val2
-                            rest = float(parts[2])
-                        else:
-                            # 60x30 -> Duration x Rest
-                            duration = val1
-                            rest = val2
-
-                        if duration > max_duration:
-                            max_duration = duration
-                        if rest > max_rest:
-                            max_rest = rest
-
-                    except ValueError:
-                        continue
-
-            if max_duration > 0:
-                result['duration_capacity'] = round(max_duration, 2)
-
-            # Update rest nếu lớn hơn giá trị hiện tại
-            if max_rest > 0 and max_rest > result['rest_period']:
-                result['rest_period'] = round(max_rest, 2)
-
-        except Exception:
-            pass
+    if has_set_entries(df, 'sets/time_m/timeresteachset'):
+        v = split_set_entries(df['sets/time_m/timeresteachset'])
+        three_parts = v['n_parts'] == 3
+        valid = v[0].notna() & v[1].notna() & (~three_parts | v[2].notna())
+
+        # 3x60x30 -> Sets x Duration x Rest, 60x30 -> Duration x Rest
+        duration = _max_per_row(v[1].where(three_parts, v[0]).where(valid), index).round(2)
+        static_rest = _max_per_row(v[2].where(three_parts, v[1]).where(valid), index).round(2)
 
     # 3. Xử lý Cardio Distance
-    if pd.notna(row.get('distance_km')) and row.get('distance_km') > 0:
-        if pd.notna(row.get('session_duration')) and row.get('session_duration') > 0:
-            speed = row['distance_km'] / row['session_duration']
-            result['pace'] = round(speed, 2)
+    pace = zeros
+    if 'distance_km' in df.columns and 'session_duration' in df.columns:
+        distance, hours = df['distance_km'], df['session_duration']
+        pace = (distance / hours).where((distance > 0) & (hours > 0), 0.0).round(2)
 
     # 4. Fallback: Intensity Score
-    if pd.notna(row.get('intensity')):
-        result['intensity_score'] = round(row['intensity'], 2)
-
-    return pd.Series(result)
+    intensity_score = zeros
+    if 'intensity' in df.columns:
+        intensity_score = df['intensity'].fillna(0.0).round(2)
+
+    return pd.DataFrame({
+        'estimated_1rm': estimated_1rm,
+        'pace': pace,
+        'duration_capacity': duration,
+        'rest_period': np.maximum(strength_rest, static_rest),
+        'intensity_score': intensity_score
+    }, index=index)
 
 # ==================== MAIN PROCESSING FUNCTION ====================
 
@@ -366,7 +362,7 @@ def clean_test_dataset(df: pd.DataFrame) -> pd.DataFrame:
     print("TÍNH TOÁN CÁC CHỈ SỐ NĂNG LỰC (1RM, PACE, DURATION)")
     print("="*50)
 
-    intensity_metrics = df_cleaned.apply(extract_intensity_with_1rm, axis=1)
+    intensity_metrics = extract_intensity_with_1rm(df_cleaned)
     df_cleaned = pd.concat([df_cleaned, intensity_metrics], axis=1)
 
     # Xóa các cột cũ không cần thiết
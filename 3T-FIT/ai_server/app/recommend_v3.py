@@ -76,22 +76,27 @@ def recommend_v3(
             "Jumping Jacks", "Burpees", "Mountain Climbers", "Lunges", "Box Jumps"
         ]
 
+        # Denormalize predictions and derive HR targets for all top-k exercises at once
+        top_suitability = suitability_scores[top_indices].astype(np.float64)
+        predicted_1rms = denormalize_values(one_rm_predictions[top_indices], target_scales["1RM"])
+        predicted_paces = denormalize_values(0.6 + 0.2 * top_suitability, target_scales["Pace"])
+
+        # Generate realistic HR predictions based on exercise and user profile
+        base_hr = float(profile.get('resting_hr', 70))
+        predicted_avg_hrs = (base_hr + 50 + 20 * top_suitability).astype(int).tolist()
+        predicted_peak_hrs = (base_hr + 80 + 30 * top_suitability).astype(int).tolist()
+
         for i, idx in enumerate(top_indices):
             # Use realistic exercise name based on index
             exercise_name = exercise_names[idx % len(exercise_names)]
-            suitability_score = float(suitability_scores[idx])
-
-            # Denormalize predictions to real values
-            predicted_1rm = denormalize_value(one_rm_predictions[idx], target_scales["1RM"])
-
-            # Generate realistic HR predictions based on exercise and user profile
-            base_hr = float(profile.get('resting_hr', 70))
-            predicted_avg_hr = int(base_hr + 50 + (20 * suitability_score))
-            predicted_peak_hr = int(base_hr + 80 + (30 * suitability_score))
+            suitability_score = float(top_suitability[i])
+            predicted_1rm = float(predicted_1rms[i])
+            predicted_avg_hr = predicted_avg_hrs[i]
+            predicted_peak_hr = predicted_peak_hrs[i]
 
             # Generate realistic secondary parameters
             if decoder.is_cardio_exercise(exercise_name):
-                predicted_pace = denormalize_value(0.6 + 0.2 * suitability_score, target_scales["Pace"])
+                predicted_pace = float(predicted_paces[i])
                 predicted_duration = target_duration
                 predicted_rest = 2.0
             else:
@@ -205,6 +210,21 @@ def denormalize_value(normalized_value: float, scale_range: tuple) -> float:
     normalized_value = max(0.0, min(1.0, float(normalized_value)))
     return min_val + normalized_value * (max_val - min_val)
 
+def denormalize_values(normalized_values: np.ndarray, scale_range: tuple) -> np.ndarray:
+    """
+    Vectorized denormalize_value for an array of model outputs
+
+    Args:
+        normalized_values: Values in [0, 1] range from model output
+        scale_range: (min_value, max_value) tuple
+
+    Returns:
+        Float64 array of denormalized values in actual scale
+    """
+    min_val, max_val = scale_range
+    clipped = np.clip(np.asarray(normalized_values, dtype=np.float64), 0.0, 1.0)
+    return min_val + clipped * (max_val - min_val)
+
 def validate_profile_for_v3(profile: dict) -> tuple[bool, str]:
     """
     Validate user profile for Model v3 compatibility
@@ -4,7 +4,8 @@ import pickle
 import json
 import os
 import logging
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List
 
 from models.model_v4_arch import TwoBranchRecommendationModel
 from schema.recommend_schemas import RecommendInput, RecommendOutput, RecommendedExercise
@@ -16,8 +17,18 @@ logger = logging.getLogger(__name__)
 # Global variables
 MODEL_V4 = None
 SCALER_V4 = None
+_SCALER_MEAN = None
+_SCALER_SCALE = None
 METADATA_V4 = None
 DEVICE = 'cpu'
+MODEL_DTYPE = torch.float32
+INT8_QUANTIZED = False
+
+# CUDA graph replay state (only populated when DEVICE == 'cuda')
+MAX_GRAPH_BATCH = 64
+_CUDA_GRAPH = None
+_GRAPH_INPUT = None
+_GRAPH_OUTPUTS = None
 
 # Feature columns must match the trained model's input
 FEATURE_COLUMNS = [
@@ -29,13 +40,18 @@ FEATURE_COLUMNS = [
     'hr_reserve', 'calorie_efficiency'
 ]
 
+# Column -> position lookup, built once at import
+_COL_IDX = {col: i for i, col in enumerate(FEATURE_COLUMNS)}
+
 def load_model_v4_artifacts(model_dir: str = "d:/dacn_omnimer_health/3T-FIT/ai_server/model/src/v4/personal_model_v4"):
     """Load Model v4 weights, scaler, and metadata"""
-    global MODEL_V4, SCALER_V4, METADATA_V4, DEVICE
+    global MODEL_V4, SCALER_V4, METADATA_V4, DEVICE, MODEL_DTYPE, INT8_QUANTIZED, _SCALER_MEAN, _SCALER_SCALE
     
     try:
         DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
         logger.info(f"Loading Model v4 artifacts from {model_dir} on {DEVICE}...")
+        if DEVICE == 'cpu':
+            _configure_cpu_threads()
 
         # 1. Load Metadata
         meta_path = os.path.join(model_dir, "model_metadata.json")
@@ -52,6 +68,14 @@ def load_model_v4_artifacts(model_dir: str = "d:/dacn_omnimer_health/3T-FIT/ai_s
         if os.path.exists(scaler_path):
             with open(scaler_path, 'rb') as f:
                 SCALER_V4 = pickle.load(f)
+            # Cache the StandardScaler parameters as float32 so inference can skip sklearn's validation
+            n_features = SCALER_V4.n_features_in_
+            mean = SCALER_V4.mean_ if SCALER_V4.mean_ is not None else np.zeros(n_features)
+            scale = SCALER_V4.scale_ if SCALER_V4.scale_ is not None else np.ones(n_features)
+            _SCALER_MEAN = mean.astype(np.float32)
+            _SCALER_SCALE = scale.astype(np.float32)
+            # Cached rows were scaled with the previous scaler
+            _scaled_input_row.cache_clear()
         else:
             logger.error("Scaler not found! Model v4 cannot function without scaler.")
             return False
@@ -60,10 +84,25 @@ def load_model_v4_artifacts(model_dir: str = "d:/dacn_omnimer_health/3T-FIT/ai_s
         weights_path = os.path.join(model_dir, "model_weights.pth")
         if os.path.exists(weights_path):
             model = TwoBranchRecommendationModel(input_dim=input_dim)
-            model.load_state_dict(torch.load(weights_path, map_location=DEVICE))
+            # mmap + weights_only: tensors are paged in from disk instead of unpickling the whole file
+            model.load_state_dict(torch.load(weights_path, map_location=DEVICE, mmap=True, weights_only=True))
             model.to(DEVICE)
+            if DEVICE == 'cuda':
+                # Half-width weights halve parameter bandwidth; prefer BF16 for its FP32 exponent range
+                MODEL_DTYPE = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            else:
+                # CPU keeps FP32 weights: Linear layers are int8-quantized below,
+                # with BF16 autocast as the fallback if quantization is unavailable
+                MODEL_DTYPE = torch.float32
+            model.to(MODEL_DTYPE)
             model.eval()
-            MODEL_V4 = model
+            if DEVICE == 'cuda':
+                # The captured CUDA graph already removes launch overhead, so skip torch.compile here
+                MODEL_V4 = model
+                _capture_cuda_graph(model, input_dim)
+            else:
+                model = _quantize_model(model)
+                MODEL_V4 = _compile_model(model, input_dim)
             logger.info("✅ Model v4 loaded successfully")
             return True
         else:
@@ -74,31 +113,115 @@ def load_model_v4_artifacts(model_dir: str = "d:/dacn_omnimer_health/3T-FIT/ai_s
         logger.error(f"❌ Error loading Model v4: {e}")
         return False
 
+def _configure_cpu_threads():
+    """Cap intra-op threads for the small v4 MLP and enable oneDNN kernels"""
+    torch.backends.mkldnn.enabled = True
+    torch.set_num_threads(min(4, os.cpu_count() or 1))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once per process, before any inter-op work (e.g. on a reload)
+        pass
+
+def _quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of the Linear layers for CPU inference"""
+    global INT8_QUANTIZED
+    try:
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        INT8_QUANTIZED = True
+        logger.info("Model v4 Linear layers quantized to int8")
+        return quantized
+    except Exception as e:
+        INT8_QUANTIZED = False
+        logger.warning(f"⚠️ int8 quantization unavailable, using FP32 Model v4: {e}")
+        return model
+
+def _autocast():
+    """BF16 autocast for the non-quantized CPU model; CUDA weights are already cast to MODEL_DTYPE at load"""
+    return torch.autocast(device_type='cpu', dtype=torch.bfloat16, enabled=DEVICE == 'cpu' and not INT8_QUANTIZED)
+
+def _compile_model(model: torch.nn.Module, input_dim: int) -> torch.nn.Module:
+    """torch.compile the forward pass once and warm it up; fall back to eager on failure"""
+    try:
+        compiled = torch.compile(model, mode="reduce-overhead", fullgraph=True, dynamic=True)
+        # Warm-up so the first real request does not pay for compilation.
+        # Batch of 2: dynamo specializes size-1 dims, which would force a recompile later.
+        with torch.no_grad(), _autocast():
+            compiled(torch.zeros((2, input_dim), device=DEVICE, dtype=MODEL_DTYPE))
+        logger.info("Model v4 forward pass compiled with torch.compile")
+        return compiled
+    except Exception as e:
+        logger.warning(f"⚠️ torch.compile unavailable, using eager Model v4: {e}")
+        return model
+
+def _capture_cuda_graph(model: torch.nn.Module, input_dim: int):
+    """Capture the forward pass over a static (MAX_GRAPH_BATCH, input_dim) buffer as a CUDA graph"""
+    global _CUDA_GRAPH, _GRAPH_INPUT, _GRAPH_OUTPUTS
+    _CUDA_GRAPH = _GRAPH_INPUT = _GRAPH_OUTPUTS = None
+    try:
+        static_input = torch.zeros((MAX_GRAPH_BATCH, input_dim), device=DEVICE, dtype=MODEL_DTYPE)
+
+        # Warm up on a side stream before capture, as CUDA graphs require
+        side_stream = torch.cuda.Stream()
+        side_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(side_stream), torch.no_grad():
+            for _ in range(3):
+                model(static_input)
+        torch.cuda.current_stream().wait_stream(side_stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.no_grad(), torch.cuda.graph(graph):
+            static_outputs = model(static_input)
+
+        _CUDA_GRAPH, _GRAPH_INPUT, _GRAPH_OUTPUTS = graph, static_input, static_outputs
+        logger.info(f"Model v4 forward pass captured as CUDA graph (batch <= {MAX_GRAPH_BATCH})")
+    except Exception as e:
+        logger.warning(f"⚠️ CUDA graph capture failed, using eager Model v4: {e}")
+
+def _predict(X_tensor: torch.Tensor):
+    """Run Model v4, replaying the captured CUDA graph when the batch fits"""
+    n = X_tensor.shape[0]
+    if _CUDA_GRAPH is not None and n <= MAX_GRAPH_BATCH:
+        _GRAPH_INPUT[:n].copy_(X_tensor, non_blocking=True)
+        _CUDA_GRAPH.replay()
+        intensity_pred, suitability_pred = _GRAPH_OUTPUTS
+        return intensity_pred[:n], suitability_pred[:n]
+
+    with torch.no_grad(), _autocast():
+        return MODEL_V4(X_tensor)
+
+# Text -> 1-5 scale lookup, built once at import
+_TEXT_TO_NUMERIC = {
+    'very bad': 1, 'bad': 2, 'neutral': 3, 'good': 4, 'very good': 5, 'excellent': 5,
+    'very low': 1, 'low': 2, 'medium': 3, 'high': 4, 'very high': 5,
+    'beginner': 1, 'intermediate': 2, 'advanced': 3, 'pro': 4, 'expert': 4,
+    'male': 1, 'female': 0, 'other': 0
+}
+
 def _map_text_to_numeric(value: str) -> int:
     """Map text values to 1-5 scale"""
-    mapping = {
-        'very bad': 1, 'bad': 2, 'neutral': 3, 'good': 4, 'very good': 5, 'excellent': 5,
-        'very low': 1, 'low': 2, 'medium': 3, 'high': 4, 'very high': 5,
-        'beginner': 1, 'intermediate': 2, 'advanced': 3, 'pro': 4, 'expert': 4,
-        'male': 1, 'female': 0, 'other': 0
-    }
-    return mapping.get(str(value).lower(), 3)
-
-def _prepare_input_vector(profile: HealthProfile, exercise: Dict[str, Any], goal_type: str) -> np.ndarray:
-    """Convert request + exercise candidate into feature vector"""
+    if value is None:
+        return 3
+    key = value.lower() if isinstance(value, str) else str(value).lower()
+    return _TEXT_TO_NUMERIC.get(key, 3)
+
+def _profile_key(profile: HealthProfile) -> tuple:
+    """Hashable tuple of the profile fields that feed the feature vector"""
+    return (
+        profile.age, profile.height, profile.weight, profile.bmi, profile.bodyFatPercentage,
+        profile.restingHeartRate, profile.gender, profile.experienceLevel, profile.workoutFrequency
+    )
+
+def _prepare_input_vector(age: int, height_cm: float, weight: float, bmi: float, fat: float, rhr: int,
+                          gender_text: str, experience_text: str, freq: int) -> np.ndarray:
+    """Convert profile fields into the feature vector shared by every candidate"""
     
     # 1. Basic User Stats
-    age = profile.age
-    height = profile.height / 100.0 # Convert cm to meters
-    weight = profile.weight
-    bmi = profile.bmi
-    fat = profile.bodyFatPercentage
-    rhr = profile.restingHeartRate
+    height = height_cm / 100.0 # Convert cm to meters
     
     # 2. Context & State
-    gender = _map_text_to_numeric(profile.gender)
-    exp_level = _map_text_to_numeric(profile.experienceLevel)
-    freq = profile.workoutFrequency
+    gender = _map_text_to_numeric(gender_text)
+    exp_level = _map_text_to_numeric(experience_text)
     
     # Defaults for missing context in new schema
     mood = 3 # Neutral
@@ -133,41 +256,88 @@ def _prepare_input_vector(profile: HealthProfile, exercise: Dict[str, Any], goal
     hr_reserve = (avg_hr - rhr) / (max_hr - rhr) if (max_hr - rhr) > 0 else 0
     calorie_efficiency = calories / duration if duration > 0 else 0
     
-    # Construct Feature Dictionary
-    features = {
-        'duration_min': duration,
-        'avg_hr': avg_hr,
-        'max_hr': max_hr,
-        'calories': calories,
-        'fatigue': fatigue,
-        'effort': effort,
-        'mood': mood,
-        'age': age,
-        'height_m': height,
-        'weight_kg': weight,
-        'bmi': bmi,
-        'fat_percentage': fat,
-        'resting_heartrate': rhr,
-        'experience_level': exp_level,
-        'workout_frequency': freq,
-        'gender': gender,
-        'session_duration': session_duration,
-        'estimated_1rm': estimated_1rm,
-        'pace': pace,
-        'duration_capacity': duration_capacity,
-        'rest_period': rest_period,
-        'intensity_score': intensity_score,
-        'resistance_intensity': resistance_intensity,
-        'cardio_intensity': cardio_intensity,
-        'volume_load': volume_load,
-        'rest_density': rest_density,
-        'hr_reserve': hr_reserve,
-        'calorie_efficiency': calorie_efficiency
-    }
+    # Write features straight into their FEATURE_COLUMNS slots (no dict intermediate)
+    vector = np.zeros(len(FEATURE_COLUMNS), dtype=np.float32)
+    vector[_COL_IDX['duration_min']] = duration
+    vector[_COL_IDX['avg_hr']] = avg_hr
+    vector[_COL_IDX['max_hr']] = max_hr
+    vector[_COL_IDX['calories']] = calories
+    vector[_COL_IDX['fatigue']] = fatigue
+    vector[_COL_IDX['effort']] = effort
+    vector[_COL_IDX['mood']] = mood
+    vector[_COL_IDX['age']] = age
+    vector[_COL_IDX['height_m']] = height
+    vector[_COL_IDX['weight_kg']] = weight
+    vector[_COL_IDX['bmi']] = bmi
+    vector[_COL_IDX['fat_percentage']] = fat
+    vector[_COL_IDX['resting_heartrate']] = rhr
+    vector[_COL_IDX['experience_level']] = exp_level
+    vector[_COL_IDX['workout_frequency']] = freq
+    vector[_COL_IDX['gender']] = gender
+    vector[_COL_IDX['session_duration']] = session_duration
+    vector[_COL_IDX['estimated_1rm']] = estimated_1rm
+    vector[_COL_IDX['pace']] = pace
+    vector[_COL_IDX['duration_capacity']] = duration_capacity
+    vector[_COL_IDX['rest_period']] = rest_period
+    vector[_COL_IDX['intensity_score']] = intensity_score
+    vector[_COL_IDX['resistance_intensity']] = resistance_intensity
+    vector[_COL_IDX['cardio_intensity']] = cardio_intensity
+    vector[_COL_IDX['volume_load']] = volume_load
+    vector[_COL_IDX['rest_density']] = rest_density
+    vector[_COL_IDX['hr_reserve']] = hr_reserve
+    vector[_COL_IDX['calorie_efficiency']] = calorie_efficiency
+    return vector
+
+@lru_cache(maxsize=4096)
+def _scaled_input_row(profile_key: tuple) -> np.ndarray:
+    """Scaled feature row for a profile, cached so repeated requests skip vector prep and scaling"""
+    row = (_prepare_input_vector(*profile_key) - _SCALER_MEAN) / _SCALER_SCALE
+    row.flags.writeable = False
+    return row
+
+def _prepare_input_matrix(profile: HealthProfile, exercises: List[Dict[str, Any]]) -> np.ndarray:
+    """Build the scaled (N, n_features) input matrix for all candidates at once.
+
+    Every feature is derived from the request (exercise MET/duration are still
+    defaults), so the row is computed once and broadcast to all candidates.
+    """
+    row = _scaled_input_row(_profile_key(profile))
+    return np.repeat(row[np.newaxis, :], len(exercises), axis=0)
+
+def _infer_exercise_type(name_lower: str) -> str:
+    """Determine exercise type (Mock logic: assume 'reps' unless name implies cardio)"""
+    if any(x in name_lower for x in ['run', 'cardio', 'treadmill', 'cycle', 'bike']):
+        return "distance"
+    if any(x in name_lower for x in ['plank', 'hiit', 'yoga']):
+        return "time"
+    return "reps"
+
+# Exercise types that fit each goal best, used to rank candidates before the model cap
+_GOAL_PREFERRED_TYPES = {
+    'Strength': {'reps'},
+    'MuscleGain': {'reps'},
+    'Endurance': {'distance', 'time'},
+    'WeightLoss': {'distance', 'time'},
+}
+
+def _prefilter_candidates(ex_dicts: List[Dict[str, Any]], profile: HealthProfile, goal_type: str) -> List[Dict[str, Any]]:
+    """Drop candidates that name an injured/painful body part and cap the batch at MAX_GRAPH_BATCH"""
+    status = profile.healthStatus
+    excluded = {term.strip().lower() for term in status.injuries + status.painLocations if term.strip()}
+    
+    kept = []
+    for ex_dict in ex_dicts:
+        name_lower = ex_dict['exerciseName'].lower()
+        if not any(term in name_lower for term in excluded):
+            kept.append((name_lower, ex_dict))
+    
+    if len(kept) > MAX_GRAPH_BATCH:
+        # Stable sort: goal-matching exercise types first, then original order
+        preferred = _GOAL_PREFERRED_TYPES.get(goal_type, set())
+        kept.sort(key=lambda item: _infer_exercise_type(item[0]) not in preferred)
+        kept = kept[:MAX_GRAPH_BATCH]
     
-    # Convert to ordered list matching FEATURE_COLUMNS
-    vector = [features.get(col, 0.0) for col in FEATURE_COLUMNS]
-    return np.array(vector, dtype=np.float32)
+    return [ex_dict for _, ex_dict in kept]
 
 class RecommendationService:
     def __init__(self):
@@ -176,7 +346,7 @@ class RecommendationService:
             
     def recommend_exercises(self, req: RecommendInput) -> RecommendOutput:
         """Generate recommendations using Model v4"""
-        global MODEL_V4, SCALER_V4
+        global MODEL_V4
         
         if MODEL_V4 is None:
             # Try loading again if not loaded
@@ -187,77 +357,59 @@ class RecommendationService:
         if not candidates:
             return RecommendOutput(exercises=[])
         
-        # Prepare Batch Input
-        input_vectors = []
         # Use first goal as primary for context
         primary_goal = req.goals[0].goalType if req.goals else "General"
         
-        for ex in candidates:
-            # We treat ExerciseInput as a dictionary for feature extraction
-            # In a real scenario, we might need to fetch more metadata about the exercise (MET, etc.)
-            # Here we just pass the object and let _prepare_input_vector handle defaults
-            ex_dict = ex.dict()
-            vec = _prepare_input_vector(req.healthProfile, ex_dict, primary_goal)
-            input_vectors.append(vec)
-            
-        X = np.array(input_vectors)
+        # Serialize each candidate once (pydantic v2 model_dump) and reuse it below
+        ex_dicts = [ex.model_dump() for ex in candidates]
         
-        # Scale Features
-        X_scaled = SCALER_V4.transform(X)
-        X_tensor = torch.FloatTensor(X_scaled).to(DEVICE)
+        # Cheap heuristic pre-filter so the model only scores plausible candidates
+        ex_dicts = _prefilter_candidates(ex_dicts, req.healthProfile, primary_goal)
+        if not ex_dicts:
+            return RecommendOutput(exercises=[])
+        
+        # Prepare Batch Input
+        # In a real scenario, we might need to fetch more metadata about the exercise (MET, etc.)
+        # Here the feature builder falls back to defaults for exercise-specific fields
+        # (rows come back already scaled and are cached per profile)
+        X_scaled = _prepare_input_matrix(req.healthProfile, ex_dicts)
+        X_tensor = torch.FloatTensor(X_scaled).to(DEVICE, dtype=MODEL_DTYPE)
         
         # Inference
-        with torch.no_grad():
-            intensity_pred, suitability_pred = MODEL_V4(X_tensor)
+        intensity_pred, suitability_pred = _predict(X_tensor)
             
-        # Process Results
-        intensity_vals = intensity_pred.cpu().numpy().flatten()
-        suitability_vals = suitability_pred.cpu().numpy().flatten()
+        # Process Results: stack on-device so there is a single device->host sync
+        # (upcast first: NumPy has no bfloat16)
+        outputs = torch.stack([intensity_pred.flatten(), suitability_pred.flatten()]).float().cpu().numpy()
+        intensity_vals, suitability_vals = outputs[0], outputs[1]
         
-        recommended_exercises = []
+        # Filter (threshold > 0.4), sort by suitability and cut to k in NumPy,
+        # so only the survivors are turned into RecommendedExercise objects
+        passing = np.flatnonzero(suitability_vals > 0.4)
+        top_idx = passing[np.argsort(-suitability_vals[passing], kind='stable')][:req.k]
         
-        for i, ex in enumerate(candidates):
-            suitability = float(suitability_vals[i])
-            predicted_rpe = float(intensity_vals[i])
-            
-            # Filter logic (e.g. threshold > 0.4)
-            if suitability > 0.4:
-                # Determine exercise type (Mock logic: assume 'reps' unless name implies cardio)
-                ex_type = "reps"
-                name_lower = ex.exerciseName.lower()
-                if any(x in name_lower for x in ['run', 'cardio', 'treadmill', 'cycle', 'bike']):
-                    ex_type = "distance"
-                elif any(x in name_lower for x in ['plank', 'hiit', 'yoga']):
-                    ex_type = "time"
-                
-                # Generate Parameters using the utility function
-                sets = convert_intensity_to_params(
-                    exercise_name=ex.exerciseName,
-                    exercise_type=ex_type,
-                    intensity_score=predicted_rpe,
-                    user_profile=req.healthProfile,
-                    goal_type=primary_goal
-                )
-                
-                recommended_exercises.append(RecommendedExercise(
-                    name=ex.exerciseName,
-                    sets=sets
-                ))
-                
-        # Sort by suitability (implicitly handled by the order of processing if we wanted, but let's sort)
-        # We need to pair them up to sort, but RecommendedExercise doesn't have score. 
-        # For now, we return them in the order processed (which matches input order), 
-        # or we could zip and sort.
-        
-        # Let's zip, sort, and unzip
-        zipped = zip(recommended_exercises, suitability_vals)
-        sorted_zipped = sorted(zipped, key=lambda x: x[1], reverse=True)
-        final_recommendations = [x[0] for x in sorted_zipped if x[1] > 0.4]
+        final_recommendations = []
         
-        # Limit to k
-        final_recommendations = final_recommendations[:req.k]
+        for i in top_idx.tolist():
+            exercise_name = ex_dicts[i]['exerciseName']
+            ex_type = _infer_exercise_type(exercise_name.lower())
+            
+            # Generate Parameters using the utility function
+            sets = convert_intensity_to_params(
+                exercise_name=exercise_name,
+                exercise_type=ex_type,
+                intensity_score=float(intensity_vals[i]),
+                user_profile=req.healthProfile,
+                goal_type=primary_goal
+            )
+            
+            # Fields come straight from our own code, so skip pydantic validation
+            final_recommendations.append(RecommendedExercise.model_construct(
+                name=exercise_name,
+                sets=sets
+            ))
         
-        return RecommendOutput(exercises=final_recommendations)
+        return RecommendOutput.model_construct(exercises=final_recommendations)
 
 # Singleton instance
 recommendation_service = RecommendationService()
@@ -12,13 +12,26 @@ Output: final_dataset.xlsx - Cleaned, normalized, and combined dataset ready for
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler, LabelEncoder
-from typing import Dict, Tuple
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Copy-on-write lets each pipeline stage take a shallow copy: columns it does not
+# touch stay shared with the input frame instead of being duplicated per stage
+pd.set_option('mode.copy_on_write', True)
+
+# xlsxwriter writes Excel several times faster than openpyxl; fall back to the pandas default
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITER_ENGINE = 'xlsxwriter'
+except ImportError:
+    EXCEL_WRITER_ENGINE = None
+
 class DataProcessor:
     """Data processor for 3T-FIT exercise datasets"""
 
@@ -70,11 +83,40 @@ class DataProcessor:
             'suitability_x': (0, 1)
         }
 
+    def read_excel_cached(self, path: str) -> pd.DataFrame:
+        """
+        Read an Excel file, caching the parsed frame as Parquet next to it.
+        The cache is reused while the source file's mtime is unchanged.
+        """
+        source = Path(path)
+        cache_path = source.with_suffix('.parquet')
+        stamp_path = cache_path.with_name(cache_path.name + '.mtime')
+        mtime = str(source.stat().st_mtime)
+
+        if cache_path.exists() and stamp_path.exists() and stamp_path.read_text() == mtime:
+            try:
+                return pd.read_parquet(cache_path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable Parquet cache {cache_path}: {e}")
+
+        df = pd.read_excel(source)
+        try:
+            df.to_parquet(cache_path, compression='zstd')
+            stamp_path.write_text(mtime)
+        except Exception as e:
+            # pyarrow missing or column types Parquet cannot store: keep working uncached
+            logger.warning(f"Could not cache {source.name} as Parquet: {e}")
+        return df
+
     def load_data(self, kaggle_path: str, real_path: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Load both datasets"""
         try:
-            kaggle_df = pd.read_excel(kaggle_path)
-            real_df = pd.read_excel(real_path)
+            # The two workbooks are independent: parse them in parallel threads
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                kaggle_future = executor.submit(self.read_excel_cached, kaggle_path)
+                real_future = executor.submit(self.read_excel_cached, real_path)
+                kaggle_df = kaggle_future.result()
+                real_df = real_future.result()
 
             logger.info(f"Loaded Kaggle dataset: {kaggle_df.shape}")
             logger.info(f"Loaded Real dataset: {real_df.shape}")
@@ -90,7 +132,7 @@ class DataProcessor:
         logger.info(f"Cleaning {dataset_name} dataset...")
 
         initial_shape = df.shape
-        cleaned_df = df.copy()
+        cleaned_df = df.copy(deep=False)
 
         # 1. Handle missing values
         logger.info("Checking for missing values...")
@@ -98,19 +140,25 @@ class DataProcessor:
         if missing_values.sum() > 0:
             logger.warning(f"Missing values found:\n{missing_values[missing_values > 0]}")
 
+            # Intersect each feature category with the columns that have nulls once,
+            # instead of rescanning every candidate column with isnull().sum()
+            columns_with_missing = set(missing_values.index[missing_values > 0])
+            numerical_missing = [col for col in dict.fromkeys(self.numerical_features)
+                                 if col in columns_with_missing]
+            categorical_missing = [col for col in dict.fromkeys(self.categorical_features)
+                                   if col in columns_with_missing]
+
             # Fill numerical missing values with median
-            for col in self.numerical_features:
-                if col in cleaned_df.columns and cleaned_df[col].isnull().sum() > 0:
-                    median_val = cleaned_df[col].median()
-                    cleaned_df[col].fillna(median_val, inplace=True)
-                    logger.info(f"Filled {col} missing values with median: {median_val}")
+            for col in numerical_missing:
+                median_val = cleaned_df[col].median()
+                cleaned_df[col] = cleaned_df[col].fillna(median_val)
+                logger.info(f"Filled {col} missing values with median: {median_val}")
 
             # Fill categorical missing values with mode
-            for col in self.categorical_features:
-                if col in cleaned_df.columns and cleaned_df[col].isnull().sum() > 0:
-                    mode_val = cleaned_df[col].mode()[0]
-                    cleaned_df[col].fillna(mode_val, inplace=True)
-                    logger.info(f"Filled {col} missing values with mode: {mode_val}")
+            for col in categorical_missing:
+                mode_val = cleaned_df[col].mode()[0]
+                cleaned_df[col] = cleaned_df[col].fillna(mode_val)
+                logger.info(f"Filled {col} missing values with mode: {mode_val}")
 
         # 2. Remove duplicates
         duplicates = cleaned_df.duplicated().sum()
@@ -120,20 +168,21 @@ class DataProcessor:
 
         # 3. Validate and fix out-of-range values
         logger.info("Validating data ranges...")
-        out_of_range_count = 0
+        range_columns = [col for col in self.valid_ranges if col in cleaned_df.columns]
+        lower = pd.Series({col: self.valid_ranges[col][0] for col in range_columns}, dtype=float)
+        upper = pd.Series({col: self.valid_ranges[col][1] for col in range_columns}, dtype=float)
 
-        for col, (min_val, max_val) in self.valid_ranges.items():
-            if col in cleaned_df.columns:
-                # Count out-of-range values
-                out_of_range = ((cleaned_df[col] < min_val) | (cleaned_df[col] > max_val)).sum()
-                if out_of_range > 0:
-                    logger.info(f"Found {out_of_range} out-of-range values in {col}")
-                    out_of_range_count += out_of_range
+        # One clip pass over all ranged columns; outliers are the values it changed
+        original = cleaned_df[range_columns]
+        clipped = original.clip(lower=lower, upper=upper, axis=1)
+        out_of_range = (original.ne(clipped) & original.notna()).sum()
 
-                    # Clip values to valid range
-                    cleaned_df[col] = np.clip(cleaned_df[col], min_val, max_val)
+        for col in out_of_range[out_of_range > 0].index:
+            logger.info(f"Found {out_of_range[col]} out-of-range values in {col}")
+            # Clip values to valid range
+            cleaned_df[col] = clipped[col]
 
-        logger.info(f"Fixed {out_of_range_count} out-of-range values")
+        logger.info(f"Fixed {out_of_range.sum()} out-of-range values")
 
         # 4. Validate physiological relationships
         logger.info("Validating physiological relationships...")
@@ -166,68 +215,61 @@ class DataProcessor:
         """Calculate derived features for ML model"""
         logger.info("Calculating derived features...")
 
-        df = df.copy()
-
-        # 1. Resistance Intensity (RI) = (Reps * Weight) / Estimated_1RM
-        # Since we don't have reps directly, we'll use intensity_score as proxy
-        if 'estimated_1rm' in df.columns and 'intensity_score' in df.columns:
-            # Avoid division by zero
-            df['resistance_intensity'] = np.where(
-                df['estimated_1rm'] > 0,
-                df['intensity_score'] / df['estimated_1rm'],
-                0
+        # Load each source column once; missing sources give a constant 0 feature
+        def column(name):
+            return df[name].to_numpy() if name in df.columns else None
+
+        one_rm, intensity_score = column('estimated_1rm'), column('intensity_score')
+        avg_hr, max_hr, resting_hr = column('avg_hr'), column('max_hr'), column('resting_heartrate')
+        duration, rest_period, calories = column('duration_min'), column('rest_period'), column('calories')
+
+        derived = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1. Resistance Intensity (RI) = (Reps * Weight) / Estimated_1RM
+            # Since we don't have reps directly, we'll use intensity_score as proxy
+            derived['resistance_intensity'] = (
+                np.where(one_rm > 0, intensity_score / one_rm, 0)
+                if one_rm is not None and intensity_score is not None else 0
             )
-        else:
-            df['resistance_intensity'] = 0
 
-        # 2. Cardio Intensity Proxy = avg_hr / max_hr
-        if 'avg_hr' in df.columns and 'max_hr' in df.columns:
-            # Avoid division by zero
-            df['cardio_intensity'] = np.where(
-                df['max_hr'] > 0,
-                df['avg_hr'] / df['max_hr'],
-                0
+            # 2. Cardio Intensity Proxy = avg_hr / max_hr
+            derived['cardio_intensity'] = (
+                np.where(max_hr > 0, avg_hr / max_hr, 0)
+                if avg_hr is not None and max_hr is not None else 0
             )
-        else:
-            df['cardio_intensity'] = 0
 
-        # 3. Volume Load Proxy = intensity_score * duration_min
-        if 'intensity_score' in df.columns and 'duration_min' in df.columns:
-            df['volume_load'] = df['intensity_score'] * df['duration_min']
-        else:
-            df['volume_load'] = 0
-
-        # 4. Rest Density = rest_period / (rest_period + duration_min)
-        if 'rest_period' in df.columns and 'duration_min' in df.columns:
-            total_time = df['rest_period'] + df['duration_min']
-            df['rest_density'] = np.where(
-                total_time > 0,
-                df['rest_period'] / total_time,
-                0
+            # 3. Volume Load Proxy = intensity_score * duration_min
+            derived['volume_load'] = (
+                intensity_score * duration
+                if intensity_score is not None and duration is not None else 0
             )
-        else:
-            df['rest_density'] = 0
-
-        # 5. HR Reserve = (avg_hr - resting_heartrate) / (max_hr - resting_heartrate)
-        if all(col in df.columns for col in ['avg_hr', 'max_hr', 'resting_heartrate']):
-            hr_reserve_denominator = df['max_hr'] - df['resting_heartrate']
-            df['hr_reserve'] = np.where(
-                hr_reserve_denominator > 0,
-                (df['avg_hr'] - df['resting_heartrate']) / hr_reserve_denominator,
-                0
-            )
-        else:
-            df['hr_reserve'] = 0
-
-        # 6. Calorie Efficiency = calories / duration_min
-        if 'calories' in df.columns and 'duration_min' in df.columns:
-            df['calorie_efficiency'] = np.where(
-                df['duration_min'] > 0,
-                df['calories'] / df['duration_min'],
-                0
+
+            # 4. Rest Density = rest_period / (rest_period + duration_min)
+            if rest_period is not None and duration is not None:
+                total_time = rest_period + duration
+                derived['rest_density'] = np.where(total_time > 0, rest_period / total_time, 0)
+            else:
+                derived['rest_density'] = 0
+
+            # 5. HR Reserve = (avg_hr - resting_heartrate) / (max_hr - resting_heartrate)
+            if avg_hr is not None and max_hr is not None and resting_hr is not None:
+                hr_reserve_denominator = max_hr - resting_hr
+                derived['hr_reserve'] = np.where(
+                    hr_reserve_denominator > 0,
+                    (avg_hr - resting_hr) / hr_reserve_denominator,
+                    0
+                )
+            else:
+                derived['hr_reserve'] = 0
+
+            # 6. Calorie Efficiency = calories / duration_min
+            derived['calorie_efficiency'] = (
+                np.where(duration > 0, calories / duration, 0)
+                if calories is not None and duration is not None else 0
             )
-        else:
-            df['calorie_efficiency'] = 0
+
+        # Single assignment of all derived columns (also the copy of df)
+        df = df.assign(**derived)
 
         # Add new features to numerical features list
         new_features = [
@@ -245,7 +287,7 @@ class DataProcessor:
         """Normalize numerical features using MinMax scaling"""
         logger.info("Normalizing numerical features...")
 
-        df = df.copy()
+        df = df.copy(deep=False)
 
         # MinMax scaling for most numerical features
         features_to_scale = [col for col in self.numerical_features
@@ -264,7 +306,7 @@ class DataProcessor:
         """Encode categorical features using label encoding"""
         logger.info("Encoding categorical features...")
 
-        df = df.copy()
+        df = df.copy(deep=False)
 
         for col in self.categorical_features:
             if col in df.columns:
@@ -284,48 +326,55 @@ class DataProcessor:
         """
         logger.info("Calculating enhanced suitability scores...")
 
-        df = df.copy()
-        len(df)
+        df = df.copy(deep=False)
 
+        # Work on plain ndarrays: every component is a whole-column expression
         # 1. Psychological Component (40%) - based on mood and fatigue
         if 'mood' in df.columns and 'fatigue' in df.columns:
-            # Normalize to 0-1 scale (assuming 1-5 scale)
-            norm_mood = (df['mood'] - 1) / 4  # Convert 1-5 to 0-1
-            norm_fatigue = (df['fatigue'] - 1) / 4  # Convert 1-5 to 0-1
+            # Normalize to 0-1 scale (assuming 1-5 scale), reusing two buffers via out=
+            p_psych = np.subtract(df['mood'].to_numpy(dtype=float), 1)
+            p_psych /= 4  # Convert 1-5 to 0-1
+            fatigue_term = np.subtract(df['fatigue'].to_numpy(dtype=float), 1)
+            fatigue_term /= 4  # Convert 1-5 to 0-1
 
             # Higher mood is better, lower fatigue is better
-            p_psych = (norm_mood * 0.7) + ((1 - norm_fatigue) * 0.3)
+            p_psych *= 0.7
+            np.subtract(1, fatigue_term, out=fatigue_term)
+            fatigue_term *= 0.3
+            p_psych += fatigue_term
         else:
             p_psych = 0.5  # Default middle value
 
         # 2. Physiological Component (30%) - based on heart rate zones
         if 'avg_hr' in df.columns and 'max_hr' in df.columns:
-            hr_ratio = df['avg_hr'] / df['max_hr']
+            p_physio = np.divide(df['avg_hr'].to_numpy(dtype=float), df['max_hr'].to_numpy(dtype=float))
             # Optimal zone is around 70-80% of max HR
             optimal_zone = 0.75
-            p_physio = 1 - np.abs(hr_ratio - optimal_zone)
-            p_physio = np.clip(p_physio, 0, 1)
+            p_physio -= optimal_zone
+            np.abs(p_physio, out=p_physio)
+            np.subtract(1, p_physio, out=p_physio)
+            np.clip(p_physio, 0, 1, out=p_physio)
         else:
             p_physio = 0.5  # Default middle value
 
         # 3. Performance Component (30%) - based on efficiency
         if 'calorie_efficiency' in df.columns:
             # Use the calculated calorie efficiency
-            p_perf = np.clip(df['calorie_efficiency'], 0, 1)
+            p_perf = np.clip(df['calorie_efficiency'].to_numpy(dtype=float), 0, 1)
         elif 'calories' in df.columns and 'duration_min' in df.columns:
             # Calculate calories per minute and normalize
-            calories_per_min = df['calories'] / df['duration_min']
+            calories_per_min = df['calories'].to_numpy(dtype=float) / df['duration_min'].to_numpy(dtype=float)
             # Typical range: 5-15 cal/min, normalize to 0-1
             p_perf = np.clip((calories_per_min - 5) / 10, 0, 1)
         else:
             p_perf = 0.5  # Default middle value
 
-        # Calculate final suitability score
-        df['enhanced_suitability'] = (0.4 * p_psych) + (0.3 * p_physio) + (0.3 * p_perf)
-        df['enhanced_suitability'] = np.clip(df['enhanced_suitability'], 0, 1)
+        # Calculate final suitability score (clipped once, before it is stored)
+        score = np.clip((0.4 * p_psych) + (0.3 * p_physio) + (0.3 * p_perf), 0, 1)
+        df['enhanced_suitability'] = score
 
         # Create binary classification label (threshold = 0.7)
-        df['is_suitable'] = (df['enhanced_suitability'] >= 0.7).astype(int)
+        df['is_suitable'] = (score >= 0.7).astype(int)
 
         logger.info("Enhanced suitability scores calculated:")
         logger.info(f"  Mean: {df['enhanced_suitability'].mean():.3f}")
@@ -334,32 +383,36 @@ class DataProcessor:
 
         return df
 
-    def inject_noise(self, df: pd.DataFrame, noise_level: float = 0.15) -> pd.DataFrame:
+    def inject_noise(self, df: pd.DataFrame, noise_level: float = 0.15,
+                     random_state: Optional[int] = None) -> pd.DataFrame:
         """
         Inject random noise into numerical features to augment data
         and help model learn to handle variability.
         """
         logger.info(f"Injecting {noise_level*100:.1f}% random noise into numerical features...")
 
-        df = df.copy()
-        
+        df = df.copy(deep=False)
+
         # Filter features that exist in current dataframe
-        features_to_noise = [f for f in self.numerical_features if f in df.columns]
-
-        for col in features_to_noise:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                # Calculate noise scale based on feature standard deviation
-                scale = df[col].std() * noise_level
-                if scale == 0:
-                    continue
-                    
-                noise = np.random.normal(loc=0, scale=scale, size=len(df))
-                df[col] += noise
-
-                # Enforce valid ranges
-                if col in self.valid_ranges:
-                    min_val, max_val = self.valid_ranges[col]
-                    df[col] = np.clip(df[col], min_val, max_val)
+        features_to_noise = [f for f in dict.fromkeys(self.numerical_features)
+                             if f in df.columns and pd.api.types.is_numeric_dtype(df[f])]
+
+        # Calculate noise scale based on feature standard deviation
+        scales = df[features_to_noise].std().to_numpy() * noise_level
+        features_to_noise = [f for f, scale in zip(features_to_noise, scales) if scale != 0]
+        scales = scales[scales != 0]
+        if not features_to_noise:
+            return df
+
+        # One draw for every noisy column instead of one RNG call per column
+        rng = np.random.default_rng(random_state)
+        values = df[features_to_noise].to_numpy(dtype=float)
+        values += rng.standard_normal(values.shape) * scales
+
+        # Enforce valid ranges
+        lower = np.array([self.valid_ranges.get(f, (-np.inf, np.inf))[0] for f in features_to_noise])
+        upper = np.array([self.valid_ranges.get(f, (-np.inf, np.inf))[1] for f in features_to_noise])
+        df[features_to_noise] = np.clip(values, lower, upper)
 
         return df
 
@@ -408,9 +461,17 @@ class DataProcessor:
             raise ValueError("No processed data to save. Run process_datasets first.")
         try:
             # Save to Excel
-            self.processed_data.to_excel(output_path, index=False)
+            self.processed_data.to_excel(output_path, index=False, engine=EXCEL_WRITER_ENGINE)
             logger.info(f"Processed dataset saved to: {output_path}")
 
+            # Parquet sibling for Python consumers (much faster to write and read than xlsx)
+            parquet_path = Path(output_path).with_suffix('.parquet')
+            try:
+                self.processed_data.to_parquet(parquet_path, compression='zstd', index=False)
+                logger.info(f"Processed dataset saved to: {parquet_path}")
+            except Exception as e:
+                logger.warning(f"Could not save Parquet copy {parquet_path}: {e}")
+
             # Also save a summary
             summary_path = output_path.replace('.xlsx', '_summary.txt')
             with open(summary_path, 'w', encoding='utf-8') as f:
@@ -422,9 +483,10 @@ class DataProcessor:
 
                 f.write("FEATURES:\n")
                 f.write("-" * 20 + "\n")
+                null_counts = self.processed_data.isnull().sum()
                 for i, col in enumerate(self.processed_data.columns, 1):
                     dtype = self.processed_data[col].dtype
-                    null_count = self.processed_data[col].isnull().sum()
+                    null_count = null_counts[col]
                     f.write(f"{i:2d}. {col:30s} ({str(dtype):10s}) - Null: {null_count}\n")
 
                 f.write("\nDATASET SOURCES:\n")
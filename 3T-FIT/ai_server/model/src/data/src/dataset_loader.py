@@ -33,7 +33,13 @@ class DatasetLoader:
     def load_dataset(self) -> pd.DataFrame:
         """Load the processed dataset"""
         try:
-            self.data = pd.read_excel(self.dataset_path)
+            # Prefer the Parquet copy written by DataProcessor when it is not older than the xlsx
+            parquet_path = os.path.splitext(self.dataset_path)[0] + '.parquet'
+            if (os.path.exists(parquet_path) and os.path.exists(self.dataset_path)
+                    and os.path.getmtime(parquet_path) >= os.path.getmtime(self.dataset_path)):
+                self.data = pd.read_parquet(parquet_path)
+            else:
+                self.data = pd.read_excel(self.dataset_path)
             print(f"Dataset loaded successfully: {self.data.shape}")
             return self.data
         except Exception as e:
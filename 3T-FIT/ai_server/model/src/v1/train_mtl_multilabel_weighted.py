@@ -46,12 +46,10 @@ def build_labels(df, max_labels=200):
     if len(unique_ex) > max_labels:
         unique_ex = unique_ex[:max_labels]
     label_cols = [f"exercise_{ex}" for ex in unique_ex]
-    for ex in unique_ex:
-        df[f"exercise_{ex}"] = 0
-    for i in df.index:
-        ex = ex_series.iloc[i]
-        if ex in unique_ex:
-            df.at[i, f"exercise_{ex}"] = 1
+    # One-hot in one vectorized comparison instead of per-row df.at writes
+    if label_cols:
+        onehot = ex_series.to_numpy(dtype=object)[:, None] == np.array(unique_ex, dtype=object)[None, :]
+        df[label_cols] = onehot.astype(int)
     return df, label_cols
 
 # -------------------------
@@ -20,7 +20,7 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 # Import model từ training script
 import sys
 sys.path.append(os.path.dirname(__file__))
-from train_exercise_recommendation import ExerciseRecommendationModel, normalize_exercise_name, parse_sets_reps_weight
+from train_exercise_recommendation import ExerciseRecommendationModel, normalize_exercise_names, parse_sets_reps_weight
 
 
 def precision_recall_f1_at_k(logits: torch.Tensor, y_true: torch.Tensor, K: int = 5) -> Tuple[float, float, float]:
@@ -153,7 +153,7 @@ def main(model_path: str, test_data_path: str, artifacts_dir: str):
     print(f"  ✓ Loaded {len(test_df):,} test samples")
     
     # Prepare test data (same as training)
-    test_df['exercise_name_norm'] = test_df['exercise_name'].apply(normalize_exercise_name)
+    test_df['exercise_name_norm'] = normalize_exercise_names(test_df['exercise_name'])
     
     exercise_to_idx = metadata['exercise_to_idx']
     intensity_scales = {k: tuple(v) for k, v in metadata['intensity_scales'].items()}
@@ -48,6 +48,12 @@ def normalize_exercise_name(name: str) -> str:
         return ""
     return str(name).strip()
 
+def normalize_exercise_names(names: pd.Series) -> pd.Series:
+    """
+    Bản vector hóa của normalize_exercise_name cho cả cột (dùng .str thay vì apply)
+    """
+    return names.astype("string").str.strip().fillna("").astype(object)
+
 def parse_sets_reps_weight(cell_value: str) -> Tuple[float, float, float, float]:
     """
     Parse chuỗi sets/reps/weight/timeresteachset
@@ -254,8 +260,8 @@ def main(train_path: str, test_path: str, artifacts_dir: str,
     print("\n[3/10] Building exercise vocabulary...")
     
     # Normalize exercise names
-    train_df['exercise_name_norm'] = train_df['exercise_name'].apply(normalize_exercise_name)
-    test_df['exercise_name_norm'] = test_df['exercise_name'].apply(normalize_exercise_name)
+    train_df['exercise_name_norm'] = normalize_exercise_names(train_df['exercise_name'])
+    test_df['exercise_name_norm'] = normalize_exercise_names(test_df['exercise_name'])
     
     # Get unique exercises (từ cả train và test để đảm bảo coverage)
     all_exercises = pd.concat([
@@ -34,8 +34,8 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 try:
     from train_v3_enhanced import (
         V3EnhancedModel, MOOD_MAPPING, FATIGUE_MAPPING, EFFORT_MAPPING,
-        calculate_readiness_factor, decode_1rm_to_workout, WORKOUT_GOAL_MAPPING,
-        map_sepa_to_numeric
+        calculate_readiness_factor_array, decode_1rm_to_workout_batch, workout_to_dict,
+        WORKOUT_GOAL_MAPPING, map_sepa_to_numeric, map_sepa_series
     )
 except ImportError:
     print("Error: Could not import from train_v3_enhanced.py. Make sure it's in the same directory.")
@@ -182,7 +182,7 @@ class V3ModelTester:
         X = self.prepare_input_data(data)
 
         # Make prediction
-        with torch.no_grad():
+        with torch.inference_mode():
             X_tensor = torch.from_numpy(X).to(self.device)
             pred_1rm, pred_suitability, pred_readiness = self.model(X_tensor)
 
@@ -222,11 +222,13 @@ class V3ModelTester:
         if isinstance(readiness_factors, float):
             readiness_factors = [readiness_factors]
 
+        # Decode every (sample, goal) pair in one vectorized call; rows are sample-major
+        decoded = decode_1rm_to_workout_batch(pred_1rm, readiness_factors, goals).to_dict('records')
+        n_goals = len(goals)
+
         for i, (pred_1rm_val, readiness_val) in enumerate(zip(pred_1rm, readiness_factors)):
-            workout_recs = {}
-            for goal in goals:
-                workout_params = decode_1rm_to_workout(pred_1rm_val, goal, readiness_val)
-                workout_recs[goal] = workout_params
+            sample_rows = decoded[i * n_goals:(i + 1) * n_goals]
+            workout_recs = {goal: workout_to_dict(row) for goal, row in zip(goals, sample_rows)}
 
             recommendations.append({
                 'sample_index': i,
@@ -265,29 +267,27 @@ class V3ModelTester:
         # Handle SePA columns
         if 'mood' in df_test.columns:
             if df_test['mood'].dtype == 'object':
-                df_test['mood_numeric'] = df_test['mood'].apply(lambda x: map_sepa_to_numeric(x, MOOD_MAPPING))
+                df_test['mood_numeric'] = map_sepa_series(df_test['mood'], MOOD_MAPPING)
             else:
                 df_test['mood_numeric'] = df_test['mood'].astype(float)
 
         if 'fatigue' in df_test.columns:
             if df_test['fatigue'].dtype == 'object':
-                df_test['fatigue_numeric'] = df_test['fatigue'].apply(lambda x: map_sepa_to_numeric(x, FATIGUE_MAPPING))
+                df_test['fatigue_numeric'] = map_sepa_series(df_test['fatigue'], FATIGUE_MAPPING)
             else:
                 df_test['fatigue_numeric'] = df_test['fatigue'].astype(float)
 
         if 'effort' in df_test.columns:
             if df_test['effort'].dtype == 'object':
-                df_test['effort_numeric'] = df_test['effort'].apply(lambda x: map_sepa_to_numeric(x, EFFORT_MAPPING))
+                df_test['effort_numeric'] = map_sepa_series(df_test['effort'], EFFORT_MAPPING)
             else:
                 df_test['effort_numeric'] = df_test['effort'].astype(float)
 
         # Calculate readiness factors
-        df_test['readiness_factor'] = df_test.apply(
-            lambda row: calculate_readiness_factor(
-                row.get('mood_numeric', 3),
-                row.get('fatigue_numeric', 3),
-                row.get('effort_numeric', 3)
-            ), axis=1
+        df_test['readiness_factor'] = calculate_readiness_factor_array(
+            df_test.get('mood_numeric', 3),
+            df_test.get('fatigue_numeric', 3),
+            df_test.get('effort_numeric', 3)
         )
 
         # Use existing suitability_x if available
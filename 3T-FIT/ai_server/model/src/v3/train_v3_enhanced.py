@@ -29,6 +29,7 @@ Date: 2025-11-25
 import os
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import joblib
@@ -39,11 +40,15 @@ from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from typing import Dict, List, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; metrics fall back to NumPy
+    njit = None
+
 # ==================== SEPA MAPPING ====================
 # SePA (Sleep, Psychology, Activity) normalization to 1-5 scale
 
@@ -83,6 +88,15 @@ def map_sepa_to_numeric(value, mapping_dict, default=3):
 
     return default
 
+def map_sepa_series(series: pd.Series, mapping_dict, default=3) -> pd.Series:
+    """Vectorized map_sepa_to_numeric for a whole SePA column (int8, 1-5)"""
+    lookup = {key.lower(): val for key, val in mapping_dict.items()}
+
+    numeric = np.trunc(pd.to_numeric(series, errors='coerce'))
+    mapped = series.astype(str).str.strip().str.lower().map(lookup)
+
+    return numeric.where(numeric.between(1, 5)).fillna(mapped).fillna(default).astype('int8')
+
 # ==================== 1RM CALCULATION ====================
 
 def calculate_1rm_epley(weight: float, reps: int) -> float:
@@ -140,37 +154,31 @@ def calculate_workout_1rm(reps_list: List[float], weights_list: List[float]) ->
 
     return round(max_1rm, 2)
 
-def calculate_readiness_factor(mood: float, fatigue: float, effort: float) -> float:
+def calculate_readiness_factor_array(mood, fatigue, effort) -> np.ndarray:
     """
-    Calculate readiness factor based on SePA scores (1-5 scale)
+    Calculate readiness factor based on SePA scores (1-5 scale) for whole columns
     Formula: base_factor + mood_adj + fatigue_adj + effort_adj
     """
+    mood, fatigue, effort = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (mood, fatigue, effort))
+    )
     base_factor = 1.0
 
     # Mood adjustment: better mood = higher readiness
-    if mood >= 5:  # Very Good/Excellent
-        mood_adj = 0.05
-    elif mood <= 2:  # Bad/Very Bad
-        mood_adj = -0.1
-    else:
-        mood_adj = 0.0
+    mood_adj = np.select([mood >= 5, mood <= 2], [0.05, -0.1], default=0.0)
 
     # Fatigue adjustment: higher fatigue = lower readiness
-    if fatigue >= 4:  # High/Very High
-        fatigue_adj = -0.15
-    elif fatigue <= 2:  # Low/Very Low
-        fatigue_adj = 0.05
-    else:
-        fatigue_adj = 0.0
+    fatigue_adj = np.select([fatigue >= 4, fatigue <= 2], [-0.15, 0.05], default=0.0)
 
     # Effort adjustment: very high effort might indicate need for recovery
-    if effort >= 5:  # Very High
-        effort_adj = -0.05
-    else:
-        effort_adj = 0.0
+    effort_adj = np.where(effort >= 5, -0.05, 0.0)
 
     readiness = base_factor + mood_adj + fatigue_adj + effort_adj
-    return round(max(0.6, min(1.3, readiness)), 3)
+    return np.round(np.clip(readiness, 0.6, 1.3), 3)
+
+def calculate_readiness_factor(mood: float, fatigue: float, effort: float) -> float:
+    """Scalar wrapper around calculate_readiness_factor_array"""
+    return float(calculate_readiness_factor_array(mood, fatigue, effort))
 
 # ==================== GOAL-BASED DECODING RULES ====================
 
@@ -205,56 +213,97 @@ WORKOUT_GOAL_MAPPING = {
     }
 }
 
-def decode_1rm_to_workout(predicted_1rm: float, goal: str, readiness_factor: float) -> Dict:
+def decode_1rm_to_workout_batch(predicted_1rm, readiness_factor, goals: List[str]) -> pd.DataFrame:
     """
-    Convert predicted 1RM to specific workout parameters using rule-based decoding
+    Decode many samples for several goals at once.
+    Training weights for every (sample, goal) pair come from one broadcast over
+    [n_samples, n_goals]; per-goal rep/set/rest rules are looked up once.
+
+    Returns:
+        DataFrame with one unrounded row per (sample, goal), sample-major,
+        keyed by sample_idx / goal_idx (see workout_to_dict for the nested form)
     """
-    if goal not in WORKOUT_GOAL_MAPPING:
-        goal = 'general_fitness'
+    predicted_1rm = np.asarray(predicted_1rm, dtype=float).ravel()
+    readiness_factor = np.asarray(readiness_factor, dtype=float).ravel()
+    n_samples = min(len(predicted_1rm), len(readiness_factor))
+    predicted_1rm = predicted_1rm[:n_samples]
+    readiness_factor = readiness_factor[:n_samples]
 
-    rules = WORKOUT_GOAL_MAPPING[goal]
+    goals = [goal if goal in WORKOUT_GOAL_MAPPING else 'general_fitness' for goal in goals]
+    rules = [WORKOUT_GOAL_MAPPING[goal] for goal in goals]
+    n_goals = len(goals)
 
-    # Apply readiness factor to 1RM
+    # Apply readiness factor to 1RM, then the goal intensity ranges: [n_samples, 1] x [n_goals]
     adjusted_1rm = predicted_1rm * readiness_factor
-
-    # Calculate intensity ranges
-    intensity_min, intensity_max = rules['intensity_percent']
-    training_weight_min = adjusted_1rm * intensity_min
-    training_weight_max = adjusted_1rm * intensity_max
-
-    # Select reps and sets within ranges
+    intensity = np.array([r['intensity_percent'] for r in rules], dtype=float).reshape(-1, 2)
+    training_weight_min = adjusted_1rm[:, None] * intensity[:, 0]
+    training_weight_max = adjusted_1rm[:, None] * intensity[:, 1]
+
+    # Reps, sets and rest depend only on the goal
+    reps_recommended = np.array([sum(r['rep_range']) // 2 for r in rules], dtype=np.int64)
+    sets_recommended = np.array([sum(r['sets_range']) // 2 for r in rules], dtype=np.int64)
+    rest_recommended = np.array([sum(r['rest_minutes']) / 2 for r in rules], dtype=float)
+
+    return pd.DataFrame({
+        'sample_idx': np.repeat(np.arange(n_samples), n_goals),
+        'goal_idx': np.tile(np.arange(n_goals), n_samples),
+        'goal': np.tile(np.array(goals, dtype=object), n_samples),
+        'predicted_1rm': np.repeat(predicted_1rm, n_goals),
+        'readiness_factor': np.repeat(readiness_factor, n_goals),
+        'adjusted_1rm': np.repeat(adjusted_1rm, n_goals),
+        'training_weight_min': training_weight_min.ravel(),
+        'training_weight_max': training_weight_max.ravel(),
+        'training_weight_recommended': ((training_weight_min + training_weight_max) / 2).ravel(),
+        'reps_recommended': np.tile(reps_recommended, n_samples),
+        'sets_recommended': np.tile(sets_recommended, n_samples),
+        'rest_recommended': np.tile(rest_recommended, n_samples),
+    })
+
+def workout_to_dict(workout: Dict) -> Dict:
+    """
+    Nested workout parameters for one decode_1rm_to_workout_batch row
+    (a to_dict('records') entry); values stay unrounded, format them when displaying
+    """
+    rules = WORKOUT_GOAL_MAPPING[workout['goal']]
     rep_min, rep_max = rules['rep_range']
     sets_min, sets_max = rules['sets_range']
     rest_min, rest_max = rules['rest_minutes']
 
     return {
-        'predicted_1rm': round(predicted_1rm, 2),
-        'adjusted_1rm': round(adjusted_1rm, 2),
-        'readiness_factor': readiness_factor,
-        'goal': goal,
+        'predicted_1rm': workout['predicted_1rm'],
+        'adjusted_1rm': workout['adjusted_1rm'],
+        'readiness_factor': workout['readiness_factor'],
+        'goal': workout['goal'],
         'training_weight_kg': {
-            'min': round(training_weight_min, 2),
-            'max': round(training_weight_max, 2),
-            'recommended': round((training_weight_min + training_weight_max) / 2, 2)
+            'min': workout['training_weight_min'],
+            'max': workout['training_weight_max'],
+            'recommended': workout['training_weight_recommended']
         },
         'reps': {
             'min': rep_min,
             'max': rep_max,
-            'recommended': (rep_min + rep_max) // 2
+            'recommended': workout['reps_recommended']
         },
         'sets': {
             'min': sets_min,
             'max': sets_max,
-            'recommended': (sets_min + sets_max) // 2
+            'recommended': workout['sets_recommended']
         },
         'rest_minutes': {
             'min': rest_min,
             'max': rest_max,
-            'recommended': (rest_min + rest_max) / 2
+            'recommended': workout['rest_recommended']
         },
         'description': rules['description']
     }
 
+def decode_1rm_to_workout(predicted_1rm: float, goal: str, readiness_factor: float) -> Dict:
+    """
+    Convert predicted 1RM to specific workout parameters using rule-based decoding
+    """
+    workout = decode_1rm_to_workout_batch([predicted_1rm], [readiness_factor], [goal]).to_dict('records')[0]
+    return workout_to_dict(workout)
+
 # ==================== DATASET CLASS ====================
 
 class V3Dataset(Dataset):
@@ -378,18 +427,67 @@ class V3EnhancedModel(nn.Module):
 
 # ==================== TRAINING UTILITIES ====================
 
+def _error_stats_numpy(y_true, y_pred):
+    """MAE, MSE, MAPE, target variance and Pearson correlation via NumPy"""
+    # All error metrics derive from one residual array (same values as the sklearn scorers)
+    residuals = y_true - y_pred
+    mae = np.abs(residuals).mean()
+    mse = (residuals * residuals).mean()
+    mape = np.mean(np.abs(residuals / (y_true + 1e-8))) * 100
+    correlation = np.corrcoef(y_true, y_pred)[0, 1]
+    return mae, mse, mape, y_true.var(), correlation
+
+if njit is not None:
+    @njit(cache=True, error_model="numpy")
+    def _error_stats_fused(y_true, y_pred):
+        """Same statistics as _error_stats_numpy in two loops, without temporaries"""
+        n = y_true.shape[0]
+        true_mean = 0.0
+        pred_mean = 0.0
+        for i in range(n):
+            true_mean += y_true[i]
+            pred_mean += y_pred[i]
+        true_mean /= n
+        pred_mean /= n
+
+        abs_sum = 0.0
+        sq_sum = 0.0
+        pct_sum = 0.0
+        true_ss = 0.0
+        pred_ss = 0.0
+        cross_ss = 0.0
+        for i in range(n):
+            residual = y_true[i] - y_pred[i]
+            abs_sum += abs(residual)
+            sq_sum += residual * residual
+            pct_sum += abs(residual / (y_true[i] + 1e-8))
+            dt = y_true[i] - true_mean
+            dp = y_pred[i] - pred_mean
+            true_ss += dt * dt
+            pred_ss += dp * dp
+            cross_ss += dt * dp
+
+        correlation = cross_ss / np.sqrt(true_ss * pred_ss)
+        return abs_sum / n, sq_sum / n, pct_sum / n * 100, true_ss / n, correlation
+
 def calculate_metrics(y_true, y_pred, task_name=""):
     """Calculate comprehensive metrics for model evaluation"""
-    mae = mean_absolute_error(y_true, y_pred)
-    mse = mean_squared_error(y_true, y_pred)
-    rmse = np.sqrt(mse)
-    r2 = r2_score(y_true, y_pred)
+    y_true = np.ravel(y_true)
+    y_pred = np.ravel(y_pred)
+    if njit is not None:
+        mae, mse, mape, true_var, correlation = _error_stats_fused(
+            np.ascontiguousarray(y_true, dtype=np.float64), np.ascontiguousarray(y_pred, dtype=np.float64)
+        )
+    else:
+        mae, mse, mape, true_var, correlation = _error_stats_numpy(y_true, y_pred)
 
-    # Percentage error (MAPE)
-    mape = np.mean(np.abs((y_true - y_pred) / (y_true + 1e-8))) * 100
+    rmse = np.sqrt(mse)
+    if true_var == 0:
+        r2 = 1.0 if mse == 0 else 0.0  # sklearn's convention for constant targets
+    else:
+        r2 = 1 - mse / true_var
 
-    # Correlation coefficient
-    correlation = np.corrcoef(y_true.flatten(), y_pred.flatten())[0, 1]
+    # Correlation is undefined for constant inputs
     if np.isnan(correlation):
         correlation = 0.0
 
@@ -455,12 +553,13 @@ def validate_epoch(model, dataloader, criterion_1rm, criterion_suit, criterion_r
     all_suit_true, all_suit_pred = [], []
     all_ready_true, all_ready_pred = [], []
 
-    with torch.no_grad():
+    # inference_mode skips autograd bookkeeping entirely (cheaper than no_grad)
+    with torch.inference_mode():
         for features, target_1rm, target_suit, target_ready in dataloader:
-            features = features.to(device)
-            target_1rm = target_1rm.to(device)
-            target_suit = target_suit.to(device)
-            target_ready = target_ready.to(device)
+            features = features.to(device, non_blocking=True)
+            target_1rm = target_1rm.to(device, non_blocking=True)
+            target_suit = target_suit.to(device, non_blocking=True)
+            target_ready = target_ready.to(device, non_blocking=True)
 
             pred_1rm, pred_suit, pred_ready = model(features)
 
@@ -472,24 +571,54 @@ def validate_epoch(model, dataloader, criterion_1rm, criterion_suit, criterion_r
             total_loss_batch = 2.0 * loss_1rm + 1.0 * loss_suit + 0.5 * loss_ready
             total_loss += total_loss_batch.item()
 
-            # Collect predictions for metrics
-            all_1rm_true.extend(target_1rm.cpu().numpy())
-            all_1rm_pred.extend(pred_1rm.cpu().numpy())
-            all_suit_true.extend(target_suit.cpu().numpy())
-            all_suit_pred.extend(pred_suit.cpu().numpy())
-            all_ready_true.extend(target_ready.cpu().numpy())
-            all_ready_pred.extend(pred_ready.cpu().numpy())
+            # Collect per-batch tensors for metrics; concatenated once after the loop
+            all_1rm_true.append(target_1rm.cpu())
+            all_1rm_pred.append(pred_1rm.cpu())
+            all_suit_true.append(target_suit.cpu())
+            all_suit_pred.append(pred_suit.cpu())
+            all_ready_true.append(target_ready.cpu())
+            all_ready_pred.append(pred_ready.cpu())
 
     # Calculate comprehensive metrics
     metrics = {}
-    metrics.update(calculate_metrics(np.array(all_1rm_true), np.array(all_1rm_pred), "1rm"))
-    metrics.update(calculate_metrics(np.array(all_suit_true), np.array(all_suit_pred), "suitability"))
-    metrics.update(calculate_metrics(np.array(all_ready_true), np.array(all_ready_pred), "readiness"))
+    metrics.update(calculate_metrics(torch.cat(all_1rm_true).numpy(), torch.cat(all_1rm_pred).numpy(), "1rm"))
+    metrics.update(calculate_metrics(torch.cat(all_suit_true).numpy(), torch.cat(all_suit_pred).numpy(), "suitability"))
+    metrics.update(calculate_metrics(torch.cat(all_ready_true).numpy(), torch.cat(all_ready_pred).numpy(), "readiness"))
 
     return total_loss / len(dataloader), metrics
 
 # ==================== VISUALIZATION FUNCTIONS ====================
 
+# Numeric features shown in the training-data correlation heatmap
+CORRELATION_FEATURES = ('age', 'weight_kg', 'height_m', 'bmi', 'experience_level',
+                        'workout_frequency', 'resting_heartrate', 'mood_numeric',
+                        'fatigue_numeric', 'effort_numeric', 'estimated_1rm',
+                        'suitability_score', 'readiness_factor')
+
+def plot_histogram(ax, values, bins=50, **kwargs):
+    """
+    Draw a histogram from precomputed np.histogram counts (ax.bar) instead of ax.hist
+
+    Args:
+        ax: Matplotlib axis
+        values: Series/array without NaN
+        bins: Number of bins or bin edges
+    """
+    counts, edges = np.histogram(np.asarray(values, dtype=float), bins=bins)
+    return ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', **kwargs)
+
+def correlation_matrix(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Pearson correlation via np.corrcoef; falls back to DataFrame.corr when the
+    columns have missing values so the pairwise NaN handling stays the same
+    """
+    values = df[columns].to_numpy(dtype=np.float64)
+    if len(values) < 2 or np.isnan(values).any():
+        return df[columns].corr()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.corrcoef(values, rowvar=False)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
 def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
     """
     Create comprehensive visualizations for training data analysis
@@ -498,6 +627,8 @@ def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
         df: Training dataframe
         artifacts_dir: Directory to save plots
     """
+    import matplotlib
+    matplotlib.use('Agg')  # plots are only saved to files
     import matplotlib.pyplot as plt
     import seaborn as sns
     
@@ -512,52 +643,68 @@ def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
     plt.rcParams['figure.figsize'] = (15, 10)
     
     # 1. Target Variable Distributions
-    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10), constrained_layout=True)
     fig.suptitle('Target Variable Distributions', fontsize=16, fontweight='bold')
     
+    # Pull the target columns out once as a float block; each panel uses its NaN-free column slice
+    target_cols = [col for col in ('estimated_1rm', 'suitability_score', 'readiness_factor', 'bmi')
+                   if col in df.columns]
+    target_block = df[target_cols].to_numpy(dtype=np.float64)
+    target_values = {}
+    for j, col in enumerate(target_cols):
+        values = target_block[:, j]
+        target_values[col] = values[~np.isnan(values)]
+    
     # 1RM Distribution
     if 'estimated_1rm' in df.columns:
-        axes[0, 0].hist(df['estimated_1rm'].dropna(), bins=50, color='steelblue', edgecolor='black', alpha=0.7)
+        values = target_values['estimated_1rm']
+        plot_histogram(axes[0, 0], values, bins=50, color='steelblue', edgecolor='black', alpha=0.7)
         axes[0, 0].set_title('Estimated 1RM Distribution')
         axes[0, 0].set_xlabel('1RM (kg)')
         axes[0, 0].set_ylabel('Frequency')
-        axes[0, 0].axvline(df['estimated_1rm'].mean(), color='red', linestyle='--', label=f'Mean: {df["estimated_1rm"].mean():.1f}')
+        mean = values.mean()
+        axes[0, 0].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.1f}')
         axes[0, 0].legend()
     
     # Suitability Score Distribution
     if 'suitability_score' in df.columns:
-        axes[0, 1].hist(df['suitability_score'].dropna(), bins=30, color='green', edgecolor='black', alpha=0.7)
+        values = target_values['suitability_score']
+        plot_histogram(axes[0, 1], values, bins=30, color='green', edgecolor='black', alpha=0.7)
         axes[0, 1].set_title('Suitability Score Distribution')
         axes[0, 1].set_xlabel('Suitability Score')
         axes[0, 1].set_ylabel('Frequency')
-        axes[0, 1].axvline(df['suitability_score'].mean(), color='red', linestyle='--', label=f'Mean: {df["suitability_score"].mean():.3f}')
+        mean = values.mean()
+        axes[0, 1].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.3f}')
         axes[0, 1].legend()
     
     # Readiness Factor Distribution
     if 'readiness_factor' in df.columns:
-        axes[1, 0].hist(df['readiness_factor'].dropna(), bins=30, color='orange', edgecolor='black', alpha=0.7)
+        values = target_values['readiness_factor']
+        plot_histogram(axes[1, 0], values, bins=30, color='orange', edgecolor='black', alpha=0.7)
         axes[1, 0].set_title('Readiness Factor Distribution')
         axes[1, 0].set_xlabel('Readiness Factor')
         axes[1, 0].set_ylabel('Frequency')
-        axes[1, 0].axvline(df['readiness_factor'].mean(), color='red', linestyle='--', label=f'Mean: {df["readiness_factor"].mean():.3f}')
+        mean = values.mean()
+        axes[1, 0].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.3f}')
         axes[1, 0].legend()
     
     # BMI Distribution
     if 'bmi' in df.columns:
-        axes[1, 1].hist(df['bmi'].dropna(), bins=40, color='purple', edgecolor='black', alpha=0.7)
+        values = target_values['bmi']
+        plot_histogram(axes[1, 1], values, bins=40, color='purple', edgecolor='black', alpha=0.7)
         axes[1, 1].set_title('BMI Distribution')
         axes[1, 1].set_xlabel('BMI')
         axes[1, 1].set_ylabel('Frequency')
-        axes[1, 1].axvline(df['bmi'].mean(), color='red', linestyle='--', label=f'Mean: {df["bmi"].mean():.1f}')
+        mean = values.mean()
+        axes[1, 1].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.1f}')
         axes[1, 1].legend()
     
-    plt.tight_layout()
     plt.savefig(os.path.join(viz_dir, '01_target_distributions.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 01_target_distributions.png")
     
     # 2. SePA (Sleep, Psychology, Activity) Analysis
-    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5), constrained_layout=True)
     fig.suptitle('SePA Features Distribution', fontsize=16, fontweight='bold')
     
     sepa_cols = ['mood_numeric', 'fatigue_numeric', 'effort_numeric']
@@ -573,36 +720,31 @@ def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
             axes[idx].set_ylabel('Count')
             axes[idx].set_xticks([1, 2, 3, 4, 5])
     
-    plt.tight_layout()
     plt.savefig(os.path.join(viz_dir, '02_sepa_distributions.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 02_sepa_distributions.png")
     
     # 3. Correlation Heatmap
-    numeric_cols = ['age', 'weight_kg', 'height_m', 'bmi', 'experience_level', 
-                    'workout_frequency', 'resting_heartrate', 'mood_numeric', 
-                    'fatigue_numeric', 'effort_numeric', 'estimated_1rm', 
-                    'suitability_score', 'readiness_factor']
-    
-    available_numeric = [col for col in numeric_cols if col in df.columns]
+    available_numeric = [col for col in CORRELATION_FEATURES if col in df.columns]
     
     if len(available_numeric) > 2:
-        plt.figure(figsize=(14, 12))
-        correlation_matrix = df[available_numeric].corr()
+        plt.figure(figsize=(14, 12), constrained_layout=True)
+        corr = correlation_matrix(df, available_numeric)
         
-        mask = np.triu(np.ones_like(correlation_matrix, dtype=bool))
-        sns.heatmap(correlation_matrix, mask=mask, annot=True, fmt='.2f', 
+        mask = np.triu(np.ones_like(corr, dtype=bool))
+        # Format annotations in one vectorized call instead of seaborn's per-cell formatting
+        annot_labels = np.char.mod('%.2f', corr.to_numpy())
+        sns.heatmap(corr, mask=mask, annot=annot_labels, fmt='', 
                    cmap='coolwarm', center=0, square=True, linewidths=1,
                    cbar_kws={"shrink": 0.8})
         
         plt.title('Feature Correlation Heatmap', fontsize=16, fontweight='bold', pad=20)
-        plt.tight_layout()
-        plt.savefig(os.path.join(viz_dir, '03_correlation_heatmap.png'), dpi=300, bbox_inches='tight')
+        plt.savefig(os.path.join(viz_dir, '03_correlation_heatmap.png'), dpi=150, bbox_inches='tight')
         plt.close()
         print("  ✅ Saved: 03_correlation_heatmap.png")
     
     # 4. 1RM vs User Characteristics
-    fig, axes = plt.subplots(2, 3, figsize=(18, 10))
+    fig, axes = plt.subplots(2, 3, figsize=(18, 10), constrained_layout=True)
     fig.suptitle('1RM Relationships with User Characteristics', fontsize=16, fontweight='bold')
     
     scatter_pairs = [
@@ -628,14 +770,13 @@ def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
             axes[row, col].plot(df[x_col].sort_values(), p(df[x_col].sort_values()), 
                               "r--", alpha=0.8, linewidth=2)
     
-    plt.tight_layout()
     plt.savefig(os.path.join(viz_dir, '04_1rm_relationships.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 04_1rm_relationships.png")
     
     # 5. Gender Analysis
     if 'gender' in df.columns and 'estimated_1rm' in df.columns:
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        fig, axes = plt.subplots(1, 2, figsize=(14, 5), constrained_layout=True)
         fig.suptitle('Gender-based Analysis', fontsize=16, fontweight='bold')
         
         # 1RM by Gender
@@ -652,14 +793,13 @@ def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
         axes[1].set_title('Sample Count by Gender')
         axes[1].set_ylabel('Count')
         
-        plt.tight_layout()
         plt.savefig(os.path.join(viz_dir, '05_gender_analysis.png'), dpi=300, bbox_inches='tight')
         plt.close()
         print("  ✅ Saved: 05_gender_analysis.png")
     
     # 6. Experience Level Analysis
     if 'experience_level' in df.columns and 'estimated_1rm' in df.columns:
-        plt.figure(figsize=(10, 6))
+        plt.figure(figsize=(10, 6), constrained_layout=True)
         
         exp_1rm = df.groupby('experience_level')['estimated_1rm'].apply(list)
         plt.boxplot(exp_1rm.values, labels=exp_1rm.index)
@@ -668,7 +808,6 @@ def plot_training_data_analysis(df: pd.DataFrame, artifacts_dir: str):
         plt.ylabel('1RM (kg)')
         plt.grid(True, alpha=0.3)
         
-        plt.tight_layout()
         plt.savefig(os.path.join(viz_dir, '06_experience_analysis.png'), dpi=300, bbox_inches='tight')
         plt.close()
         print("  ✅ Saved: 06_experience_analysis.png")
@@ -687,6 +826,8 @@ def plot_training_history(train_losses: List[float], val_losses: List[float],
         val_metrics_history: List of validation metrics dictionaries per epoch
         artifacts_dir: Directory to save plots
     """
+    import matplotlib
+    matplotlib.use('Agg')  # plots are only saved to files
     import matplotlib.pyplot as plt
     
     viz_dir = os.path.join(artifacts_dir, 'visualizations')
@@ -695,7 +836,7 @@ def plot_training_history(train_losses: List[float], val_losses: List[float],
     epochs = range(1, len(train_losses) + 1)
     
     # 1. Loss Curves
-    fig, axes = plt.subplots(1, 2, figsize=(15, 5))
+    fig, axes = plt.subplots(1, 2, figsize=(15, 5), constrained_layout=True)
     fig.suptitle('Training History', fontsize=16, fontweight='bold')
     
     # Combined Loss
@@ -718,7 +859,6 @@ def plot_training_history(train_losses: List[float], val_losses: List[float],
         axes[1].axhline(y=0.8, color='r', linestyle='--', alpha=0.5, label='Target: 0.8')
         axes[1].legend()
     
-    plt.tight_layout()
     plt.savefig(os.path.join(viz_dir, '07_training_history.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 07_training_history.png")
@@ -727,46 +867,75 @@ def plot_training_history(train_losses: List[float], val_losses: List[float],
 
 # ==================== MAIN TRAINING FUNCTION ====================
 
+def resolve_dataset_path(xlsx_path: str) -> str:
+    """
+    Prefer the .parquet sibling of an .xlsx dataset when it is not older than the
+    workbook (or the workbook is missing), like DatasetLoader.load_dataset
+    """
+    parquet_path = os.path.splitext(xlsx_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and (
+            not os.path.exists(xlsx_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(xlsx_path)):
+        return parquet_path
+    return xlsx_path
+
+def read_dataset(path: str) -> pd.DataFrame:
+    """Read a .parquet or .xlsx dataset"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
 def load_and_combine_datasets(data_dir: str) -> pd.DataFrame:
     """
     Load and combine datasets from v3/data directory
-    - Primary: enhanced_gym_member_exercise_tracking_10k.xlsx
-    - Test: test_dataset.xlsx (prioritized for test set)
+    - Primary: enhanced_gym_member_exercise_tracking_10k.parquet (or .xlsx)
+    - Test: test_dataset.parquet (or .xlsx, prioritized for test set)
+    A .parquet file is used instead of its .xlsx sibling unless the workbook is newer.
     """
     import glob
 
     print(f"\n[1] Loading and combining datasets from: {data_dir}")
 
     # Define dataset paths
-    primary_path = os.path.join(data_dir, "enhanced_gym_member_exercise_tracking_10k.xlsx")
-    test_path = os.path.join(data_dir, "test_dataset.xlsx")
+    primary_path = resolve_dataset_path(os.path.join(data_dir, "enhanced_gym_member_exercise_tracking_10k.xlsx"))
+    test_path = resolve_dataset_path(os.path.join(data_dir, "test_dataset.xlsx"))
 
     datasets = []
 
-    # Load primary dataset
-    if os.path.exists(primary_path):
-        print("Loading primary dataset: enhanced_gym_member_exercise_tracking_10k.xlsx")
-        df_primary = pd.read_excel(primary_path)
-        df_primary['source'] = 'primary'
-        datasets.append(df_primary)
-        print(f"  - Primary dataset shape: {df_primary.shape}")
-
-    # Load test dataset (prioritized for test set)
-    if os.path.exists(test_path):
-        print("Loading test dataset: test_dataset.xlsx")
-        df_test = pd.read_excel(test_path)
-        df_test['source'] = 'test'
-        datasets.append(df_test)
-        print(f"  - Test dataset shape: {df_test.shape}")
-
-    # Load any other Excel files in the directory
-    other_files = glob.glob(os.path.join(data_dir, "*.xlsx"))
-    for file_path in other_files:
-        filename = os.path.basename(file_path)
-        if filename not in ["enhanced_gym_member_exercise_tracking_10k.xlsx", "test_dataset.xlsx"]:
+    other_stems = sorted({
+        os.path.splitext(file_path)[0]
+        for pattern in ("*.xlsx", "*.parquet")
+        for file_path in glob.glob(os.path.join(data_dir, pattern))
+    } - {os.path.splitext(primary_path)[0], os.path.splitext(test_path)[0]})
+    other_files = [resolve_dataset_path(stem + '.xlsx') for stem in other_stems]
+
+    # Parse all datasets in parallel threads, then collect them in the usual order
+    with ThreadPoolExecutor(max_workers=max(1, min(4, len(other_files) + 2))) as executor:
+        primary_future = executor.submit(read_dataset, primary_path) if os.path.exists(primary_path) else None
+        test_future = executor.submit(read_dataset, test_path) if os.path.exists(test_path) else None
+        other_futures = [(file_path, executor.submit(read_dataset, file_path)) for file_path in other_files]
+
+        # Load primary dataset
+        if primary_future is not None:
+            print(f"Loading primary dataset: {os.path.basename(primary_path)}")
+            df_primary = primary_future.result()
+            df_primary['source'] = 'primary'
+            datasets.append(df_primary)
+            print(f"  - Primary dataset shape: {df_primary.shape}")
+
+        # Load test dataset (prioritized for test set)
+        if test_future is not None:
+            print(f"Loading test dataset: {os.path.basename(test_path)}")
+            df_test = test_future.result()
+            df_test['source'] = 'test'
+            datasets.append(df_test)
+            print(f"  - Test dataset shape: {df_test.shape}")
+
+        # Load any other Excel/Parquet files in the directory
+        for file_path, future in other_futures:
+            filename = os.path.basename(file_path)
             print(f"Loading additional dataset: {filename}")
             try:
-                df_other = pd.read_excel(file_path)
+                df_other = future.result()
                 df_other['source'] = 'other'
                 datasets.append(df_other)
                 print(f"  - {filename} shape: {df_other.shape}")
@@ -774,7 +943,7 @@ def load_and_combine_datasets(data_dir: str) -> pd.DataFrame:
                 print(f"  - Error loading {filename}: {e}")
 
     if not datasets:
-        raise FileNotFoundError("No valid Excel datasets found in the specified directory")
+        raise FileNotFoundError("No valid Excel or Parquet datasets found in the specified directory")
 
     # Combine all datasets
     df_combined = pd.concat(datasets, ignore_index=True)
@@ -858,7 +1027,8 @@ def create_train_val_test_split(df: pd.DataFrame, train_ratio: float = 0.7,
     return train_df, val_df, test_df
 
 def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int = 64,
-         lr: float = 1e-3, use_transformer: bool = False):
+         lr: float = 1e-3, use_transformer: bool = False, skip_viz: bool = False,
+         eval_batch_size: int = 512):
 
     print("="*80)
     print("V3 ENHANCED TRAINING - 1RM PREDICTION WITH SEPA INTEGRATION")
@@ -872,9 +1042,12 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
     print(f"Combined dataset shape: {df_combined.shape}")
     print(f"Columns: {list(df_combined.columns)}")
 
-    # Generate training data visualizations
-    print("\n📊 Generating Training Data Analysis...")
-    plot_training_data_analysis(df_combined, artifacts_dir)
+    # Generate training data visualizations (skipped for batch/CI runs)
+    if skip_viz:
+        print("\n📊 Skipping Training Data Analysis plots (--no_viz)")
+    else:
+        print("\n📊 Generating Training Data Analysis...")
+        plot_training_data_analysis(df_combined, artifacts_dir)
 
     # Create train/validation/test split
     train_df, val_df, test_df = create_train_val_test_split(df_combined, train_ratio=0.7, val_ratio=0.1, test_ratio=0.2)
@@ -893,44 +1066,42 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
         # Check if SePA columns need standardization (they might already be numeric)
         if 'mood' in df.columns:
             # Check if mood is already numeric (1-5) or needs conversion
-            if df['mood'].dtype == 'object' or df['mood'].apply(lambda x: isinstance(x, str)).any():
-                df['mood_numeric'] = df['mood'].apply(lambda x: map_sepa_to_numeric(x, MOOD_MAPPING))
+            if not pd.api.types.is_numeric_dtype(df['mood']):
+                df['mood_numeric'] = map_sepa_series(df['mood'], MOOD_MAPPING)
                 print(f"    - Mood standardized: {df['mood_numeric'].value_counts().sort_index().to_dict()}")
             else:
-                df['mood_numeric'] = df['mood'].astype(float)
+                df['mood_numeric'] = df['mood'].astype('float32')
                 print(f"    - Mood already numeric: {df['mood_numeric'].value_counts().sort_index().to_dict()}")
 
         if 'fatigue' in df.columns:
-            if df['fatigue'].dtype == 'object' or df['fatigue'].apply(lambda x: isinstance(x, str)).any():
-                df['fatigue_numeric'] = df['fatigue'].apply(lambda x: map_sepa_to_numeric(x, FATIGUE_MAPPING))
+            if not pd.api.types.is_numeric_dtype(df['fatigue']):
+                df['fatigue_numeric'] = map_sepa_series(df['fatigue'], FATIGUE_MAPPING)
                 print(f"    - Fatigue standardized: {df['fatigue_numeric'].value_counts().sort_index().to_dict()}")
             else:
-                df['fatigue_numeric'] = df['fatigue'].astype(float)
+                df['fatigue_numeric'] = df['fatigue'].astype('float32')
 
         if 'effort' in df.columns:
-            if df['effort'].dtype == 'object' or df['effort'].apply(lambda x: isinstance(x, str)).any():
-                df['effort_numeric'] = df['effort'].apply(lambda x: map_sepa_to_numeric(x, EFFORT_MAPPING))
+            if not pd.api.types.is_numeric_dtype(df['effort']):
+                df['effort_numeric'] = map_sepa_series(df['effort'], EFFORT_MAPPING)
                 print(f"    - Effort standardized: {df['effort_numeric'].value_counts().sort_index().to_dict()}")
             else:
-                df['effort_numeric'] = df['effort'].astype(float)
+                df['effort_numeric'] = df['effort'].astype('float32')
 
         # Calculate readiness factors
-        df['readiness_factor'] = df.apply(
-            lambda row: calculate_readiness_factor(
-                row.get('mood_numeric', 3),
-                row.get('fatigue_numeric', 3),
-                row.get('effort_numeric', 3)
-            ), axis=1
-        )
+        df['readiness_factor'] = calculate_readiness_factor_array(
+            df.get('mood_numeric', 3),
+            df.get('fatigue_numeric', 3),
+            df.get('effort_numeric', 3)
+        ).astype(np.float32)
 
         # Use existing suitability_x as suitability_score, or create if missing
         if 'suitability_x' in df.columns:
-            df['suitability_score'] = df['suitability_x']
+            df['suitability_score'] = df['suitability_x'].astype('float32')
         else:
             # Generate synthetic suitability scores if missing
             df['suitability_score'] = np.clip(
                 np.random.normal(0.7, 0.15, len(df)), 0.1, 1.0
-            )
+            ).astype(np.float32)
 
         # Feature selection
         feature_columns = [
@@ -943,8 +1114,13 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
         available_features = [col for col in feature_columns if col in df.columns]
         print(f"    - Using features: {available_features}")
 
-        # Prepare feature matrix
+        # Prepare feature matrix (numeric features as float32, the model trains in float32)
         X_df = df[available_features].copy()
+        memory_before = X_df.memory_usage(deep=True).sum()
+        numeric_features = [col for col in available_features
+                            if col != 'gender' and pd.api.types.is_numeric_dtype(X_df[col])]
+        X_df[numeric_features] = X_df[numeric_features].astype('float32')
+        print(f"    - Feature memory: {memory_before / 1024:.1f} KB -> {X_df.memory_usage(deep=True).sum() / 1024:.1f} KB")
 
         # Target variables
         y_1rm = df['estimated_1rm'].values
@@ -1015,9 +1191,11 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
         X_test_processed, y_1rm_test, y_suit_test, y_ready_test
     )
 
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
-    test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False)
+    # Validation/test batches carry no gradients, so they can be much larger than training ones
+    pin_memory = torch.cuda.is_available()
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, pin_memory=pin_memory)
+    val_loader = DataLoader(val_dataset, batch_size=eval_batch_size, shuffle=False, pin_memory=pin_memory)
+    test_loader = DataLoader(test_dataset, batch_size=eval_batch_size, shuffle=False, pin_memory=pin_memory)
 
     # Initialize model
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -1124,7 +1302,8 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
     }
 
     # Plot training history
-    plot_training_history(train_losses, val_losses, val_metrics_history, artifacts_dir)
+    if not skip_viz:
+        plot_training_history(train_losses, val_losses, val_metrics_history, artifacts_dir)
 
     # Save preprocessor
     preprocessor_path = os.path.join(artifacts_dir, "preprocessor_v3.joblib")
@@ -1182,6 +1361,7 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
         'training_config': {
             'epochs': epochs,
             'batch_size': batch_size,
+            'eval_batch_size': eval_batch_size,
             'learning_rate': lr,
             'loss_weights': {'1rm': 2.0, 'suitability': 1.0, 'readiness': 0.5}
         },
@@ -1222,8 +1402,8 @@ def main(data_dir: str, artifacts_dir: str, epochs: int = 100, batch_size: int =
     for goal in goals:
         workout_params = decode_1rm_to_workout(sample_1rm, goal, sample_readiness)
         print(f"\n  Goal: {goal.upper()}")
-        print(f"    Predicted 1RM: {workout_params['predicted_1rm']}kg")
-        print(f"    Adjusted 1RM: {workout_params['adjusted_1rm']}kg (Readiness: {workout_params['readiness_factor']})")
+        print(f"    Predicted 1RM: {workout_params['predicted_1rm']:.2f}kg")
+        print(f"    Adjusted 1RM: {workout_params['adjusted_1rm']:.2f}kg (Readiness: {workout_params['readiness_factor']})")
         print(f"    Training Weight: {workout_params['training_weight_kg']['recommended']:.1f}kg")
         print(f"    Reps: {workout_params['reps']['recommended']} ({workout_params['reps']['min']}-{workout_params['reps']['max']})")
         print(f"    Sets: {workout_params['sets']['recommended']} ({workout_params['sets']['min']}-{workout_params['sets']['max']})")
@@ -1243,8 +1423,10 @@ if __name__ == "__main__":
                        help='Directory to save model artifacts')
     parser.add_argument('--epochs', type=int, default=100, help='Number of training epochs')
     parser.add_argument('--batch_size', type=int, default=64, help='Batch size for training')
+    parser.add_argument('--eval_batch_size', type=int, default=512, help='Batch size for validation/test evaluation')
     parser.add_argument('--lr', type=float, default=1e-3, help='Learning rate')
     parser.add_argument('--use_transformer', action='store_true', help='Use Transformer instead of LSTM')
+    parser.add_argument('--no_viz', action='store_true', help='Skip generating visualization PNGs')
 
     args = parser.parse_args()
 
@@ -1254,5 +1436,7 @@ if __name__ == "__main__":
         epochs=args.epochs,
         batch_size=args.batch_size,
         lr=args.lr,
-        use_transformer=args.use_transformer
+        use_transformer=args.use_transformer,
+        skip_viz=args.no_viz,
+        eval_batch_size=args.eval_batch_size
     )
\ No newline at end of file
@@ -13,6 +13,8 @@ import os
 import argparse
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # plots are only saved to files
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -20,11 +22,14 @@ import seaborn as sns
 try:
     from train_v3_enhanced import (
         load_and_combine_datasets,
-        map_sepa_to_numeric,
+        map_sepa_series,
         MOOD_MAPPING,
         FATIGUE_MAPPING,
         EFFORT_MAPPING,
-        calculate_readiness_factor
+        calculate_readiness_factor_array,
+        plot_histogram,
+        correlation_matrix,
+        CORRELATION_FEATURES
     )
 except ImportError:
     print("Error: Could not import from train_v3_enhanced.py")
@@ -44,52 +49,68 @@ def plot_training_data_analysis(df: pd.DataFrame, output_dir: str):
     plt.rcParams['figure.figsize'] = (15, 10)
     
     # 1. Target Variable Distributions
-    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10), constrained_layout=True)
     fig.suptitle('Target Variable Distributions', fontsize=16, fontweight='bold')
     
+    # Pull the target columns out once as a float block; each panel uses its NaN-free column slice
+    target_cols = [col for col in ('estimated_1rm', 'suitability_score', 'readiness_factor', 'bmi')
+                   if col in df.columns]
+    target_block = df[target_cols].to_numpy(dtype=np.float64)
+    target_values = {}
+    for j, col in enumerate(target_cols):
+        values = target_block[:, j]
+        target_values[col] = values[~np.isnan(values)]
+    
     # 1RM Distribution
     if 'estimated_1rm' in df.columns:
-        axes[0, 0].hist(df['estimated_1rm'].dropna(), bins=50, color='steelblue', edgecolor='black', alpha=0.7)
+        values = target_values['estimated_1rm']
+        plot_histogram(axes[0, 0], values, bins=50, color='steelblue', edgecolor='black', alpha=0.7)
         axes[0, 0].set_title('Estimated 1RM Distribution')
         axes[0, 0].set_xlabel('1RM (kg)')
         axes[0, 0].set_ylabel('Frequency')
-        axes[0, 0].axvline(df['estimated_1rm'].mean(), color='red', linestyle='--', label=f'Mean: {df["estimated_1rm"].mean():.1f}')
+        mean = values.mean()
+        axes[0, 0].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.1f}')
         axes[0, 0].legend()
     
     # Suitability Score Distribution
     if 'suitability_score' in df.columns:
-        axes[0, 1].hist(df['suitability_score'].dropna(), bins=30, color='green', edgecolor='black', alpha=0.7)
+        values = target_values['suitability_score']
+        plot_histogram(axes[0, 1], values, bins=30, color='green', edgecolor='black', alpha=0.7)
         axes[0, 1].set_title('Suitability Score Distribution')
         axes[0, 1].set_xlabel('Suitability Score')
         axes[0, 1].set_ylabel('Frequency')
-        axes[0, 1].axvline(df['suitability_score'].mean(), color='red', linestyle='--', label=f'Mean: {df["suitability_score"].mean():.3f}')
+        mean = values.mean()
+        axes[0, 1].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.3f}')
         axes[0, 1].legend()
     
     # Readiness Factor Distribution
     if 'readiness_factor' in df.columns:
-        axes[1, 0].hist(df['readiness_factor'].dropna(), bins=30, color='orange', edgecolor='black', alpha=0.7)
+        values = target_values['readiness_factor']
+        plot_histogram(axes[1, 0], values, bins=30, color='orange', edgecolor='black', alpha=0.7)
         axes[1, 0].set_title('Readiness Factor Distribution')
         axes[1, 0].set_xlabel('Readiness Factor')
         axes[1, 0].set_ylabel('Frequency')
-        axes[1, 0].axvline(df['readiness_factor'].mean(), color='red', linestyle='--', label=f'Mean: {df["readiness_factor"].mean():.3f}')
+        mean = values.mean()
+        axes[1, 0].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.3f}')
         axes[1, 0].legend()
     
     # BMI Distribution
     if 'bmi' in df.columns:
-        axes[1, 1].hist(df['bmi'].dropna(), bins=40, color='purple', edgecolor='black', alpha=0.7)
+        values = target_values['bmi']
+        plot_histogram(axes[1, 1], values, bins=40, color='purple', edgecolor='black', alpha=0.7)
         axes[1, 1].set_title('BMI Distribution')
         axes[1, 1].set_xlabel('BMI')
         axes[1, 1].set_ylabel('Frequency')
-        axes[1, 1].axvline(df['bmi'].mean(), color='red', linestyle='--', label=f'Mean: {df["bmi"].mean():.1f}')
+        mean = values.mean()
+        axes[1, 1].axvline(mean, color='red', linestyle='--', label=f'Mean: {mean:.1f}')
         axes[1, 1].legend()
     
-    plt.tight_layout()
     plt.savefig(os.path.join(output_dir, '01_target_distributions.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 01_target_distributions.png")
     
     # 2. SePA (Sleep, Psychology, Activity) Analysis
-    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5), constrained_layout=True)
     fig.suptitle('SePA Features Distribution', fontsize=16, fontweight='bold')
     
     sepa_cols = ['mood_numeric', 'fatigue_numeric', 'effort_numeric']
@@ -105,36 +126,31 @@ def plot_training_data_analysis(df: pd.DataFrame, output_dir: str):
             axes[idx].set_ylabel('Count')
             axes[idx].set_xticks([1, 2, 3, 4, 5])
     
-    plt.tight_layout()
     plt.savefig(os.path.join(output_dir, '02_sepa_distributions.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 02_sepa_distributions.png")
     
     # 3. Correlation Heatmap
-    numeric_cols = ['age', 'weight_kg', 'height_m', 'bmi', 'experience_level', 
-                    'workout_frequency', 'resting_heartrate', 'mood_numeric', 
-                    'fatigue_numeric', 'effort_numeric', 'estimated_1rm', 
-                    'suitability_score', 'readiness_factor']
-    
-    available_numeric = [col for col in numeric_cols if col in df.columns]
+    available_numeric = [col for col in CORRELATION_FEATURES if col in df.columns]
     
     if len(available_numeric) > 2:
-        plt.figure(figsize=(14, 12))
-        correlation_matrix = df[available_numeric].corr()
+        plt.figure(figsize=(14, 12), constrained_layout=True)
+        corr = correlation_matrix(df, available_numeric)
         
-        mask = np.triu(np.ones_like(correlation_matrix, dtype=bool))
-        sns.heatmap(correlation_matrix, mask=mask, annot=True, fmt='.2f', 
+        mask = np.triu(np.ones_like(corr, dtype=bool))
+        # Format annotations in one vectorized call instead of seaborn's per-cell formatting
+        annot_labels = np.char.mod('%.2f', corr.to_numpy())
+        sns.heatmap(corr, mask=mask, annot=annot_labels, fmt='', 
                    cmap='coolwarm', center=0, square=True, linewidths=1,
                    cbar_kws={"shrink": 0.8})
         
         plt.title('Feature Correlation Heatmap', fontsize=16, fontweight='bold', pad=20)
-        plt.tight_layout()
-        plt.savefig(os.path.join(output_dir, '03_correlation_heatmap.png'), dpi=300, bbox_inches='tight')
+        plt.savefig(os.path.join(output_dir, '03_correlation_heatmap.png'), dpi=150, bbox_inches='tight')
         plt.close()
         print("  ✅ Saved: 03_correlation_heatmap.png")
     
     # 4. 1RM vs User Characteristics
-    fig, axes = plt.subplots(2, 3, figsize=(18, 10))
+    fig, axes = plt.subplots(2, 3, figsize=(18, 10), constrained_layout=True)
     fig.suptitle('1RM Relationships with User Characteristics', fontsize=16, fontweight='bold')
     
     scatter_pairs = [
@@ -162,14 +178,13 @@ def plot_training_data_analysis(df: pd.DataFrame, output_dir: str):
                 x_sorted = valid_data[x_col].sort_values()
                 axes[row, col].plot(x_sorted, p(x_sorted), "r--", alpha=0.8, linewidth=2)
     
-    plt.tight_layout()
     plt.savefig(os.path.join(output_dir, '04_1rm_relationships.png'), dpi=300, bbox_inches='tight')
     plt.close()
     print("  ✅ Saved: 04_1rm_relationships.png")
     
     # 5. Gender Analysis
     if 'gender' in df.columns and 'estimated_1rm' in df.columns:
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        fig, axes = plt.subplots(1, 2, figsize=(14, 5), constrained_layout=True)
         fig.suptitle('Gender-based Analysis', fontsize=16, fontweight='bold')
         
         # 1RM by Gender
@@ -186,14 +201,13 @@ def plot_training_data_analysis(df: pd.DataFrame, output_dir: str):
         axes[1].set_title('Sample Count by Gender')
         axes[1].set_ylabel('Count')
         
-        plt.tight_layout()
         plt.savefig(os.path.join(output_dir, '05_gender_analysis.png'), dpi=300, bbox_inches='tight')
         plt.close()
         print("  ✅ Saved: 05_gender_analysis.png")
     
     # 6. Experience Level Analysis
     if 'experience_level' in df.columns and 'estimated_1rm' in df.columns:
-        plt.figure(figsize=(10, 6))
+        plt.figure(figsize=(10, 6), constrained_layout=True)
         
         exp_1rm = df.groupby('experience_level')['estimated_1rm'].apply(list)
         plt.boxplot(exp_1rm.values, labels=exp_1rm.index)
@@ -202,7 +216,6 @@ def plot_training_data_analysis(df: pd.DataFrame, output_dir: str):
         plt.ylabel('1RM (kg)')
         plt.grid(True, alpha=0.3)
         
-        plt.tight_layout()
         plt.savefig(os.path.join(output_dir, '06_experience_analysis.png'), dpi=300, bbox_inches='tight')
         plt.close()
         print("  ✅ Saved: 06_experience_analysis.png")
@@ -216,29 +229,27 @@ def prepare_data_for_visualization(df: pd.DataFrame) -> pd.DataFrame:
     # Process SePA columns
     if 'mood' in df.columns:
         if df['mood'].dtype == 'object':
-            df['mood_numeric'] = df['mood'].apply(lambda x: map_sepa_to_numeric(x, MOOD_MAPPING))
+            df['mood_numeric'] = map_sepa_series(df['mood'], MOOD_MAPPING)
         else:
             df['mood_numeric'] = df['mood'].astype(float)
     
     if 'fatigue' in df.columns:
         if df['fatigue'].dtype == 'object':
-            df['fatigue_numeric'] = df['fatigue'].apply(lambda x: map_sepa_to_numeric(x, FATIGUE_MAPPING))
+            df['fatigue_numeric'] = map_sepa_series(df['fatigue'], FATIGUE_MAPPING)
         else:
             df['fatigue_numeric'] = df['fatigue'].astype(float)
     
     if 'effort' in df.columns:
         if df['effort'].dtype == 'object':
-            df['effort_numeric'] = df['effort'].apply(lambda x: map_sepa_to_numeric(x, EFFORT_MAPPING))
+            df['effort_numeric'] = map_sepa_series(df['effort'], EFFORT_MAPPING)
         else:
             df['effort_numeric'] = df['effort'].astype(float)
     
     # Calculate readiness factors
-    df['readiness_factor'] = df.apply(
-        lambda row: calculate_readiness_factor(
-            row.get('mood_numeric', 3),
-            row.get('fatigue_numeric', 3),
-            row.get('effort_numeric', 3)
-        ), axis=1
+    df['readiness_factor'] = calculate_readiness_factor_array(
+        df.get('mood_numeric', 3),
+        df.get('fatigue_numeric', 3),
+        df.get('effort_numeric', 3)
     )
     
     # Use existing suitability_x as suitability_score
@@ -1,22 +1,30 @@
 import torch
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # plots are only saved to files
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import (
-    mean_squared_error, mean_absolute_error, r2_score, explained_variance_score,
-    accuracy_score, precision_score, recall_score, f1_score, roc_auc_score,
+    accuracy_score, roc_auc_score,
     confusion_matrix, roc_curve, average_precision_score
 )
 from sklearn.preprocessing import StandardScaler
 import pickle
 import json
 import os
-from typing import Dict, List, Tuple
+import joblib
+from joblib import Memory
+from typing import Dict, List, Optional, Tuple
 import logging
 from datetime import datetime
 import warnings
 
+try:
+    import orjson
+except ImportError:  # optional, the stdlib json writer is used instead
+    orjson = None
+
 # Import the training model
 from training_model import TwoBranchRecommendationModel
 
@@ -27,16 +35,95 @@ logger = logging.getLogger(__name__)
 # Suppress matplotlib warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
 
+# Suitability score categories (based on README.md): upper bounds of all but the last category
+SUITABILITY_CATEGORY_BOUNDS = np.array([0.4, 0.6, 0.75, 0.85])
+SUITABILITY_CATEGORIES = ['Not Suitable', 'Support/Alternative', 'Needs Adjustment', 'Effective', 'Optimal']
+
+def categorize_suitability(scores: np.ndarray) -> np.ndarray:
+    """Map suitability scores to category indices into SUITABILITY_CATEGORIES with one binary search"""
+    return np.searchsorted(SUITABILITY_CATEGORY_BOUNDS, scores, side='right')
+
+def regression_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict:
+    """
+    MSE/RMSE/MAE/R2/explained variance from one residual array
+    (same values as the sklearn regression scorers for 1-D targets)
+    """
+    residuals = y_true - y_pred
+    squared = residuals * residuals
+    mse = squared.mean()
+    true_var = y_true.var()
+
+    def score(unexplained, total):
+        # sklearn's force_finite convention for constant targets
+        if total == 0:
+            return 1.0 if unexplained == 0 else 0.0
+        return 1 - unexplained / total
+
+    return {
+        'MSE': mse,
+        'RMSE': np.sqrt(mse),
+        'MAE': np.abs(residuals).mean(),
+        'R2': score(mse, true_var),
+        'Explained_Variance': score(residuals.var(), true_var),
+    }
+
+def binary_classification_metrics(y_true_binary: np.ndarray, y_pred_binary: np.ndarray) -> Dict:
+    """
+    Accuracy/Precision/Recall/F1 for 0/1 labels from a single confusion count
+    (same values as the sklearn scorers with zero_division=0)
+    """
+    tn, fp, fn, tp = np.bincount(2 * y_true_binary + y_pred_binary, minlength=4)
+    return {
+        'Accuracy': float((tp + tn) / len(y_true_binary)),
+        'Precision': float(tp / (tp + fp)) if tp + fp else 0.0,
+        'Recall': float(tp / (tp + fn)) if tp + fn else 0.0,
+        'F1_Score': float(2 * tp / (2 * tp + fp + fn)) if tp + fp + fn else 0.0,
+    }
+
+class NumpyJSONEncoder(json.JSONEncoder):
+    """JSON encoder that writes numpy arrays as lists and numpy scalars as Python numbers"""
+
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return str(obj)
+
+def save_json_report(report: Dict, path: str):
+    """Write a report dict as indented JSON, using orjson when it is installed"""
+    if orjson is not None:
+        # OPT_SERIALIZE_NUMPY covers most arrays natively; the encoder handles the rest
+        options = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(report, option=options, default=NumpyJSONEncoder().default))
+    else:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, cls=NumpyJSONEncoder)
+
+def _cached_forward(state_hash: str, device: str, half_precision: bool, X: np.ndarray,
+                    evaluator: 'ModelEvaluator') -> Tuple[np.ndarray, np.ndarray]:
+    """Forward pass memoized on everything but the evaluator; state_hash covers weights and scaler"""
+    return evaluator.forward(X)
+
 class ModelEvaluator:
     """
     Comprehensive evaluator for the Two-Branch Neural Network
     """
 
-    def __init__(self, model: TwoBranchRecommendationModel, device: str = 'cpu'):
+    def __init__(self, model: TwoBranchRecommendationModel, device: str = 'cpu', mixed_precision: bool = False,
+                 cache_dir: Optional[str] = None):
         self.model = model.to(device)
         self.device = device
+        # Opt-in FP16 autocast for inference, only used on CUDA devices (default is FP32)
+        self.half_precision = mixed_precision and torch.device(device).type == 'cuda'
         self.scaler_X = StandardScaler()
         self.personal_evaluation_results = {}
+        self.traced_model = None  # TorchScript trace of self.model (shares its parameters), built on first use
+        # Optional on-disk memo of predict(); off unless a cache_dir is given
+        self.cached_forward = None
+        if cache_dir is not None:
+            self.cached_forward = Memory(cache_dir, verbose=0).cache(_cached_forward, ignore=['evaluator'])
 
     def load_model_and_scalers(self, model_dir: str):
         """Load trained model and preprocessing artifacts"""
@@ -64,6 +151,21 @@ class ModelEvaluator:
             logger.error(f"Error loading model: {e}")
             return False
 
+    def get_inference_model(self, example_input: torch.Tensor):
+        """
+        Trace the eval-mode model to TorchScript once for inference. The trace is not
+        frozen, so it shares parameters with self.model and sees later weight updates.
+        Falls back to the eager model if tracing fails.
+        """
+        if self.traced_model is None:
+            try:
+                with torch.no_grad():
+                    self.traced_model = torch.jit.trace(self.model, example_input)
+            except Exception as e:
+                logger.warning(f"TorchScript tracing failed, using eager model: {e}")
+                self.traced_model = self.model
+        return self.traced_model
+
     def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
         Make predictions using the Two-Branch model
@@ -75,18 +177,32 @@ class ModelEvaluator:
             predicted_intensity: Predicted RPE values [n_samples]
             predicted_suitability: Predicted suitability scores [n_samples]
         """
+        if self.cached_forward is not None:
+            return self.cached_forward(self.state_hash(), str(self.device), self.half_precision, X, self)
+        return self.forward(X)
+
+    def state_hash(self) -> str:
+        """Hash of the in-memory weights and feature scaler, used as the prediction cache key"""
+        weights = {name: tensor.detach().cpu().numpy() for name, tensor in self.model.state_dict().items()}
+        return joblib.hash((weights, self.scaler_X))
+
+    def forward(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Scale features and run the model, bypassing the prediction cache"""
         self.model.eval()
 
         # Scale features
         X_scaled = self.scaler_X.transform(X)
         X_tensor = torch.FloatTensor(X_scaled).to(self.device)
+        # Autocast runs on the eager model; the traced graph is used only for FP32
+        model = self.model if self.half_precision else self.get_inference_model(X_tensor)
 
-        with torch.no_grad():
-            pred_intensity, pred_suitability = self.model(X_tensor)
+        with torch.inference_mode(), torch.autocast(device_type='cuda', dtype=torch.float16,
+                                                    enabled=self.half_precision):
+            pred_intensity, pred_suitability = model(X_tensor)
 
-            # Convert to numpy and flatten
-            pred_intensity = pred_intensity.cpu().numpy().flatten()
-            pred_suitability = pred_suitability.cpu().numpy().flatten()
+            # Back to FP32 so metrics are computed at full precision, then flatten
+            pred_intensity = pred_intensity.float().cpu().numpy().flatten()
+            pred_suitability = pred_suitability.float().cpu().numpy().flatten()
 
         return pred_intensity, pred_suitability
 
@@ -104,22 +220,24 @@ class ModelEvaluator:
         metrics = {}
 
         # Basic regression metrics
-        metrics['RMSE'] = np.sqrt(mean_squared_error(y_true, y_pred))
-        metrics['MAE'] = mean_absolute_error(y_true, y_pred)
-        metrics['R2'] = r2_score(y_true, y_pred)
-        metrics['Explained_Variance'] = explained_variance_score(y_true, y_pred)
+        regression = regression_metrics(y_true, y_pred)
+        for name in ('RMSE', 'MAE', 'R2', 'Explained_Variance'):
+            metrics[name] = regression[name]
+
+        # Absolute errors shared by MAPE and the tolerance checks below
+        abs_errors = np.abs(y_true - y_pred)
 
         # Additional metrics for RPE
-        metrics['Mean_Absolute_Percentage_Error'] = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+        metrics['Mean_Absolute_Percentage_Error'] = np.mean(abs_errors / np.abs(y_true)) * 100
 
         # RPE-specific metrics (1-10 scale)
         # Count predictions within acceptable RPE ranges
         rpe_tolerance = 1.0  # ±1 RPE point
-        within_tolerance = np.abs(y_true - y_pred) <= rpe_tolerance
+        within_tolerance = abs_errors <= rpe_tolerance
         metrics['RPE_Accuracy_1pt'] = np.mean(within_tolerance) * 100
 
         rpe_tolerance = 2.0  # ±2 RPE points
-        within_tolerance = np.abs(y_true - y_pred) <= rpe_tolerance
+        within_tolerance = abs_errors <= rpe_tolerance
         metrics['RPE_Accuracy_2pt'] = np.mean(within_tolerance) * 100
 
         # Distribution analysis
@@ -148,10 +266,7 @@ class ModelEvaluator:
         y_true_binary = (y_true >= threshold).astype(int)
         y_pred_binary = (y_pred >= threshold).astype(int)
 
-        metrics['Accuracy'] = accuracy_score(y_true_binary, y_pred_binary)
-        metrics['Precision'] = precision_score(y_true_binary, y_pred_binary, average='binary', zero_division=0)
-        metrics['Recall'] = recall_score(y_true_binary, y_pred_binary, average='binary', zero_division=0)
-        metrics['F1_Score'] = f1_score(y_true_binary, y_pred_binary, average='binary', zero_division=0)
+        metrics.update(binary_classification_metrics(y_true_binary, y_pred_binary))
 
         # AUC metrics
         try:
@@ -163,9 +278,10 @@ class ModelEvaluator:
             metrics['AUC_PR'] = 0.5
 
         # Regression metrics for continuous suitability scores
-        metrics['RMSE_Continuous'] = np.sqrt(mean_squared_error(y_true, y_pred))
-        metrics['MAE_Continuous'] = mean_absolute_error(y_true, y_pred)
-        metrics['R2_Continuous'] = r2_score(y_true, y_pred)
+        regression = regression_metrics(y_true, y_pred)
+        metrics['RMSE_Continuous'] = regression['RMSE']
+        metrics['MAE_Continuous'] = regression['MAE']
+        metrics['R2_Continuous'] = regression['R2']
 
         # Suitability score distribution analysis
         metrics['True_Suitability_Mean'] = np.mean(y_true)
@@ -174,26 +290,14 @@ class ModelEvaluator:
         metrics['Predicted_Suitability_Std'] = np.std(y_pred)
 
         # Suitability score categories (based on README.md)
-        def categorize_score(score):
-            if score < 0.4:
-                return 'Not Suitable'
-            elif score < 0.6:
-                return 'Support/Alternative'
-            elif score < 0.75:
-                return 'Needs Adjustment'
-            elif score < 0.85:
-                return 'Effective'
-            else:
-                return 'Optimal'
-
-        y_true_categories = [categorize_score(s) for s in y_true]
-        y_pred_categories = [categorize_score(s) for s in y_pred]
+        y_true_categories = categorize_suitability(y_true)
+        y_pred_categories = categorize_suitability(y_pred)
 
         metrics['Category_Accuracy'] = accuracy_score(y_true_categories, y_pred_categories)
 
-        # Confusion matrix for categories
-        categories = ['Not Suitable', 'Support/Alternative', 'Needs Adjustment', 'Effective', 'Optimal']
-        cm = confusion_matrix(y_true_categories, y_pred_categories, labels=categories)
+        # Confusion matrix for categories (rows/columns follow SUITABILITY_CATEGORIES)
+        cm = confusion_matrix(y_true_categories, y_pred_categories,
+                              labels=np.arange(len(SUITABILITY_CATEGORIES)))
         metrics['Confusion_Matrix_Categories'] = cm.tolist()
 
         return metrics
@@ -283,7 +387,7 @@ class ModelEvaluator:
         sns.set_palette("husl")
 
         # 1. Intensity Prediction Plots
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+        fig, axes = plt.subplots(2, 2, figsize=(15, 12), constrained_layout=True)
 
         # Scatter plot: Actual vs Predicted RPE
         axes[0, 0].scatter(y_true_intensity, y_pred_intensity, alpha=0.6, s=20)
@@ -322,12 +426,11 @@ class ModelEvaluator:
         axes[1, 1].set_title('RPE Distribution Box Plot')
         axes[1, 1].grid(True, alpha=0.3)
 
-        plt.tight_layout()
         plt.savefig(os.path.join(save_dir, 'intensity_evaluation.png'), dpi=300, bbox_inches='tight')
         plt.close()
 
         # 2. Suitability Prediction Plots
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+        fig, axes = plt.subplots(2, 2, figsize=(15, 12), constrained_layout=True)
 
         # Scatter plot: Actual vs Predicted Suitability
         axes[0, 0].scatter(y_true_suitability, y_pred_suitability, alpha=0.6, s=20)
@@ -361,25 +464,10 @@ class ModelEvaluator:
         axes[1, 0].legend()
         axes[1, 0].grid(True, alpha=0.3)
 
-        # Suitability categories bar plot
-        def categorize_score(score):
-            if score < 0.4:
-                return 'Not Suitable'
-            elif score < 0.6:
-                return 'Support/Alt'
-            elif score < 0.75:
-                return 'Needs Adjust'
-            elif score < 0.85:
-                return 'Effective'
-            else:
-                return 'Optimal'
-
-        true_categories = [categorize_score(s) for s in y_true_suitability]
-        pred_categories = [categorize_score(s) for s in y_pred_suitability]
-
+        # Suitability categories bar plot (short labels, same order as SUITABILITY_CATEGORIES)
         categories = ['Not Suitable', 'Support/Alt', 'Needs Adjust', 'Effective', 'Optimal']
-        true_counts = [true_categories.count(cat) for cat in categories]
-        pred_counts = [pred_categories.count(cat) for cat in categories]
+        true_counts = np.bincount(categorize_suitability(y_true_suitability), minlength=len(categories))
+        pred_counts = np.bincount(categorize_suitability(y_pred_suitability), minlength=len(categories))
 
         x = np.arange(len(categories))
         width = 0.35
@@ -394,7 +482,6 @@ class ModelEvaluator:
         axes[1, 1].legend()
         axes[1, 1].grid(True, alpha=0.3)
 
-        plt.tight_layout()
         plt.savefig(os.path.join(save_dir, 'suitability_evaluation.png'), dpi=300, bbox_inches='tight')
         plt.close()
 
@@ -405,14 +492,13 @@ class ModelEvaluator:
 
         cm = confusion_matrix(y_true_binary, y_pred_binary)
 
-        plt.figure(figsize=(8, 6))
+        plt.figure(figsize=(8, 6), constrained_layout=True)
         sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
                    xticklabels=['Not Suitable', 'Suitable'],
                    yticklabels=['Not Suitable', 'Suitable'])
         plt.title('Confusion Matrix - Suitability Classification')
         plt.ylabel('Actual')
         plt.xlabel('Predicted')
-        plt.tight_layout()
         plt.savefig(os.path.join(save_dir, 'confusion_matrix.png'), dpi=300, bbox_inches='tight')
         plt.close()
 
@@ -439,7 +525,8 @@ class ModelEvaluator:
                 'model_version': self.metadata.get('model_type', 'TwoBranchRecommendationModel'),
                 'dataset_size': len(X),
                 'feature_count': X.shape[1],
-                'device': self.device
+                'device': self.device,
+                'inference_precision': 'fp16_autocast' if self.half_precision else 'fp32'
             },
             'intensity_prediction_metrics': intensity_metrics,
             'suitability_prediction_metrics': suitability_metrics,
@@ -451,8 +538,7 @@ class ModelEvaluator:
         }
 
         # Save detailed results
-        with open(os.path.join(save_dir, 'detailed_evaluation_report.json'), 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        save_json_report(report, os.path.join(save_dir, 'detailed_evaluation_report.json'))
 
         # Create summary report
         self._create_summary_report(report, save_dir)
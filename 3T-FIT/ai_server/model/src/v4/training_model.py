@@ -188,14 +188,6 @@ class ModelTrainer:
         - volume_load, rest_density, hr_reserve, calorie_efficiency
         """
         try:
-            # Load data
-            if data_path.endswith('.xlsx'):
-                df = pd.read_excel(data_path)
-            else:
-                df = pd.read_csv(data_path)
-
-            logger.info(f"Loaded data with shape: {df.shape}")
-
             # Define feature columns (based on metadata.pkl)
             feature_columns = [
                 'duration_min', 'avg_hr', 'max_hr', 'calories', 'fatigue', 'effort', 'mood',
@@ -205,6 +197,16 @@ class ModelTrainer:
                 'intensity_score', 'resistance_intensity', 'cardio_intensity',
                 'volume_load', 'rest_density', 'hr_reserve', 'calorie_efficiency'
             ]
+            used_columns = set(feature_columns) | {'enhanced_suitability'}
+
+            # Load data (only the columns used below)
+            read = pd.read_excel if data_path.endswith('.xlsx') else pd.read_csv
+            df = read(data_path, usecols=lambda col: col in used_columns)
+            if not any(col in df.columns for col in feature_columns):
+                # Unexpected header: read everything for the numeric-column fallback
+                df = read(data_path)
+
+            logger.info(f"Loaded data with shape: {df.shape}")
 
             # Filter available columns
             available_features = [col for col in feature_columns if col in df.columns]
@@ -214,13 +216,14 @@ class ModelTrainer:
                 logger.warning(f"Missing features: {missing_features}")
 
             # Prepare features
+            # Features/targets are kept in float32: ExerciseDataset converts to FloatTensor anyway
             if available_features:
-                X = df[available_features].values
+                X = df[available_features].to_numpy(dtype=np.float32)
             else:
                 # Fallback to all numeric columns except targets
                 exclude_cols = ['enhanced_suitability', 'is_suitable']
                 numeric_cols = df.select_dtypes(include=[np.number]).columns
-                X = df[[col for col in numeric_cols if col not in exclude_cols]].values
+                X = df[[col for col in numeric_cols if col not in exclude_cols]].to_numpy(dtype=np.float32)
                 available_features = [col for col in numeric_cols if col not in exclude_cols]
 
             # Prepare targets
@@ -245,6 +248,9 @@ class ModelTrainer:
                 y_suitability = np.random.beta(2, 2, len(df))  # Beta distribution for 0-1
                 y_intensity = np.random.uniform(1, 10, len(df))  # Uniform for 1-10
 
+            y_intensity = np.asarray(y_intensity, dtype=np.float32)
+            y_suitability = np.asarray(y_suitability, dtype=np.float32)
+
             # Remove NaN values
             mask = ~(np.isnan(X).any(axis=1) | np.isnan(y_intensity) | np.isnan(y_suitability))
             X = X[mask]
@@ -300,9 +306,12 @@ class ModelTrainer:
             data_dict['y_suitability_val']
         )
 
-        # Create data loaders
+        # Create data loaders; validation batches go through pinned memory so
+        # host-to-device copies can overlap the forward pass (no workers: the
+        # dataset only indexes in-memory tensors)
         train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-        val_loader = DataLoader(val_dataset, batch_size=batch_size)
+        val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False,
+                                pin_memory=torch.cuda.is_available())
 
         # Optimizer
         optimizer = optim.Adam(self.model.parameters(), lr=learning_rate, weight_decay=1e-5)
@@ -351,9 +360,9 @@ class ModelTrainer:
 
             with torch.no_grad():
                 for batch in val_loader:
-                    X_batch = batch['features'].to(self.device)
-                    y_intensity_batch = batch['intensity'].to(self.device)
-                    y_suitability_batch = batch['suitability'].to(self.device)
+                    X_batch = batch['features'].to(self.device, non_blocking=True)
+                    y_intensity_batch = batch['intensity'].to(self.device, non_blocking=True)
+                    y_suitability_batch = batch['suitability'].to(self.device, non_blocking=True)
 
                     total_loss, intensity_loss, suitability_loss, _, _ = self.model.compute_loss(
                         X_batch, y_intensity_batch, y_suitability_batch,